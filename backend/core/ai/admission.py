@@ -0,0 +1,145 @@
+"""
+Admission control for LLM calls.
+
+A quota storm used to park Flask request threads in time.sleep() for a minute
+or more per retry, which could take every gunicorn worker offline. The
+admission controller bounds how many LLM calls run and wait per worker:
+
+- at most LLM_MAX_CONCURRENT calls run at once
+- at most LLM_MAX_QUEUE more wait for a slot, each only until its deadline
+- a request that cannot be admitted before its deadline fails fast with a
+  429 and a Retry-After computed from the real next-capacity time
+
+Waiters are woken as soon as a slot is released or capacity returns, instead
+of sleeping out a fixed interval. Slot waiters and gateway threads waiting
+for a key to come off cooldown wait on separate conditions, so a released
+slot always wakes a request that is queued for it.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from core.metrics import get_metrics
+from .api_key_manager import QuotaExhaustedError
+
+
+class AdmissionRejectedError(QuotaExhaustedError):
+    """Raised when a request cannot be admitted before its deadline"""
+    pass
+
+
+class AdmissionController:
+    """Bounded concurrency + bounded wait queue with per-request deadlines"""
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)       # admit() waiters
+        self._capacity_back = threading.Condition(self._lock)    # wait_for_capacity() waiters
+        self._running = 0
+        self._waiting = 0
+        self.metrics = get_metrics()
+
+    @contextmanager
+    def admit(self, deadline: float, caller: str = "default", retry_after: Optional[Callable[[], float]] = None):
+        """
+        Hold a call slot for the duration of the block.
+
+        Args:
+            deadline: time.monotonic() value after which the request gives up
+            caller: Label for metrics
+            retry_after: Returns the Retry-After (seconds) to report on rejection
+
+        Raises:
+            AdmissionRejectedError: queue full, or no slot freed before the deadline
+        """
+        queued_at = time.monotonic()
+        with self._lock:
+            if self._running >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self.metrics.incr("llm.admission", caller=caller, outcome="queue_full")
+                    raise AdmissionRejectedError(
+                        "Too many AI requests in progress. Please retry shortly.",
+                        retry_after=self._retry_after(retry_after)
+                    )
+                self._waiting += 1
+                try:
+                    while self._running >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.metrics.incr("llm.admission", caller=caller, outcome="timeout")
+                            raise AdmissionRejectedError(
+                                "AI capacity did not free up in time. Please retry shortly.",
+                                retry_after=self._retry_after(retry_after)
+                            )
+                        self._slot_freed.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._running += 1
+
+        self.metrics.incr("llm.admission", caller=caller, outcome="admitted")
+        self.metrics.observe("llm.admission_wait_ms", (time.monotonic() - queued_at) * 1000, caller=caller)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._slot_freed.notify()
+
+    def wait_for_capacity(self, wait_seconds: float, deadline: float) -> bool:
+        """
+        Wait (without a fixed sleep) until capacity is expected back.
+
+        Returns False immediately if the wait would overrun the deadline; the
+        caller should then fail fast with a 429.
+        """
+        if time.monotonic() + wait_seconds >= deadline:
+            return False
+        with self._lock:
+            self._capacity_back.wait(wait_seconds)
+        return True
+
+    def capacity_returned(self):
+        """Wake every wait_for_capacity() waiter (e.g. after a successful call or a key recovers)"""
+        with self._lock:
+            self._capacity_back.notify_all()
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue
+            }
+
+    @staticmethod
+    def _retry_after(retry_after: Optional[Callable[[], float]]) -> float:
+        if retry_after is None:
+            return 5.0
+        try:
+            return max(1.0, float(retry_after()))
+        except Exception:
+            return 5.0
+
+
+# Global singleton instance
+_admission: Optional[AdmissionController] = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create the global AdmissionController singleton"""
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                _admission = AdmissionController(
+                    max_concurrent=int(os.environ.get("LLM_MAX_CONCURRENT", "8")),
+                    max_queue=int(os.environ.get("LLM_MAX_QUEUE", "16"))
+                )
+    return _admission
@@ -0,0 +1,40 @@
+"""
+Typed outputs of the LangGraph agent nodes.
+
+These models are passed to the gateway as the response schema, so Gemini
+returns JSON in exactly this shape. Fields are flat with simple types
+because Gemini response schemas do not accept free-form dict keys.
+"""
+
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class ObservationResult(BaseModel):
+    """Agent O: what the student is really asking"""
+    core_concern: str = Field(..., description="One-sentence summary of the student's concern")
+    emotional_tone: str = Field("neutral", description="Dominant emotional tone")
+    unspoken_needs: List[str] = Field(default_factory=list, description="Needs implied but not stated")
+
+
+class PatternScores(BaseModel):
+    """Pattern intensities, 0 (absent) to 10 (dominant)"""
+    external_pressure: float = 0
+    internal_conflict: float = 0
+    circular_thinking: float = 0
+    identity_uncertainty: float = 0
+
+
+class PatternResult(BaseModel):
+    """Agent P: psychological patterns in the message"""
+    detected_patterns: PatternScores = Field(default_factory=PatternScores)
+
+    def scores(self) -> Dict[str, float]:
+        return self.detected_patterns.model_dump()
+
+
+class EvaluationResult(BaseModel):
+    """Agent E: market reality check"""
+    market_insight: str = ""
+    reality_check: str = ""
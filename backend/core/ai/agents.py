@@ -10,8 +10,13 @@ This module implements the OPEC methodology using a LangGraph workflow:
 
 import json
 import logging
+from typing import Iterator
+from core.metrics import get_metrics
+from .api_key_manager import QuotaExhaustedError
+from .chat_cache import near_cache_for
 from .graph import opec_graph
 from .prompts import OPEC_UNIFIED_PROMPT
+from .opec_parser import OPECStreamParser, SectionEvent
 
 logger = logging.getLogger(__name__)
 
@@ -47,120 +52,134 @@ class OPECOrchestrator:
         else:
             return self._process_langgraph(message, context_messages, student_context, mcp_data)
     
+    def stream_message(
+        self,
+        message: str,
+        context_messages: list = None,
+        student_context: dict = None,
+        mcp_data: dict = None
+    ) -> Iterator[dict]:
+        """
+        Process a message and yield events while the model is still generating.
+
+        Yields dicts with a "type" of:
+            thinking_delta: {"section", "text"} - text for a thinking panel
+            section:        {"section", "text"} - a section finished
+            answer_delta:   {"text"}            - text of the final answer
+            done:           {"response", "signals", "thinking"} - always last
+
+        In fast mode, self-contained factual questions ("data analyst salary?")
+        are answered without the student profile or earlier turns, and the
+        answer is reused for near-duplicate questions (see chat_cache.py).
+        """
+        if not self.fast_mode:
+            response, patterns, thinking = self._process_langgraph(
+                message, context_messages, student_context, mcp_data
+            )
+            yield {"type": "done", "response": response, "signals": patterns, "thinking": thinking}
+            return
+
+        from .graph import stream_model_with_rotation
+        from langchain_core.messages import HumanMessage
+
+        near_cache = near_cache_for(message, use_search=bool(mcp_data))
+        if near_cache is not None:
+            cached = near_cache.get(message)
+            get_metrics().incr("chat.near_cache", outcome="hit" if cached is not None else "miss")
+            if cached is not None:
+                yield {"type": "answer_delta", "text": cached}
+                yield {"type": "done", "response": cached, "signals": {}, "thinking": {}}
+                return
+            # The cached answer is shared across students, so nothing personal may reach its prompt
+            context_messages, student_context = None, None
+
+        parser = OPECStreamParser()
+        try:
+            prompt = self._build_fast_prompt(message, context_messages, student_context, mcp_data)
+            for chunk in stream_model_with_rotation([HumanMessage(content=prompt)]):
+                for event in parser.feed(chunk):
+                    yield self._event_to_dict(event)
+            for event in parser.close():
+                yield self._event_to_dict(event)
+        except QuotaExhaustedError:
+            # Raised before any output; callers turn it into a 429 + Retry-After
+            raise
+        except Exception as e:
+            logger.error(f"Fast OPEC processing failed: {e}")
+            yield {
+                "type": "done",
+                "response": "I'm having trouble processing your request right now.",
+                "signals": {},
+                "thinking": {}
+            }
+            return
+
+        result = parser.result()
+        if near_cache is not None and result.final_response:
+            near_cache.set(message, result.final_response)
+        yield {
+            "type": "done",
+            "response": result.final_response,
+            "signals": result.patterns,
+            "thinking": result.thinking
+        }
+
     def _process_fast(
         self, 
         message: str,
         context_messages: list = None,
         student_context: dict = None,
         mcp_data: dict = None
-    ) -> tuple[str, dict]:
+    ) -> tuple[str, dict, dict]:
         """
         Fast single-call processing using unified OPEC prompt.
         Uses 1 API call instead of 4, ~3-4x faster.
         """
-        from .graph import invoke_model_with_rotation
-        from langchain_core.messages import HumanMessage
+        done = {}
+        for event in self.stream_message(message, context_messages, student_context, mcp_data):
+            if event["type"] == "done":
+                done = event
+        return done["response"], done["signals"], done["thinking"]
+
+    @staticmethod
+    def _build_fast_prompt(
+        message: str,
+        context_messages: list = None,
+        student_context: dict = None,
+        mcp_data: dict = None
+    ) -> str:
+        """Build the unified OPEC prompt for a single fast-mode call"""
+        student_context_str = ""
+        if student_context:
+            student_context_str = "\n".join([f"{k}: {v}" for k, v in student_context.items() if v])
         
-        try:
-            # Build context strings
-            student_context_str = ""
-            if student_context:
-                student_context_str = "\n".join([f"{k}: {v}" for k, v in student_context.items() if v])
-            
-            mcp_context = ""
-            if mcp_data:
-                mcp_context = f"\n\nREAL-TIME DATA:\n{json.dumps(mcp_data, indent=2)}"
-            
-            # Build the unified prompt
-            prompt = OPEC_UNIFIED_PROMPT.format(
-                student_context=student_context_str,
-                mcp_context=mcp_context
-            )
-            
-            # Add conversation context
-            if context_messages:
-                prompt += "\n\nRECENT CONVERSATION:\n"
-                for msg in context_messages[-5:]:
-                    role = msg.get('role', 'user').upper()
-                    content = msg.get('content', '')[:200]
-                    prompt += f"{role}: {content}\n"
-            
-            prompt += f"\nUSER MESSAGE: {message}\n\nRESPONSE STARTS HERE:"
-            
-            # Single API call
-            response = invoke_model_with_rotation([HumanMessage(content=prompt)])
-            
-            # Extract content
-            content = response.content
-            if isinstance(content, list):
-                parts = []
-                for c in content:
-                    if hasattr(c, 'text'):
-                        parts.append(c.text)
-                    elif isinstance(c, dict) and 'text' in c:
-                        parts.append(c['text'])
-                    elif isinstance(c, str):
-                        parts.append(c)
-                content = "".join(parts)
-            elif hasattr(content, 'text'):
-                content = content.text
-            
-            raw_response = str(content)
-            
-            # Parse structured OPEC response - extract all sections
-            final_response = raw_response
-            patterns = {}
-            thinking = {
-                "observation": "",
-                "pattern": "",
-                "evaluation": ""
-            }
-            
-            # Extract [[OBSERVATION]] section
-            if "[[OBSERVATION]]" in raw_response:
-                obs_parts = raw_response.split("[[OBSERVATION]]")
-                if len(obs_parts) > 1:
-                    obs_content = obs_parts[1]
-                    if "[[PATTERN]]" in obs_content:
-                        thinking["observation"] = obs_content.split("[[PATTERN]]")[0].strip()
-                    elif "[[EVALUATION]]" in obs_content:
-                        thinking["observation"] = obs_content.split("[[EVALUATION]]")[0].strip()
-                    elif "[[CLARITY]]" in obs_content:
-                        thinking["observation"] = obs_content.split("[[CLARITY]]")[0].strip()
-            
-            # Extract [[PATTERN]] section
-            if "[[PATTERN]]" in raw_response:
-                pat_parts = raw_response.split("[[PATTERN]]")
-                if len(pat_parts) > 1:
-                    pat_content = pat_parts[1]
-                    if "[[EVALUATION]]" in pat_content:
-                        thinking["pattern"] = pat_content.split("[[EVALUATION]]")[0].strip()
-                    elif "[[CLARITY]]" in pat_content:
-                        thinking["pattern"] = pat_content.split("[[CLARITY]]")[0].strip()
-                    
-                    # Simple pattern detection from pattern section
-                    for pattern in ["external_pressure", "sunk_cost", "analysis_paralysis", "imposter_syndrome"]:
-                        if pattern.lower() in thinking["pattern"].lower():
-                            patterns[pattern] = 1.0
-            
-            # Extract [[EVALUATION]] section
-            if "[[EVALUATION]]" in raw_response:
-                eval_parts = raw_response.split("[[EVALUATION]]")
-                if len(eval_parts) > 1:
-                    eval_content = eval_parts[1]
-                    if "[[CLARITY]]" in eval_content:
-                        thinking["evaluation"] = eval_content.split("[[CLARITY]]")[0].strip()
-            
-            # Extract [[CLARITY]] section (final response)
-            if "[[CLARITY]]" in raw_response:
-                clarity_parts = raw_response.split("[[CLARITY]]")
-                final_response = clarity_parts[1].strip()
-            
-            return final_response, patterns, thinking
-            
-        except Exception as e:
-            logger.error(f"Fast OPEC processing failed: {e}")
-            return "I'm having trouble processing your request right now.", {}, {}
+        mcp_context = ""
+        if mcp_data:
+            mcp_context = f"\n\nREAL-TIME DATA:\n{json.dumps(mcp_data, indent=2)}"
+        
+        prompt = OPEC_UNIFIED_PROMPT.format(
+            student_context=student_context_str,
+            mcp_context=mcp_context
+        )
+        
+        # Add conversation context
+        if context_messages:
+            prompt += "\n\nRECENT CONVERSATION:\n"
+            for msg in context_messages[-5:]:
+                role = msg.get('role', 'user').upper()
+                content = msg.get('content', '')[:200]
+                prompt += f"{role}: {content}\n"
+        
+        prompt += f"\nUSER MESSAGE: {message}\n\nRESPONSE STARTS HERE:"
+        return prompt
+
+    @staticmethod
+    def _event_to_dict(event: SectionEvent) -> dict:
+        if event.kind == "section":
+            return {"type": "section", "section": event.section, "text": event.text}
+        if event.section == "clarity":
+            return {"type": "answer_delta", "text": event.text}
+        return {"type": "thinking_delta", "section": event.section, "text": event.text}
     
     def _process_langgraph(
         self, 
@@ -198,6 +217,8 @@ class OPECOrchestrator:
                 
             return final_response, patterns, thinking
             
+        except QuotaExhaustedError:
+            raise
         except Exception as e:
             logger.error(f"LangGraph execution failed: {e}")
             return f"I encountered an issue processing your request. Error: {str(e)[:50]}", {}, {}
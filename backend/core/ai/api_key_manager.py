@@ -1,6 +1,13 @@
 import os
+import threading
 import time
-from typing import Optional, List
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, List
+
+from .key_state import KeyStateStore, create_key_state_store, key_id
+
+# Callbacks invoked with the key whenever a key is rotated out
+_exhaustion_listeners: List[Callable[[str], None]] = []
 
 class APIKeyManager:
     """
@@ -8,9 +15,11 @@ class APIKeyManager:
     Provides automatic failover when quota is exhausted on one key.
     """
     
-    def __init__(self):
+    def __init__(self, store: Optional[KeyStateStore] = None):
         # Load all available API keys from environment
         self.keys: List[str] = []
+        # key -> n of its GEMINI_API_KEY_<n> variable (per-key settings use it)
+        self.env_indexes: Dict[str, int] = {}
         
         # Try up to 5 keys
         for i in range(1, 6):
@@ -20,14 +29,41 @@ class APIKeyManager:
                 key = os.getenv('GEMINI_API_KEY')
             if key:
                 self.keys.append(key)
+                self.env_indexes.setdefault(key, i)
+        
+        offline = os.getenv('LLM_PROVIDER') == 'simulator' or os.getenv('OPEC_CASSETTE_MODE') == 'replay'
+        if not self.keys and offline:
+            # Offline simulator/replay: rotate over fake keys so key handling is still exercised
+            from .simulator import simulator_keys
+            self.keys = simulator_keys()
+            self.env_indexes = {key: i for i, key in enumerate(self.keys, start=1)}
         
         if not self.keys:
             raise ValueError("No API keys configured. Please set GEMINI_API_KEY_1 in environment.")
         
-        self.current_index = 0
-        self.quota_exhausted = {}  # key -> timestamp when quota will reset
+        self._key_ids = [key_id(k) for k in self.keys]
+        # Shared across workers (SQLite by default); the lock guards this process's threads
+        self.store: KeyStateStore = store or create_key_state_store()
+        self._lock = threading.RLock()
         
-        print(f"[APIKeyManager] Initialized with {len(self.keys)} API key(s)")
+        print(f"[APIKeyManager] Initialized with {len(self.keys)} API key(s) "
+              f"(state: {type(self.store).__name__})")
+    
+    @property
+    def current_index(self) -> int:
+        """Index of the key all workers are currently rotating on"""
+        return self.store.get_cursor() % len(self.keys)
+    
+    @property
+    def quota_exhausted(self) -> dict:
+        """key -> timestamp when its cooldown ends, for keys still cooling down"""
+        now = time.time()
+        cooldowns = self.store.get_cooldowns()
+        return {
+            key: cooldowns[kid]
+            for key, kid in zip(self.keys, self._key_ids)
+            if cooldowns.get(kid, 0) > now
+        }
     
     def get_available_key(self) -> str:
         """
@@ -38,73 +74,135 @@ class APIKeyManager:
             str: Available API key
             
         Raises:
-            Exception: If all keys are exhausted
+            QuotaExhaustedError: If all keys are exhausted
         """
-        attempts = 0
-        max_attempts = len(self.keys)
-        
-        while attempts < max_attempts:
-            key = self.keys[self.current_index]
+        with self._lock:
+            now = time.time()
+            cooldowns = self.store.get_cooldowns()
+            start = self.store.get_cursor()
             
-            # Check if this key is still on cooldown
-            if key in self.quota_exhausted:
-                cooldown_until = self.quota_exhausted[key]
-                if time.time() < cooldown_until:
-                    # Still on cooldown, try next key
-                    self.current_index = (self.current_index + 1) % len(self.keys)
-                    attempts += 1
-                    continue
-                else:
+            for offset in range(len(self.keys)):
+                index = (start + offset) % len(self.keys)
+                kid = self._key_ids[index]
+                cooldown_until = cooldowns.get(kid)
+                
+                if cooldown_until is not None:
+                    if now < cooldown_until:
+                        # Still on cooldown, try next key
+                        continue
                     # Cooldown expired, remove from exhausted list
-                    del self.quota_exhausted[key]
-            
-            # This key is available
-            return key
+                    self.store.clear_cooldown(kid)
+                
+                # This key is available
+                return self.keys[index]
         
         # All keys exhausted
-        next_reset = min(self.quota_exhausted.values()) - time.time()
+        next_reset = self.next_available_in()
         raise QuotaExhaustedError(
             f"All {len(self.keys)} API keys are rate-limited. "
-            f"Next key available in {int(next_reset)} seconds."
+            f"Next key available in {int(next_reset)} seconds.",
+            retry_after=next_reset
         )
     
+    def available_keys(self) -> List[str]:
+        """Keys not on cooldown, in rotation order starting at the shared cursor"""
+        now = time.time()
+        cooldowns = self.store.get_cooldowns()
+        start = self.store.get_cursor()
+        ordered = [(start + offset) % len(self.keys) for offset in range(len(self.keys))]
+        return [self.keys[i] for i in ordered if cooldowns.get(self._key_ids[i], 0) <= now]
+    
+    def next_available_in(self) -> float:
+        """Seconds until the next key comes off cooldown (0 if one is available now)"""
+        now = time.time()
+        cooldowns = self.store.get_cooldowns()
+        waits = [max(0.0, cooldowns.get(kid, 0) - now) for kid in self._key_ids]
+        return min(waits) if waits else 0.0
+    
     def mark_exhausted(self, key: str, cooldown_seconds: int = 120):
         """
         Mark a key as quota-exhausted with a cooldown period.
+        Every worker sees the cooldown immediately.
         
         Args:
             key: The API key to mark
             cooldown_seconds: How long to wait before retrying (default: 2 minutes)
         """
-        self.quota_exhausted[key] = time.time() + cooldown_seconds
+        if key not in self.keys:
+            return
+        kid = key_id(key)
+        now = time.time()
+        with self._lock:
+            self.store.set_cooldown(kid, now + cooldown_seconds)
+            self.store.record_429(kid, now)
+            
+            # Rotate past this key, unless another worker already did
+            cursor = self.store.get_cursor()
+            if self._key_ids[cursor % len(self.keys)] == kid:
+                self.store.advance_cursor_from(cursor)
+        
         print(f"[APIKeyManager] Key marked exhausted. Cooldown: {cooldown_seconds}s. "
               f"Keys available: {len(self.keys) - len(self.quota_exhausted)}/{len(self.keys)}")
         
-        # Rotate to next key immediately
-        self.current_index = (self.current_index + 1) % len(self.keys)
+        for listener in _exhaustion_listeners:
+            try:
+                listener(key)
+            except Exception as e:
+                print(f"[APIKeyManager] Exhaustion listener failed: {e}")
+    
+    def get_inflight(self) -> dict:
+        """key_id -> calls in flight across all workers"""
+        return self.store.get_inflight()
+    
+    @contextmanager
+    def track_inflight(self, key: str):
+        """Count a call as in flight on this key for its duration"""
+        kid = key_id(key)
+        self.store.adjust_inflight(kid, 1)
+        try:
+            yield
+        finally:
+            self.store.adjust_inflight(kid, -1)
     
     def get_status(self) -> dict:
         """Get current status of all keys"""
+        exhausted = self.quota_exhausted
+        inflight = self.store.get_inflight()
         return {
             "total_keys": len(self.keys),
-            "available_keys": len(self.keys) - len(self.quota_exhausted),
-            "exhausted_keys": len(self.quota_exhausted),
-            "current_index": self.current_index
+            "available_keys": len(self.keys) - len(exhausted),
+            "exhausted_keys": len(exhausted),
+            "current_index": self.current_index,
+            "in_flight": sum(inflight.get(kid, 0) for kid in self._key_ids),
+            "recent_429s": sum(self.store.recent_429_count(kid, 600) for kid in self._key_ids)
         }
 
 
 class QuotaExhaustedError(Exception):
     """Raised when all API keys are quota-exhausted"""
-    pass
+    def __init__(self, message: str, retry_after: float = 60):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def add_exhaustion_listener(callback: Callable[[str], None]):
+    """Register a callback to run when a key is marked exhausted"""
+    if callback not in _exhaustion_listeners:
+        _exhaustion_listeners.append(callback)
 
 
 # Global singleton instance
 _key_manager: Optional[APIKeyManager] = None
 
 
+_key_manager_lock = threading.Lock()
+
+
 def get_key_manager() -> APIKeyManager:
     """Get or create the global APIKeyManager singleton"""
     global _key_manager
     if _key_manager is None:
-        _key_manager = APIKeyManager()
+        with _key_manager_lock:
+            if _key_manager is None:
+                _key_manager = APIKeyManager()
     return _key_manager
@@ -0,0 +1,65 @@
+"""
+Near-duplicate answer cache for self-contained factual chat questions.
+
+Students ask the same factual question in many ways ("data analyst salary?",
+"what does a data analyst earn"), so exact-match keys rarely hit. The OPEC
+orchestrator answers such questions from the question alone: neither the
+student profile nor earlier turns reach that prompt. The answer cannot carry
+any one student's details, so it is reused for near-duplicate questions from
+anyone (see core/cache/similar.py).
+
+Settings:
+    CHAT_NEAR_CACHE                on/off (default on)
+    CHAT_NEAR_CACHE_MIN_JACCARD    word-set similarity needed for a hit (default 0.5)
+    CHAT_CACHE_MAX_ENTRIES         entries per cache (default 2000)
+    CHAT_CACHE_TTL_SECONDS         entry lifetime (default 3600)
+"""
+
+import os
+import re
+from typing import Optional
+
+from core.cache.memory import register_cache
+from core.cache.similar import SimilarityCache
+
+NEAR_CACHE_ENABLED = os.environ.get("CHAT_NEAR_CACHE", "on").lower() not in ("off", "0", "false")
+
+# One cache per search mode: answers given with live search data are kept apart
+near_duplicate_caches = {
+    use_search: register_cache(SimilarityCache(
+        f"chat_near_duplicates{'_search' if use_search else ''}",
+        max_entries=int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", "2000")),
+        ttl_seconds=float(os.environ.get("CHAT_CACHE_TTL_SECONDS", "3600")),
+        min_jaccard=float(os.environ.get("CHAT_NEAR_CACHE_MIN_JACCARD", "0.5"))
+    ))
+    for use_search in (False, True)
+}
+
+_FACTUAL_RE = re.compile(
+    r"\b(salary|salaries|earn\w*|pay|package|ctc|lpa|scope|demand|skills?|roadmap|certifications?|"
+    r"courses?|companies|hiring|interview questions|job market|difference between|what is|what are|"
+    r"what does|how (?:do|can|to) (?:i |you |one )?become)\b",
+    re.IGNORECASE
+)
+# First-person situations and references back into the conversation need the full context
+_CONTEXTUAL_RE = re.compile(
+    r"\b(i|i'm|im|i've|ive|i'd|i'll|my|me|mine|myself|we|our|us|"
+    r"it|that|this|these|those|them|above|earlier)\b",
+    re.IGNORECASE
+)
+
+
+def is_generic_question(message: str) -> bool:
+    """Short, self-contained factual question whose answer does not depend on the student"""
+    return (
+        len(message.split()) <= 20
+        and bool(_FACTUAL_RE.search(message))
+        and not _CONTEXTUAL_RE.search(message)
+    )
+
+
+def near_cache_for(message: str, use_search: bool) -> Optional[SimilarityCache]:
+    """The near-duplicate cache to use for this message, or None if it must be answered in context"""
+    if not NEAR_CACHE_ENABLED or not is_generic_question(message):
+        return None
+    return near_duplicate_caches[bool(use_search)]
@@ -0,0 +1,96 @@
+"""
+Pooled LLM clients for the Gemini gateway.
+
+Creating a genai.Client per call rebuilds the client object and its HTTP
+transport, so every request pays a fresh TLS handshake. The pool keeps one
+client per API key and shares it across requests and threads. Entries for a key are dropped as soon
+as the key manager rotates it out.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Per-request HTTP timeout for genai clients (a single hung call must not eat the whole deadline)
+REQUEST_TIMEOUT_MS = int(os.environ.get("LLM_REQUEST_TIMEOUT_MS", "60000"))
+
+
+@lru_cache(maxsize=1)
+def get_genai_safety_settings() -> list:
+    """Safety settings for google.genai calls (resolved once per process)"""
+    try:
+        from google.genai import types
+        return [
+            types.SafetySetting(category=category, threshold="BLOCK_NONE")
+            for category in (
+                "HARM_CATEGORY_HARASSMENT",
+                "HARM_CATEGORY_HATE_SPEECH",
+                "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                "HARM_CATEGORY_DANGEROUS_CONTENT",
+            )
+        ]
+    except Exception:
+        return []
+
+
+class LLMClientPool:
+    """
+    Thread-safe pool of reusable google.genai Clients, keyed by API key
+    (the model is chosen per call).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._genai_clients: Dict[str, Any] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def genai_client(self, api_key: str):
+        """Get (or create) the google.genai Client for this key"""
+        with self._lock:
+            client = self._genai_clients.get(api_key)
+            if client is not None:
+                self.stats["hits"] += 1
+                return client
+            self.stats["misses"] += 1
+
+        from google import genai
+        from google.genai import types
+        client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(timeout=REQUEST_TIMEOUT_MS)
+        )
+        with self._lock:
+            return self._genai_clients.setdefault(api_key, client)
+
+    def invalidate_key(self, api_key: str):
+        """Drop every pooled client that uses this key"""
+        with self._lock:
+            if self._genai_clients.pop(api_key, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                "genai_clients": len(self._genai_clients),
+                **self.stats
+            }
+
+
+# Global singleton instance
+_client_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> LLMClientPool:
+    """Get or create the global LLMClientPool singleton"""
+    global _client_pool
+    if _client_pool is None:
+        with _pool_lock:
+            if _client_pool is None:
+                _client_pool = LLMClientPool()
+                # Rotated-out keys must not keep serving pooled clients
+                from .api_key_manager import add_exhaustion_listener
+                add_exhaustion_listener(_client_pool.invalidate_key)
+    return _client_pool
+
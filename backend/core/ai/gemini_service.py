@@ -1,6 +1,3 @@
-from google import genai
-from google.genai import types
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, RetryError
 import os
 import json
 import hashlib
@@ -8,55 +5,19 @@ import time
 import sys
 from functools import lru_cache
 from .prompts import OPEC_UNIFIED_PROMPT
-from core.ai.api_key_manager import get_key_manager, QuotaExhaustedError
-from middleware.error_handler import APIError
+from core.ai.api_key_manager import QuotaExhaustedError
+from core.cache.memory import MB, get_cache
+from core.ai.llm_gateway import get_gateway
+from middleware.error_handler import APIError, QuotaExceededError
 
-# Simple in-memory cache for responses
-response_cache = {}
-
-def configure_gemini():
-    """Initialize Gemini with API key from key manager"""
-    try:
-        key_manager = get_key_manager()
-        api_key = key_manager.get_available_key()
-        client = genai.Client(api_key=api_key)
-        return client, api_key
-    except QuotaExhaustedError as e:
-        raise APIError(
-            message=str(e),
-            status_code=429,
-            error_code="QUOTA_EXCEEDED"
-        )
-
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=3, min=10, max=120),
-    reraise=True
+# Cache of final chat responses (bounded in memory, shared by workers on disk)
+response_cache = get_cache(
+    "chat_responses",
+    max_entries=int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(float(os.environ.get("CHAT_CACHE_MAX_MB", "16")) * MB),
+    ttl_seconds=float(os.environ.get("CHAT_CACHE_TTL_SECONDS", "3600")),
+    persistent=True
 )
-def call_gemini_with_retry(client, model, prompt, current_key):
-    """Call Gemini API with retry logic and quota tracking"""
-    try:
-        return client.models.generate_content(
-            model=model,
-            contents=prompt
-        )
-    except Exception as e:
-        error_msg = str(e).lower()
-        # Check if it's a quota error
-        if '429' in error_msg or 'quota' in error_msg or 'resource_exhausted' in error_msg:
-            # Mark this key as exhausted
-            key_manager = get_key_manager()
-            key_manager.mark_exhausted(current_key)
-            raise QuotaExhaustedError(
-                "API quota exceeded on this key. Rotating to next key."
-            )
-        raise
-
-def call_gemini_no_retry(client, model, prompt):
-    return client.models.generate_content(
-        model=model,
-        contents=prompt
-    )
 
 def detect_signals(message, context=""):
     # DISABLED: Signal detection is consuming quota but not critical
@@ -76,13 +37,19 @@ def generate_chat_response(message, context_messages=None, active_patterns=None,
     Now includes student context from onboarding for personalization.
     Uses API key rotation for better quota management.
     """
-    # Generate cache key (include use_search in key)
-    cache_key = hashlib.md5(f"{message}{json.dumps(context_messages or [])}{use_search}".encode()).hexdigest()
+    # Cache key covers everything that reaches the prompt: the message, the last
+    # 5 context messages, the student profile and search mode
+    cache_key = hashlib.blake2b(json.dumps(
+        [message, [(m.get('role'), m.get('content')) for m in (context_messages or [])[-5:]],
+         student_context or {}, bool(use_search)],
+        sort_keys=True, default=str
+    ).encode(), digest_size=16).hexdigest()
     
     # Check cache first
-    if cache_key in response_cache:
+    cached = response_cache.get(cache_key)
+    if cached is not None:
         print("[CACHE HIT] Returning cached response")
-        return response_cache[cache_key]
+        return cached
     
     # Legacy pattern formatting removed - handled by OPEC Unified Prompt internally
     
@@ -128,78 +95,20 @@ def generate_chat_response(message, context_messages=None, active_patterns=None,
         
     history.append({"role": "user", "parts": [message]})
     
+    # Build full prompt
+    full_prompt = system_prompt + "\n\n"
+    for m in history[1:]:
+         full_prompt += f"{m['role'].upper()}: {m['parts'][0]}\n"
+    full_prompt += "MODEL:"
+    
     try:
-        client, current_key = configure_gemini()
-        
-        # Build full prompt
-        full_prompt = system_prompt + "\n\n"
-        for m in history[1:]:
-             full_prompt += f"{m['role'].upper()}: {m['parts'][0]}\n"
-        full_prompt += "MODEL:"
-        
-        try:
-            response = call_gemini_with_retry(client, 'gemini-3-flash-preview', full_prompt, current_key)
-        except RetryError:
-            print("Chat generation 3.0 failed. Falling back to 2.0-flash-exp")
-            try:
-                response = call_gemini_with_retry(client, 'gemini-2.0-flash-exp', full_prompt, current_key)
-            except:
-                raise # Re-raise if fallback also fails
-        
-        raw_response = response.text
-        
-        # Parse the structured OPEC response
-        final_response_text = raw_response
-        
-        try:
-            if "[[CLARITY]]" in raw_response:
-                parts = raw_response.split("[[CLARITY]]")
-                final_response_text = parts[1].strip()
-                
-                # Log the internal thought process
-                internal_thoughts = parts[0]
-                print(f"\n--- OPEC INTERNAL PROCESS ---\n{internal_thoughts}\n-----------------------------")
-            else:
-                print("WARNING: OPEC structured signals not found in response. Returning raw text.")
-                
-        except Exception as parse_error:
-            print(f"Error parsing OPEC response: {parse_error}")
-            # Fallback to raw response if parsing fails
-            final_response_text = raw_response
-
-        # Cache the clean response
-        response_cache[cache_key] = final_response_text
-        
-        return final_response_text
+        # Key rotation, the 3-flash -> 2.0-flash fallback and retries live in the gateway
+        raw_response = get_gateway().generate(full_prompt, profile="chat").text
     except QuotaExhaustedError as e:
-        # Try one more time with a different key
-        try:
-            client, current_key = configure_gemini()
-            # Build full prompt again (if needed, or reuse from above)
-            full_prompt = system_prompt + "\n\n"
-            for m in history[1:]:
-                 full_prompt += f"{m['role'].upper()}: {m['parts'][0]}\n"
-            full_prompt += "MODEL:"
-            response = call_gemini_with_retry(client, 'gemini-3-flash-preview', full_prompt, current_key) # Try primary model again
-            response_text = response.text
-            response_cache[cache_key] = response_text
-            return response_text
-        except QuotaExhaustedError:
-            raise APIError(
-                message="All API keys are currently rate-limited. Please try again in a few minutes.",
-                status_code=429,
-                error_code="QUOTA_EXCEEDED"
-            )
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Error generating response after key rotation: {error_msg}")
-            raise APIError(
-                message="Failed to generate response after key rotation. Please try again.",
-                status_code=500,
-                error_code="AI_ERROR"
-            )
-    except APIError:
-        raise # Re-raise APIError from configure_gemini
+        raise QuotaExceededError(
+            "All API keys are currently rate-limited. Please try again shortly.",
+            retry_after=e.retry_after
+        )
     except Exception as e:
         error_msg = str(e)
         print(f"Error generating response: {error_msg}")
@@ -208,3 +117,27 @@ def generate_chat_response(message, context_messages=None, active_patterns=None,
             status_code=500,
             error_code="AI_ERROR"
         )
+    
+    # Parse the structured OPEC response
+    final_response_text = raw_response
+    
+    try:
+        if "[[CLARITY]]" in raw_response:
+            parts = raw_response.split("[[CLARITY]]")
+            final_response_text = parts[1].strip()
+            
+            # Log the internal thought process
+            internal_thoughts = parts[0]
+            print(f"\n--- OPEC INTERNAL PROCESS ---\n{internal_thoughts}\n-----------------------------")
+        else:
+            print("WARNING: OPEC structured signals not found in response. Returning raw text.")
+            
+    except Exception as parse_error:
+        print(f"Error parsing OPEC response: {parse_error}")
+        # Fallback to raw response if parsing fails
+        final_response_text = raw_response
+
+    # Cache the clean response
+    response_cache.set(cache_key, final_response_text)
+    
+    return final_response_text
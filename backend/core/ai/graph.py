@@ -1,12 +1,11 @@
-from typing import TypedDict, Annotated, List, Dict, Any, Union
+from typing import TypedDict, Annotated, List, Dict, Any, Iterator
 import json
 import os
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage
-from .api_key_manager import get_key_manager, QuotaExhaustedError
-import time
-import re
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from .agent_models import EvaluationResult, ObservationResult, PatternResult
+from .api_key_manager import QuotaExhaustedError
+from .llm_gateway import get_gateway
 
 # --- State Definition ---
 class AgentState(TypedDict):
@@ -29,133 +28,51 @@ class AgentState(TypedDict):
 
 # --- Helper Functions ---
 
-def get_llm_instance(api_key: str):
-    """Create LLM instance with specific key"""
-    safety_settings = {}
-    try:
-        from langchain_google_genai import HarmBlockThreshold, HarmCategory
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-    except ImportError:
-        pass
-    except Exception:
-        pass
-
-    return ChatGoogleGenerativeAI(
-        model="gemini-3-flash-preview", 
-        google_api_key=api_key,
-        temperature=0.7,
-        safety_settings=safety_settings
-    )
+def messages_to_prompt(messages: list) -> str:
+    """Flatten LangChain messages into a single prompt string"""
+    return "\n\n".join(content_to_text(getattr(m, 'content', m)) for m in messages)
 
-def invoke_model_with_rotation(messages: list) -> Any:
+def invoke_model_with_rotation(messages: list, profile: str = "agent") -> AIMessage:
     """
-    Invokes the model with automatic API key rotation on 429 errors.
-    If all keys are exhausted, waits for the cooldown and retries.
+    Invokes the model through the LLM gateway (key rotation, fallback models
+    and retry budget are handled there). Returns an AIMessage so callers can
+    keep reading `.content`.
     """
-    key_manager = get_key_manager()
-    max_retries = 5  # Increased retries to handle waits
-    
-    for attempt in range(max_retries + 1):
-        try:
-            # Get a fresh key and instance
-            api_key = key_manager.get_available_key()
-            llm = get_llm_instance(api_key)
-            
-            return llm.invoke(messages)
-        
-        except Exception as e:
-            # Check for QuotaExhaustedError by name (robust to reloads)
-            if type(e).__name__ == "QuotaExhaustedError":
-                # All keys are exhausted. Parse wait time or default to 60s.
-                wait_time = 60
-                try:
-                    match = re.search(r'in (\d+) seconds', str(e))
-                    if match:
-                        wait_time = int(match.group(1)) + 1 
-                except:
-                    pass
-                
-                print(f"All API keys exhausted. Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
-                continue
+    result = get_gateway().generate(messages_to_prompt(messages), profile=profile)
+    return AIMessage(content=result.text)
 
-            error_str = str(e)
-            
-            # Check for rate limit errors (429 or Resource Exhausted)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower():
-                print(f"Warning: API Key exhausted (Attempt {attempt+1}). Rotating...")
-                try:
-                    # Mark the specific key as exhausted for 60 seconds
-                    key_manager.mark_exhausted(api_key, cooldown_seconds=60)
-                except Exception as ex:
-                    print(f"Error marking key exhausted: {ex}")
-                continue
-            else:
-                # For non-retriable errors, raise immediately
-                raise e
-                
-    raise Exception("Max retries exceeded for model invocation")
-
-def extract_json(content: Union[str, List[Any]]) -> Dict[str, Any]:
+def invoke_structured(messages: list, schema, profile: str = "agent"):
     """
-    Robustly extract JSON from LLM response content.
+    Invokes the model in JSON mode with `schema` (a pydantic model) as the
+    response schema and returns the validated model instance. Raises LLMError
+    (kind "parse") if no valid object comes back.
     """
-    try:
-        # Handle list response from Gemini 3
-        if isinstance(content, list):
-            parts = []
-            for c in content:
-                if hasattr(c, 'text'):
-                    parts.append(c.text)
-                elif isinstance(c, dict) and 'text' in c:
-                    parts.append(c['text'])
-                elif isinstance(c, str):
-                    parts.append(c)
-            content = "".join(parts)
-        
-        # Handle object with .text attribute
-        if hasattr(content, 'text'):
-            content = content.text
-        
-        text = str(content).strip()
-        
-        if not text:
-            print("Warning: LLM returned empty response.")
-            return {}
+    return get_gateway().generate_structured(messages_to_prompt(messages), schema, profile=profile).parsed
 
-        # 1. Try to find JSON block in markdown
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].strip()
-            
-        # 2. Try to find braces if not pure JSON
-        if not (text.startswith("{") and text.endswith("}")):
-            start = text.find("{")
-            end = text.rfind("}")
-            if start != -1 and end != -1:
-                text = text[start:end+1]
-        
-        # 3. Parsers
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            import ast
-            try:
-                return ast.literal_eval(text)
-            except:
-                pass
-            raise ValueError(f"Could not parse JSON from: {text[:100]}...")
-            
-    except Exception as e:
-        print(f"JSON Extraction Failed: {e}")
-        print(f"FAILED CONTENT REPR: {repr(content)}")
-        return {}
+def stream_model_with_rotation(messages: list, profile: str = "chat") -> Iterator[str]:
+    """
+    Streams the model response as text chunks through the LLM gateway.
+    Keys can only be rotated before the first chunk arrives; errors after
+    that are raised to the caller.
+    """
+    yield from get_gateway().stream(messages_to_prompt(messages), profile=profile)
+
+def content_to_text(content: Any) -> str:
+    """Flatten LLM message content (str, list of blocks, or object with .text) to text"""
+    if isinstance(content, list):
+        parts = []
+        for c in content:
+            if hasattr(c, 'text'):
+                parts.append(c.text)
+            elif isinstance(c, dict) and 'text' in c:
+                parts.append(c['text'])
+            elif isinstance(c, str):
+                parts.append(c)
+            # Skip non-text blocks (like signatures)
+        return "".join(parts)
+    if hasattr(content, 'text'):
+        return content.text
+    return str(content) if content is not None else ""
 
 def observation_node(state: AgentState):
     """
@@ -181,11 +98,8 @@ def observation_node(state: AgentState):
     }}"""
     
     try:
-        response = invoke_model_with_rotation([HumanMessage(content=prompt)])
-        data = extract_json(response.content)
-        if not data:
-            return {"observation": {"core_concern": state['message'], "emotional_tone": "neutral"}}
-        return {"observation": data}
+        result = invoke_structured([HumanMessage(content=prompt)], ObservationResult)
+        return {"observation": result.model_dump()}
     except Exception as e:
         print(f"Observation Agent Error: {e}")
         return {"observation": {"core_concern": state['message'], "emotional_tone": "neutral"}}
@@ -211,13 +125,17 @@ def pattern_node(state: AgentState):
     - Use double quotes.
     
     {{
-        "detected_patterns": {{ "pattern_name": score_0_to_10 }}
+        "detected_patterns": {{
+            "external_pressure": score_0_to_10,
+            "internal_conflict": score_0_to_10,
+            "circular_thinking": score_0_to_10,
+            "identity_uncertainty": score_0_to_10
+        }}
     }}"""
     
     try:
-        response = invoke_model_with_rotation([HumanMessage(content=prompt)])
-        data = extract_json(response.content)
-        return {"patterns": data.get("detected_patterns", {})}
+        result = invoke_structured([HumanMessage(content=prompt)], PatternResult)
+        return {"patterns": result.scores()}
     except Exception as e:
         print(f"Pattern Agent Error: {e}")
         return {"patterns": {}}
@@ -242,9 +160,8 @@ def evaluation_node(state: AgentState):
     }}"""
     
     try:
-        response = invoke_model_with_rotation([HumanMessage(content=prompt)])
-        data = extract_json(response.content)
-        return {"evaluation": data}
+        result = invoke_structured([HumanMessage(content=prompt)], EvaluationResult)
+        return {"evaluation": result.model_dump()}
     except Exception as e:
         print(f"Evaluation Agent Error: {e}")
         return {"evaluation": {}}
@@ -268,22 +185,10 @@ def clarity_node(state: AgentState):
     
     try:
         response = invoke_model_with_rotation([HumanMessage(content=prompt)])
-        content = response.content
-        if isinstance(content, list):
-            # Extract text from each content block properly
-            parts = []
-            for c in content:
-                if hasattr(c, 'text'):
-                    parts.append(c.text)
-                elif isinstance(c, dict) and 'text' in c:
-                    parts.append(c['text'])
-                elif isinstance(c, str):
-                    parts.append(c)
-                # Skip non-text blocks (like signatures)
-            content = "".join(parts)
-        elif hasattr(content, 'text'):
-            content = content.text
-        return {"final_response": content}
+        return {"final_response": content_to_text(response.content)}
+    except QuotaExhaustedError:
+        # Without the final answer there is nothing to degrade to; fail the request fast
+        raise
     except Exception as e:
         return {"final_response": "I'm having a bit of trouble thinking clearly right now, but I'm here to listen."}
 
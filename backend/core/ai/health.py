@@ -0,0 +1,247 @@
+"""
+Health tracking for LLM keys and models.
+
+The gateway records every attempt here:
+- an EWMA of latency and error rate per (key, model), used to send calls to
+  the fastest, least-loaded key first
+- a circuit breaker per key and per model that opens after repeated 5xx or
+  timeouts, so calls skip a failing model (e.g. gemini-3-flash-preview ->
+  gemini-2.0-flash-exp) right away instead of retrying into it
+
+Breakers are closed -> open -> half-open: once open_seconds have passed a
+single probe call is let through every probe_interval; a successful probe
+closes the breaker, a failed one re-opens it for twice as long (capped).
+
+State is per worker process; each worker learns health from its own calls.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .key_state import key_id
+
+EWMA_ALPHA = float(os.environ.get("LLM_EWMA_ALPHA", "0.2"))
+BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+BREAKER_OPEN_SECONDS = float(os.environ.get("LLM_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_MAX_OPEN_SECONDS = float(os.environ.get("LLM_BREAKER_MAX_OPEN_SECONDS", "300"))
+BREAKER_PROBE_INTERVAL = float(os.environ.get("LLM_BREAKER_PROBE_INTERVAL", "5"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class EWMAStats:
+    """Exponentially weighted latency and error rate"""
+    latency_ms: Optional[float] = None
+    error_rate: float = 0.0
+    samples: int = 0
+
+    def update(self, latency_ms: Optional[float], ok: bool, alpha: float = EWMA_ALPHA):
+        self.samples += 1
+        if latency_ms is not None:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += alpha * (latency_ms - self.latency_ms)
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with time-based half-open probes (caller holds the lock)"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.next_probe_at = 0.0
+
+    def _refresh(self, now: float):
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.next_probe_at = now
+
+    def allow(self, now: float, probe: bool = True) -> bool:
+        """
+        True if a call may go through. In half-open state one probe is let
+        through per probe interval; pass probe=False to ask without claiming it.
+        """
+        self._refresh(now)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and now >= self.next_probe_at:
+            if probe:
+                self.next_probe_at = now + BREAKER_PROBE_INTERVAL
+            return True
+        return False
+
+    def reopens_in(self, now: float) -> float:
+        """Seconds until the breaker lets a call through again"""
+        self._refresh(now)
+        if self.state == CLOSED:
+            return 0.0
+        if self.state == HALF_OPEN:
+            return max(0.0, self.next_probe_at - now)
+        return max(0.0, self.opened_at + self.open_seconds - now)
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.open_seconds = self.base_open_seconds
+
+    def record_failure(self, now: float) -> bool:
+        """Count a failure. Returns True if this failure opened the breaker."""
+        if self.state == HALF_OPEN:
+            # Failed probe: back off harder
+            self.open_seconds = min(BREAKER_MAX_OPEN_SECONDS, self.open_seconds * 2)
+            self.state = OPEN
+            self.opened_at = now
+            return True
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+            return True
+        return False
+
+
+class HealthTracker:
+    """Per (key, model) EWMA stats plus per-key and per-model circuit breakers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], EWMAStats] = {}
+        self._key_breakers: Dict[str, CircuitBreaker] = {}
+        self._model_breakers: Dict[str, CircuitBreaker] = {}
+
+    def _key_breaker(self, kid: str) -> CircuitBreaker:
+        breaker = self._key_breakers.get(kid)
+        if breaker is None:
+            breaker = self._key_breakers[kid] = CircuitBreaker()
+        return breaker
+
+    def _model_breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._model_breakers.get(model)
+        if breaker is None:
+            breaker = self._model_breakers[model] = CircuitBreaker()
+        return breaker
+
+    def record(self, api_key: str, model: str, latency_ms: Optional[float], ok: bool,
+               breaker_failure: bool = False) -> bool:
+        """
+        Record one attempt.
+
+        Args:
+            latency_ms: Call latency (time to first token for streams)
+            ok: Whether the call succeeded
+            breaker_failure: Count the failure towards the breakers (5xx/timeouts)
+
+        Returns:
+            True if this failure opened the model's breaker
+        """
+        kid = key_id(api_key)
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.get((kid, model))
+            if stats is None:
+                stats = self._stats[(kid, model)] = EWMAStats()
+            stats.update(latency_ms, ok)
+            if ok:
+                self._key_breaker(kid).record_success()
+                self._model_breaker(model).record_success()
+                return False
+            if not breaker_failure:
+                return False
+            self._key_breaker(kid).record_failure(now)
+            return self._model_breaker(model).record_failure(now)
+
+    def pick_model(self, models: List[str]) -> str:
+        """
+        First model in the fallback chain whose breaker allows a call; if every
+        breaker is open, the one that re-opens soonest.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for model in models:
+                if self._model_breaker(model).allow(now):
+                    return model
+            return min(models, key=lambda m: self._model_breaker(m).reopens_in(now))
+
+    def model_available(self, model: str) -> bool:
+        with self._lock:
+            return self._model_breaker(model).allow(time.monotonic(), probe=False)
+
+    def rank_keys(self, keys: List[str], model: str, inflight: Optional[Dict[str, int]] = None) -> List[str]:
+        """
+        Order keys fastest/least-loaded first, dropping keys whose breaker is open
+        (unless that would drop every key).
+
+        Score = EWMA latency x (1 + in-flight calls) x (1 + 4 x error rate).
+        Keys with no samples yet score just under the fastest known key, so they get tried.
+        """
+        inflight = inflight or {}
+        now = time.monotonic()
+        with self._lock:
+            allowed = [k for k in keys if self._key_breaker(key_id(k)).allow(now, probe=False)]
+            candidates = allowed or list(keys)
+            known = [
+                s.latency_ms for s in (self._stats.get((key_id(k), model)) for k in candidates)
+                if s is not None and s.latency_ms is not None
+            ]
+            default_latency = min(known) * 0.9 if known else 1000.0
+
+            def score(k: str) -> float:
+                kid = key_id(k)
+                stats = self._stats.get((kid, model))
+                latency = stats.latency_ms if stats and stats.latency_ms is not None else default_latency
+                error_rate = stats.error_rate if stats else 0.0
+                return latency * (1 + inflight.get(kid, 0)) * (1 + 4 * error_rate)
+
+            # sorted() is stable, so ties keep the rotation order of `keys`
+            return sorted(candidates, key=score)
+
+    def get_status(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "models": {
+                    model: {"state": b.state, "failures": b.failures, "reopens_in": round(b.reopens_in(now), 1)}
+                    for model, b in self._model_breakers.items()
+                },
+                "keys": {
+                    kid[:8]: {"state": b.state, "failures": b.failures}
+                    for kid, b in self._key_breakers.items()
+                },
+                "ewma": [
+                    {
+                        "key": kid[:8],
+                        "model": model,
+                        "latency_ms": round(s.latency_ms, 1) if s.latency_ms is not None else None,
+                        "error_rate": round(s.error_rate, 3),
+                        "samples": s.samples
+                    }
+                    for (kid, model), s in self._stats.items()
+                ]
+            }
+
+
+# Global singleton instance
+_health: Optional[HealthTracker] = None
+_health_lock = threading.Lock()
+
+
+def get_health_tracker() -> HealthTracker:
+    """Get or create the global HealthTracker singleton"""
+    global _health
+    if _health is None:
+        with _health_lock:
+            if _health is None:
+                _health = HealthTracker()
+    return _health
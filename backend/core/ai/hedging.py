@@ -0,0 +1,138 @@
+"""
+Hedged LLM requests for tail latency.
+
+When hedging is on for a call profile, the gateway starts the call as usual
+and waits up to the LLM_HEDGE_PERCENTILE of recent latency (time to first
+token for streams). If nothing has arrived by then, a duplicate request goes
+out on a different key - or on the fallback model when no other key is free.
+The first leg to answer wins and the other is cancelled.
+
+Extra calls cost quota, so hedges are paid from a budget: every primary call
+earns LLM_HEDGE_BUDGET hedge credits (0.1 = at most ~10% extra calls) and a
+hedge spends one.
+
+Settings:
+    LLM_HEDGE_ENABLED       on/off (default off)
+    LLM_HEDGE_PERCENTILE    latency percentile that triggers a hedge (0.95)
+    LLM_HEDGE_BUDGET        max extra calls as a fraction of primaries (0.1)
+    LLM_HEDGE_MIN_DELAY_MS  never hedge sooner than this (250)
+    LLM_HEDGE_MIN_SAMPLES   latency samples needed before hedging starts (20)
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from core.metrics import get_metrics
+
+# Most credits a quiet period can bank, so a burst cannot double every call
+MAX_BANKED_HEDGES = 5.0
+
+
+class HedgeCancelled(Exception):
+    """Raised inside a losing leg once the other leg has won"""
+    pass
+
+
+class HedgeLeg:
+    """One copy of a hedged call"""
+
+    def __init__(self, name: str, avoid_keys: Iterable[str] = (), start_model_index: int = 0):
+        self.name = name
+        self.avoid_keys = set(avoid_keys)
+        self.start_model_index = start_model_index
+        self.keys_used: set = set()
+        self.cancelled = threading.Event()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise HedgeCancelled(self.name)
+
+
+class HedgePolicy:
+    """Decides when to hedge and enforces the hedge budget"""
+
+    def __init__(self):
+        self.enabled = os.environ.get("LLM_HEDGE_ENABLED", "off").lower() in ("on", "1", "true")
+        self.percentile = float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.95"))
+        self.budget = float(os.environ.get("LLM_HEDGE_BUDGET", "0.1"))
+        self.min_delay_s = float(os.environ.get("LLM_HEDGE_MIN_DELAY_MS", "250")) / 1000
+        self.min_samples = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._credits: Dict[str, float] = {}
+
+    def delay_s(self, profile: str, latency_metric: str, **labels) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if self.metrics.sample_count(latency_metric, caller=profile, **labels) < self.min_samples:
+            return None
+        value = self.metrics.percentile(latency_metric, self.percentile, caller=profile, **labels)
+        if value is None:
+            return None
+        return max(self.min_delay_s, value / 1000)
+
+    def record_primary(self, profile: str):
+        with self._lock:
+            self._credits[profile] = min(MAX_BANKED_HEDGES, self._credits.get(profile, 0.0) + self.budget)
+        self.metrics.incr("llm.hedge_primaries", caller=profile)
+
+    def try_spend(self, profile: str) -> bool:
+        with self._lock:
+            if self._credits.get(profile, 0.0) < 1.0:
+                return False
+            self._credits[profile] -= 1.0
+        return True
+
+    def get_status(self) -> dict:
+        status = {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "budget": self.budget,
+            "profiles": {}
+        }
+        with self._lock:
+            profiles = list(self._credits)
+        for profile in profiles:
+            primaries = self.metrics.counter("llm.hedge_primaries", caller=profile)
+            fired = self.metrics.counter("llm.hedge", caller=profile, outcome="fired")
+            status["profiles"][profile] = {
+                "primaries": primaries,
+                "hedges": fired,
+                "extra_call_ratio": round(fired / primaries, 4) if primaries else 0.0,
+                "hedge_wins": self.metrics.counter("llm.hedge", caller=profile, outcome="hedge_won"),
+                # Latency the caller saw vs. what the primary leg alone would have taken
+                # (a lower bound when the primary was cancelled)
+                "p99_effective_ms": self.metrics.percentile("llm.hedge_effective_ms", 0.99, caller=profile),
+                "p99_primary_ms": self.metrics.percentile("llm.hedge_primary_ms", 0.99, caller=profile),
+            }
+        return status
+
+
+# Threads that run hedge legs (each leg still goes through admission control)
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_policy: Optional[HedgePolicy] = None
+_hedge_lock = threading.Lock()
+
+
+def get_hedge_pool() -> ThreadPoolExecutor:
+    """Shared executor for hedge legs"""
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _hedge_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("LLM_HEDGE_THREADS", "32")),
+                    thread_name_prefix="llm-hedge"
+                )
+    return _hedge_pool
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """Get or create the global HedgePolicy singleton"""
+    global _policy
+    if _policy is None:
+        with _hedge_lock:
+            if _policy is None:
+                _policy = HedgePolicy()
+    return _policy
@@ -3,8 +3,8 @@ AI Interview Report Generation Service
 Uses Gemini to analyze interview performance and generate detailed reports
 """
 import json
-from google import genai
-from core.ai.api_key_manager import get_key_manager, QuotaExhaustedError
+from core.ai.api_key_manager import QuotaExhaustedError
+from core.ai.llm_gateway import get_gateway
 
 
 REPORT_GENERATION_PROMPT = """You are an expert career coach and interview evaluator providing detailed feedback.
@@ -78,10 +78,6 @@ def generate_interview_report(company: str, role: str, duration_seconds: int) ->
         dict: Report data with scores, strengths, weaknesses, and recommendations
     """
     try:
-        key_manager = get_key_manager()
-        api_key = key_manager.get_available_key()
-        client = genai.Client(api_key=api_key)
-        
         prompt = REPORT_GENERATION_PROMPT.format(
             company=company,
             role=role,
@@ -89,13 +85,10 @@ def generate_interview_report(company: str, role: str, duration_seconds: int) ->
             duration_minutes=round(duration_seconds / 60, 1)
         )
         
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-exp',
-            contents=prompt
-        )
+        result = get_gateway().generate(prompt, profile="report")
         
         # Parse the JSON response
-        response_text = response.text.strip()
+        response_text = result.text.strip()
         
         # Clean up response if wrapped in markdown code blocks
         if response_text.startswith('```'):
@@ -0,0 +1,313 @@
+"""
+Tolerant, incremental JSON parser for LLM output.
+
+LLM "JSON" often arrives wrapped in prose or code fences, with trailing
+commas, Python literals (True/None), single quotes, or cut off mid-object.
+IncrementalJSONParser handles all of these in one pass over the text and can
+be fed a stream chunk by chunk: each feed() returns the values that were
+completed by that chunk, with their path from the root, e.g.
+
+    parser = IncrementalJSONParser()
+    for chunk in stream:
+        for path, value in parser.feed(chunk):
+            if len(path) == 2 and path[0] == "roadmap":
+                ...  # roadmap[path[1]] is complete
+    result = parser.close()
+
+parse_tolerant(text) is the one-shot form.
+"""
+
+import re
+from typing import Any, List, Optional, Tuple
+
+Path = Tuple[Any, ...]
+
+_SEEK = 0
+_CONTAINER = 1
+_STRING = 2
+_BARE = 3
+_DONE = 4
+
+# Where a container is in its grammar
+_EXPECT_KEY = "key"
+_EXPECT_COLON = "colon"
+_EXPECT_VALUE = "value"
+_EXPECT_COMMA = "comma"
+
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_BARE_END = set(",:}] \t\r\n")
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_STRING_SPECIAL = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+
+
+class JSONParseError(ValueError):
+    """No JSON value could be recovered from the text"""
+    pass
+
+
+class _Frame:
+    __slots__ = ("container", "path", "expect", "key")
+
+    def __init__(self, container, path: Path, expect: str):
+        self.container = container
+        self.path = path
+        self.expect = expect
+        self.key = None
+
+
+class IncrementalJSONParser:
+    """Single-pass tolerant JSON parser (see module docstring)"""
+
+    def __init__(self, root: str = "{["):
+        """
+        Args:
+            root: Characters that may open the root value. Pass "{" when an
+                object is expected so a "[" in leading prose is skipped.
+        """
+        self._root_chars = root
+        self._state = _SEEK
+        self._stack: List[_Frame] = []
+        self._root: Any = None
+        self._has_root = False
+        self._buf: List[str] = []       # current string / bare word
+        self._quote = '"'
+        self._escape = False
+        self._string_is_key = False
+        self._bare_is_key = False
+        self._pending_unicode: Optional[str] = None
+        self.repaired = False           # True if close() had to finish a truncated value
+
+    @property
+    def done(self) -> bool:
+        """The root value has been closed"""
+        return self._state == _DONE
+
+    @property
+    def value(self) -> Any:
+        """The (possibly partial) root value parsed so far; live, do not mutate"""
+        return self._root
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Parse a chunk. Returns (path, value) for every value it completed."""
+        events: List[Tuple[Path, Any]] = []
+        i, n = 0, len(chunk)
+        while i < n:
+            state = self._state
+            if state == _DONE:
+                break
+            if state == _SEEK:
+                start = _find_open(chunk, i, self._root_chars)
+                if start == -1:
+                    break
+                self._open(chunk[start], events)
+                i = start + 1
+                continue
+            if state == _STRING:
+                i = self._consume_string(chunk, i, events)
+                continue
+            if state == _BARE:
+                ch = chunk[i]
+                if ch in _BARE_END:
+                    self._finish_bare(events)
+                    continue  # re-read the delimiter in container state
+                self._buf.append(ch)
+                i += 1
+                continue
+
+            # _CONTAINER
+            ch = chunk[i]
+            i += 1
+            if ch in " \t\r\n":
+                continue
+            frame = self._stack[-1]
+            if ch == ",":
+                if frame.expect == _EXPECT_COMMA:
+                    frame.expect = _EXPECT_KEY if isinstance(frame.container, dict) else _EXPECT_VALUE
+                continue
+            if ch == ":":
+                if frame.expect == _EXPECT_COLON:
+                    frame.expect = _EXPECT_VALUE
+                continue
+            if ch in "}]":
+                self._close_container(events)
+                continue
+            if frame.expect == _EXPECT_COMMA:
+                # Missing comma: tolerate and treat this as the next element
+                frame.expect = _EXPECT_KEY if isinstance(frame.container, dict) else _EXPECT_VALUE
+            if frame.expect == _EXPECT_COLON:
+                frame.expect = _EXPECT_VALUE
+            if ch in "\"'":
+                self._quote = ch
+                self._string_is_key = frame.expect == _EXPECT_KEY
+                self._state = _STRING
+                self._buf = []
+                continue
+            if frame.expect == _EXPECT_KEY:
+                # Unquoted key
+                self._bare_is_key = True
+                self._state = _BARE
+                self._buf = [ch]
+                continue
+            if ch in "{[":
+                self._open(ch, events)
+                continue
+            self._bare_is_key = False
+            self._state = _BARE
+            self._buf = [ch]
+        return events
+
+    def close(self) -> Any:
+        """
+        Finish parsing: complete a truncated string/number and close any open
+        containers. Returns the root value.
+
+        Raises:
+            JSONParseError: no object or array was found
+        """
+        events: List[Tuple[Path, Any]] = []
+        if self._state == _STRING:
+            self.repaired = True
+            if not self._string_is_key:
+                self._complete("".join(self._buf), events)
+            self._state = _CONTAINER
+        elif self._state == _BARE:
+            self._finish_bare(events)
+        while self._stack:
+            self.repaired = True
+            self._close_container(events)
+        if not self._has_root:
+            raise JSONParseError("No JSON object or array found")
+        return self._root
+
+    # --- internals ---
+
+    def _child_path(self) -> Path:
+        if not self._stack:
+            return ()
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            return frame.path + (frame.key,)
+        return frame.path + (len(frame.container),)
+
+    def _attach(self, value: Any):
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+        else:
+            frame.container.append(value)
+        frame.expect = _EXPECT_COMMA
+
+    def _open(self, ch: str, events):
+        container = {} if ch == "{" else []
+        path = self._child_path()
+        if self._stack:
+            self._attach(container)
+        else:
+            self._root = container
+            self._has_root = True
+        self._stack.append(_Frame(container, path, _EXPECT_KEY if ch == "{" else _EXPECT_VALUE))
+        self._state = _CONTAINER
+
+    def _close_container(self, events):
+        frame = self._stack.pop()
+        events.append((frame.path, frame.container))
+        self._state = _CONTAINER if self._stack else _DONE
+
+    def _complete(self, value: Any, events):
+        """A scalar value finished inside the current container"""
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict) and frame.key is None:
+            return  # value without a key (malformed); drop it
+        events.append((self._child_path(), value))
+        self._attach(value)
+
+    def _set_key(self, key: str):
+        frame = self._stack[-1]
+        frame.key = key
+        frame.expect = _EXPECT_COLON
+
+    def _consume_string(self, chunk: str, i: int, events) -> int:
+        pattern = _STRING_SPECIAL[self._quote]
+        buf = self._buf
+        n = len(chunk)
+        while i < n:
+            if self._pending_unicode is not None:
+                needed = 4 - len(self._pending_unicode)
+                self._pending_unicode += chunk[i:i + needed]
+                i += min(needed, n - i)
+                if len(self._pending_unicode) == 4:
+                    try:
+                        buf.append(chr(int(self._pending_unicode, 16)))
+                    except ValueError:
+                        buf.append(self._pending_unicode)
+                    self._pending_unicode = None
+                continue
+            if self._escape:
+                ch = chunk[i]
+                i += 1
+                self._escape = False
+                if ch == "u":
+                    self._pending_unicode = ""
+                else:
+                    buf.append(_ESCAPES.get(ch, ch))
+                continue
+            match = pattern.search(chunk, i)
+            if match is None:
+                buf.append(chunk[i:])
+                return n
+            j = match.start()
+            if j > i:
+                buf.append(chunk[i:j])
+            if chunk[j] == "\\":
+                self._escape = True
+                i = j + 1
+                continue
+            # Closing quote
+            text = "".join(buf)
+            self._buf = []
+            self._state = _CONTAINER
+            if self._string_is_key:
+                self._set_key(text)
+            else:
+                self._complete(text, events)
+            return j + 1
+        return i
+
+    def _finish_bare(self, events):
+        word = "".join(self._buf).strip()
+        self._buf = []
+        self._state = _CONTAINER
+        if self._bare_is_key:
+            self._set_key(word)
+            return
+        if word in _LITERALS:
+            value = _LITERALS[word]
+        else:
+            try:
+                value = int(word)
+            except ValueError:
+                try:
+                    value = float(word)
+                except ValueError:
+                    value = word  # unquoted text: keep it as a string
+        self._complete(value, events)
+
+
+def _find_open(text: str, start: int, chars: str) -> int:
+    """Index of the first of `chars` at or after start (-1 if none)"""
+    found = [i for i in (text.find(ch, start) for ch in chars) if i != -1]
+    return min(found) if found else -1
+
+
+def parse_tolerant(text: str, root: str = "{[") -> Any:
+    """
+    Parse the first JSON object/array in text, repairing common LLM mistakes.
+
+    Raises:
+        JSONParseError: nothing JSON-like was found
+    """
+    parser = IncrementalJSONParser(root)
+    parser.feed(text)
+    return parser.close()
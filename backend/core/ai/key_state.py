@@ -0,0 +1,244 @@
+"""
+Shared API key state for APIKeyManager.
+
+gunicorn runs several worker processes; if each kept key cooldowns in its own
+memory, every worker would rediscover the same 429 separately and rotate out
+of step. The store keeps key state where all workers and threads see it:
+- cooldown-until timestamps
+- in-flight call counts (per process, so a dead worker's counts can be dropped)
+- recent 429 timestamps
+- the shared rotation cursor
+
+Backends (KEY_STATE_BACKEND):
+    sqlite  - default; a WAL-mode SQLite file shared by workers on the host
+    memory  - per-process only (tests, single-worker dev)
+    module.path:ClassName - any KeyStateStore subclass (e.g. Redis later)
+
+Keys are stored as a SHA-256 prefix, never in plain text.
+"""
+
+import hashlib
+import importlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict
+
+from core.sqlite_util import SQLiteFile, pid_alive
+
+logger = logging.getLogger(__name__)
+
+# 429s older than this are pruned
+RECENT_429_WINDOW_SECONDS = 3600
+
+
+def key_id(api_key: str) -> str:
+    """Stable, non-reversible identifier for an API key"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class KeyStateStore(ABC):
+    """Interface for shared key state. All methods must be safe across threads."""
+
+    @abstractmethod
+    def get_cooldowns(self) -> Dict[str, float]:
+        """key_id -> cooldown-until (epoch seconds), including expired entries"""
+
+    @abstractmethod
+    def set_cooldown(self, kid: str, until: float):
+        """Extend a key's cooldown (an earlier `until` never shortens it)"""
+
+    @abstractmethod
+    def clear_cooldown(self, kid: str):
+        """Remove a key's cooldown if it has expired"""
+
+    @abstractmethod
+    def record_429(self, kid: str, ts: float):
+        """Record a 429 for a key at ts (epoch seconds)"""
+
+    @abstractmethod
+    def recent_429_count(self, kid: str, window_seconds: float) -> int:
+        """429s recorded for a key within the last window_seconds"""
+
+    @abstractmethod
+    def adjust_inflight(self, kid: str, delta: int):
+        """Add delta to this process's in-flight call count for a key"""
+
+    @abstractmethod
+    def get_inflight(self) -> Dict[str, int]:
+        """key_id -> in-flight calls across live processes"""
+
+    @abstractmethod
+    def get_cursor(self) -> int:
+        """Current value of the shared rotation cursor"""
+
+    @abstractmethod
+    def advance_cursor_from(self, expected: int) -> int:
+        """
+        Move the rotation cursor past `expected`, unless another worker already
+        moved it. Returns the cursor value afterwards.
+        """
+
+
+class InMemoryKeyStateStore(KeyStateStore):
+    """Process-local store (state is not shared between workers)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cooldowns: Dict[str, float] = {}
+        self._429s: Dict[str, list] = {}
+        self._inflight: Dict[str, int] = {}
+        self._cursor = 0
+
+    def get_cooldowns(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._cooldowns)
+
+    def set_cooldown(self, kid: str, until: float):
+        with self._lock:
+            self._cooldowns[kid] = max(until, self._cooldowns.get(kid, 0))
+
+    def clear_cooldown(self, kid: str):
+        with self._lock:
+            if self._cooldowns.get(kid, 0) <= time.time():
+                self._cooldowns.pop(kid, None)
+
+    def record_429(self, kid: str, ts: float):
+        with self._lock:
+            events = self._429s.setdefault(kid, [])
+            events.append(ts)
+            cutoff = ts - RECENT_429_WINDOW_SECONDS
+            self._429s[kid] = [t for t in events if t >= cutoff]
+
+    def recent_429_count(self, kid: str, window_seconds: float) -> int:
+        cutoff = time.time() - window_seconds
+        with self._lock:
+            return sum(1 for t in self._429s.get(kid, []) if t >= cutoff)
+
+    def adjust_inflight(self, kid: str, delta: int):
+        with self._lock:
+            self._inflight[kid] = max(0, self._inflight.get(kid, 0) + delta)
+
+    def get_inflight(self) -> Dict[str, int]:
+        with self._lock:
+            return {k: v for k, v in self._inflight.items() if v}
+
+    def get_cursor(self) -> int:
+        with self._lock:
+            return self._cursor
+
+    def advance_cursor_from(self, expected: int) -> int:
+        with self._lock:
+            if self._cursor == expected:
+                self._cursor += 1
+            return self._cursor
+
+
+class SQLiteKeyStateStore(KeyStateStore):
+    """
+    Key state in a SQLite file (WAL mode) shared by every worker on the host.
+    Each thread gets its own connection; writes use BEGIN IMMEDIATE so
+    read-modify-write updates are atomic across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = SQLiteFile(path)
+        with self._db.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS key_cooldowns (key_id TEXT PRIMARY KEY, until REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS key_429s (key_id TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_key_429s ON key_429s (key_id, ts)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS key_inflight ("
+                "key_id TEXT NOT NULL, pid INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (key_id, pid))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS key_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO key_meta (name, value) VALUES ('cursor', 0)")
+            # A previous process with our pid cannot still be running
+            conn.execute("DELETE FROM key_inflight WHERE pid = ?", (os.getpid(),))
+
+    def get_cooldowns(self) -> Dict[str, float]:
+        rows = self._db.conn().execute("SELECT key_id, until FROM key_cooldowns").fetchall()
+        return {kid: until for kid, until in rows}
+
+    def set_cooldown(self, kid: str, until: float):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO key_cooldowns (key_id, until) VALUES (?, ?) "
+                "ON CONFLICT(key_id) DO UPDATE SET until = MAX(until, excluded.until)",
+                (kid, until)
+            )
+
+    def clear_cooldown(self, kid: str):
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM key_cooldowns WHERE key_id = ? AND until <= ?", (kid, time.time()))
+
+    def record_429(self, kid: str, ts: float):
+        with self._db.transaction() as conn:
+            conn.execute("INSERT INTO key_429s (key_id, ts) VALUES (?, ?)", (kid, ts))
+            conn.execute("DELETE FROM key_429s WHERE ts < ?", (ts - RECENT_429_WINDOW_SECONDS,))
+
+    def recent_429_count(self, kid: str, window_seconds: float) -> int:
+        row = self._db.conn().execute(
+            "SELECT COUNT(*) FROM key_429s WHERE key_id = ? AND ts >= ?",
+            (kid, time.time() - window_seconds)
+        ).fetchone()
+        return row[0]
+
+    def adjust_inflight(self, kid: str, delta: int):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO key_inflight (key_id, pid, count) VALUES (?, ?, MAX(0, ?)) "
+                "ON CONFLICT(key_id, pid) DO UPDATE SET count = MAX(0, count + ?)",
+                (kid, os.getpid(), delta, delta)
+            )
+
+    def get_inflight(self) -> Dict[str, int]:
+        rows = self._db.conn().execute("SELECT key_id, pid, count FROM key_inflight WHERE count > 0").fetchall()
+        totals: Dict[str, int] = {}
+        dead = []
+        for kid, pid, count in rows:
+            if not pid_alive(pid):
+                dead.append(pid)
+                continue
+            totals[kid] = totals.get(kid, 0) + count
+        if dead:
+            with self._db.transaction() as conn:
+                conn.executemany("DELETE FROM key_inflight WHERE pid = ?", [(p,) for p in set(dead)])
+        return totals
+
+    def get_cursor(self) -> int:
+        return self._db.conn().execute("SELECT value FROM key_meta WHERE name = 'cursor'").fetchone()[0]
+
+    def advance_cursor_from(self, expected: int) -> int:
+        with self._db.transaction() as conn:
+            conn.execute(
+                "UPDATE key_meta SET value = value + 1 WHERE name = 'cursor' AND value = ?",
+                (expected,)
+            )
+            return conn.execute("SELECT value FROM key_meta WHERE name = 'cursor'").fetchone()[0]
+
+
+def create_key_state_store() -> KeyStateStore:
+    """Build the store selected by KEY_STATE_BACKEND (falls back to memory on error)"""
+    backend = os.environ.get("KEY_STATE_BACKEND", "sqlite")
+    try:
+        if backend == "memory":
+            return InMemoryKeyStateStore()
+        if backend == "sqlite":
+            path = os.environ.get(
+                "KEY_STATE_PATH",
+                os.path.join(tempfile.gettempdir(), "opec_key_state.sqlite3")
+            )
+            return SQLiteKeyStateStore(path)
+        module_name, _, class_name = backend.partition(":")
+        store_cls = getattr(importlib.import_module(module_name), class_name)
+        return store_cls()
+    except Exception as e:
+        logger.error(f"Key state backend '{backend}' unavailable ({e}); using per-process state")
+        return InMemoryKeyStateStore()
@@ -0,0 +1,759 @@
+"""
+Unified LLM Gateway
+
+Every Gemini call in the backend goes through LLMGateway so that key rotation,
+client pooling, model fallback, deadlines, retry budgets, caching and metrics
+behave the same everywhere and are tuned in one place (CALL_PROFILES).
+
+Usage:
+    from core.ai.llm_gateway import get_gateway
+    result = get_gateway().generate(prompt, profile="chat")
+    print(result.text)
+
+    for chunk in get_gateway().stream(prompt, profile="chat"):
+        ...
+
+    result = get_gateway().generate_structured(prompt, ObservationResult, profile="agent")
+    result.parsed.core_concern
+"""
+
+import importlib
+import os
+import queue
+import random
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.cassette import CassetteProvider, get_cassette
+from core.metrics import get_metrics
+from .admission import get_admission_controller
+from .api_key_manager import get_key_manager, QuotaExhaustedError
+from .client_pool import get_client_pool, get_genai_safety_settings
+from .health import get_health_tracker
+from .hedging import HedgeLeg, get_hedge_policy, get_hedge_pool
+from .json_stream import JSONParseError, parse_tolerant
+from .rate_limiter import estimate_tokens, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.environ.get("GEMINI_MODEL", "gemini-3-flash-preview")
+DEFAULT_FALLBACK_MODELS = [
+    m.strip() for m in os.environ.get("GEMINI_FALLBACK_MODELS", "gemini-2.0-flash-exp").split(",") if m.strip()
+]
+
+# Cooldown applied to a key after a 429
+QUOTA_COOLDOWN_SECONDS = int(os.environ.get("LLM_QUOTA_COOLDOWN_SECONDS", "60"))
+
+
+@dataclass(frozen=True)
+class CallProfile:
+    """Retry/latency budget for one kind of call"""
+    deadline_s: float           # total wall-clock budget for the call, including waits
+    max_attempts: int           # provider calls, across keys and models
+    failures_per_model: int     # transient failures before moving down the fallback chain
+                                # (an open model circuit breaker skips the model immediately)
+    backoff_base_s: float = 1.0
+    backoff_max_s: float = 8.0
+    max_quota_wait_s: float = 20.0   # longest we queue for a key (cooldown or rate limit)
+    temperature: float = 0.7
+    expected_output_tokens: int = 800  # used for rate-limit token estimates
+    hedge: bool = False              # duplicate slow calls when LLM_HEDGE_ENABLED is on
+
+
+# All callers' budgets in one place. Deadlines stay under the gunicorn --timeout of 120s.
+CALL_PROFILES: Dict[str, CallProfile] = {
+    "chat": CallProfile(deadline_s=45, max_attempts=4, failures_per_model=2, hedge=True),
+    "agent": CallProfile(deadline_s=30, max_attempts=3, failures_per_model=1, expected_output_tokens=300),
+    "coach": CallProfile(deadline_s=45, max_attempts=4, failures_per_model=2),
+    "simulation": CallProfile(deadline_s=100, max_attempts=5, failures_per_model=2, backoff_max_s=15,
+                              expected_output_tokens=4000),
+    "report": CallProfile(deadline_s=45, max_attempts=3, failures_per_model=1, expected_output_tokens=1500),
+}
+DEFAULT_PROFILE = "chat"
+
+
+class LLMError(Exception):
+    """Raised when a call fails permanently or its retry budget runs out"""
+    def __init__(self, message: str, kind: str = "fatal"):
+        super().__init__(message)
+        self.kind = kind
+
+
+@dataclass
+class LLMResult:
+    """Result of a gateway call"""
+    text: str
+    model: str
+    latency_ms: float
+    attempts: int = 1
+    cached: bool = False
+    meta: Dict[str, Any] = field(default_factory=dict)
+    parsed: Any = None          # validated model instance from generate_structured()
+
+
+def classify_error(error: Exception) -> str:
+    """
+    Classify a provider error:
+        quota     - 429 / RESOURCE_EXHAUSTED, rotate keys
+        model     - model missing or unsupported, move to the fallback model
+        transient - 5xx, timeouts and connection errors, back off and retry
+        fatal     - anything else (bad request, auth), fail immediately
+    """
+    if isinstance(error, QuotaExhaustedError):
+        return "quota"
+    text = str(error)
+    lowered = text.lower()
+    if "429" in text or "resource_exhausted" in lowered or "quota" in lowered:
+        return "quota"
+    if "404" in text or "not_found" in lowered or "is not supported" in lowered:
+        return "model"
+    if any(token in lowered for token in (
+        "500", "502", "503", "504", "internal", "unavailable", "overloaded",
+        "deadline", "timeout", "timed out", "connection", "reset by peer"
+    )):
+        return "transient"
+    return "fatal"
+
+
+class GeminiProvider:
+    """Calls Gemini through pooled google.genai clients"""
+
+    name = "gemini"
+
+    def _config(self, temperature: float, extra: Optional[dict] = None):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            temperature=temperature,
+            safety_settings=get_genai_safety_settings(),
+            **(extra or {})
+        )
+
+    def generate(self, api_key: str, model: str, prompt: str, temperature: float,
+                 config: Optional[dict] = None) -> str:
+        client = get_client_pool().genai_client(api_key)
+        response = client.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=self._config(temperature, config)
+        )
+        return response.text or ""
+
+    def stream(self, api_key: str, model: str, prompt: str, temperature: float,
+               config: Optional[dict] = None) -> Iterator[str]:
+        client = get_client_pool().genai_client(api_key)
+        for chunk in client.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=self._config(temperature, config)
+        ):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+class _CallState:
+    """Book-keeping for one gateway call across attempts"""
+
+    def __init__(self, profile: CallProfile, models: List[str], deadline_s: Optional[float], max_attempts: Optional[int]):
+        self.profile = profile
+        self.models = models
+        self.model_index = 0
+        self.model_failures = 0
+        self.attempts = 0
+        self.max_attempts = max_attempts or profile.max_attempts
+        self.deadline = time.monotonic() + (deadline_s or profile.deadline_s)
+        self.last_error: Optional[Exception] = None
+
+    @property
+    def model(self) -> str:
+        return self.models[self.model_index]
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def exhausted(self) -> bool:
+        return self.attempts >= self.max_attempts or self.remaining() <= 0
+
+    def next_model(self) -> bool:
+        """Move down the fallback chain. Returns False if already on the last model."""
+        if self.model_index + 1 < len(self.models):
+            self.model_index += 1
+            self.model_failures = 0
+            return True
+        return False
+
+    def select_model(self, health) -> str:
+        """Skip ahead past models whose circuit breaker is open"""
+        model = health.pick_model(self.models[self.model_index:])
+        index = self.models.index(model, self.model_index)
+        if index != self.model_index:
+            self.model_index = index
+            self.model_failures = 0
+        return model
+
+
+class LLMGateway:
+    """Single entry point for LLM calls"""
+
+    def __init__(self, provider=None, key_manager=None):
+        self.provider = provider or GeminiProvider()
+        self._key_manager = key_manager
+        self.metrics = get_metrics()
+        self.health = get_health_tracker()
+
+    @property
+    def key_manager(self):
+        return self._key_manager or get_key_manager()
+
+    def generate(
+        self,
+        prompt: str,
+        profile: str = DEFAULT_PROFILE,
+        model: Optional[str] = None,
+        fallback_models: Optional[List[str]] = None,
+        temperature: Optional[float] = None,
+        deadline_s: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        cache: Any = None,
+        cache_key: Optional[str] = None,
+        config: Optional[dict] = None,
+    ) -> LLMResult:
+        """
+        Generate a complete response.
+
+        Args:
+            prompt: Prompt text
+            profile: Name of a CALL_PROFILES entry (retry budget and deadline)
+            model: Primary model (defaults to GEMINI_MODEL)
+            fallback_models: Models to try when the primary keeps failing
+            temperature: Overrides the profile temperature
+            deadline_s / max_attempts: Override the profile budget
+            cache: Optional object with get(key) / set(key, value) for response text
+            cache_key: Key for the cache hook
+            config: Extra provider generation config
+
+        Raises:
+            QuotaExhaustedError: no capacity (keys cooling down, rate limits or a
+                full admission queue) before the deadline; carries retry_after
+            LLMError: the call failed permanently or ran out of budget
+        """
+        if cache is not None and cache_key:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self.metrics.incr("llm.cache", caller=profile, outcome="hit")
+                return LLMResult(text=cached, model="cache", latency_ms=0.0, attempts=0, cached=True)
+            self.metrics.incr("llm.cache", caller=profile, outcome="miss")
+
+        models = self._model_chain(model, fallback_models)
+        run = lambda leg=None: self._generate(
+            prompt, profile, models, temperature, deadline_s, max_attempts, config, leg
+        )
+        if self._should_hedge(profile):
+            result = self._hedged_generate(run, profile, models)
+        else:
+            result = run()
+
+        if cache is not None and cache_key and result.text:
+            cache.set(cache_key, result.text)
+        return result
+
+    def generate_structured(self, prompt: str, schema, profile: str = DEFAULT_PROFILE, **kwargs) -> LLMResult:
+        """
+        Generate JSON constrained to a pydantic model and return it validated
+        in result.parsed.
+
+        The model is sent to the provider as the response schema (JSON mode).
+        If the text still fails strict validation - a provider without schema
+        support, a truncated response - it goes through the tolerant parser
+        before giving up.
+
+        Args:
+            prompt: Prompt text
+            schema: pydantic BaseModel subclass describing the output
+            profile: Name of a CALL_PROFILES entry
+            **kwargs: Any other generate() argument
+
+        Raises:
+            LLMError: kind "parse" when no valid object could be recovered,
+                or any error generate() raises
+        """
+        config = dict(kwargs.pop("config", None) or {})
+        config.setdefault("response_mime_type", "application/json")
+        config.setdefault("response_schema", schema)
+        result = self.generate(prompt, profile=profile, config=config, **kwargs)
+        result.parsed = self._parse_structured(result.text, schema, profile)
+        return result
+
+    def _parse_structured(self, text: str, schema, profile: str):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            try:
+                return schema.model_validate_json(text)
+            except ValueError:
+                outcome = "repaired"
+            try:
+                return schema.model_validate(parse_tolerant(text, root="{"))
+            except (JSONParseError, ValueError) as e:
+                outcome = "failed"
+                logger.warning(f"[LLMGateway] {profile}: unparseable {schema.__name__} output: {text[:200]!r}")
+                raise LLMError(f"Could not parse {schema.__name__}: {e}", kind="parse") from e
+        finally:
+            self.metrics.incr("llm.parse", caller=profile, schema=schema.__name__, outcome=outcome)
+            self.metrics.observe("llm.parse_ms", (time.perf_counter() - started) * 1000, caller=profile)
+
+    def stream(
+        self,
+        prompt: str,
+        profile: str = DEFAULT_PROFILE,
+        model: Optional[str] = None,
+        fallback_models: Optional[List[str]] = None,
+        temperature: Optional[float] = None,
+        deadline_s: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        config: Optional[dict] = None,
+    ) -> Iterator[str]:
+        """
+        Stream a response as text chunks.
+
+        Keys and models can only be switched before the first chunk arrives;
+        a failure after that is raised to the caller as LLMError.
+        """
+        models = self._model_chain(model, fallback_models)
+        open_leg = lambda leg=None: self._stream(
+            prompt, profile, models, temperature, deadline_s, max_attempts, config, leg
+        )
+        if self._should_hedge(profile):
+            return self._hedged_stream(open_leg, profile, models)
+        return open_leg()
+
+    def _generate(self, prompt: str, profile: str, models: List[str], temperature: Optional[float],
+                  deadline_s: Optional[float], max_attempts: Optional[int], config: Optional[dict],
+                  leg: Optional[HedgeLeg] = None) -> LLMResult:
+        call_profile = CALL_PROFILES.get(profile, CALL_PROFILES[DEFAULT_PROFILE])
+        state = _CallState(call_profile, models, deadline_s, max_attempts)
+        temp = call_profile.temperature if temperature is None else temperature
+        started = time.monotonic()
+        if leg is not None:
+            state.model_index = leg.start_model_index
+
+        est_tokens = estimate_tokens(prompt, call_profile.expected_output_tokens)
+
+        with self._admit(state, profile, est_tokens):
+            while not state.exhausted():
+                if leg is not None:
+                    leg.check()
+                state.select_model(self.health)
+                api_key = self._acquire_key(state, profile, est_tokens, leg)
+                if leg is not None:
+                    leg.keys_used.add(api_key)
+                state.attempts += 1
+                attempt_started = time.monotonic()
+                try:
+                    with self.key_manager.track_inflight(api_key):
+                        text = self.provider.generate(api_key, state.model, prompt, temp, config)
+                except Exception as e:
+                    self._handle_failure(e, api_key, state, profile, attempt_started)
+                    continue
+
+                latency_ms = (time.monotonic() - attempt_started) * 1000
+                self._record_success(profile, api_key, state.model, latency_ms)
+                self._record_usage(api_key, est_tokens, estimate_tokens(prompt) + estimate_tokens(text))
+                return LLMResult(
+                    text=text,
+                    model=state.model,
+                    latency_ms=(time.monotonic() - started) * 1000,
+                    attempts=state.attempts
+                )
+
+            self._raise_budget_exhausted(state, profile)
+
+    def _stream(self, prompt: str, profile: str, models: List[str], temperature: Optional[float],
+                deadline_s: Optional[float], max_attempts: Optional[int], config: Optional[dict],
+                leg: Optional[HedgeLeg] = None) -> Iterator[str]:
+        call_profile = CALL_PROFILES.get(profile, CALL_PROFILES[DEFAULT_PROFILE])
+        state = _CallState(call_profile, models, deadline_s, max_attempts)
+        temp = call_profile.temperature if temperature is None else temperature
+        if leg is not None:
+            state.model_index = leg.start_model_index
+
+        est_tokens = estimate_tokens(prompt, call_profile.expected_output_tokens)
+
+        with self._admit(state, profile, est_tokens):
+            while not state.exhausted():
+                if leg is not None:
+                    leg.check()
+                state.select_model(self.health)
+                api_key = self._acquire_key(state, profile, est_tokens, leg)
+                if leg is not None:
+                    leg.keys_used.add(api_key)
+                state.attempts += 1
+                attempt_started = time.monotonic()
+                started = False
+                ttft_ms = None
+                output_chars = 0
+                try:
+                    with self.key_manager.track_inflight(api_key):
+                        for chunk in self.provider.stream(api_key, state.model, prompt, temp, config):
+                            if not started:
+                                started = True
+                                ttft_ms = (time.monotonic() - attempt_started) * 1000
+                                self.metrics.observe("llm.ttft_ms", ttft_ms, caller=profile)
+                            output_chars += len(chunk)
+                            yield chunk
+                except Exception as e:
+                    if started:
+                        self.metrics.incr("llm.calls", caller=profile, model=state.model, outcome="stream_broken")
+                        self.health.record(api_key, state.model, None, ok=False,
+                                           breaker_failure=classify_error(e) == "transient")
+                        raise LLMError(f"Stream interrupted: {e}", kind=classify_error(e)) from e
+                    self._handle_failure(e, api_key, state, profile, attempt_started)
+                    continue
+
+                # Streams are ranked by time to first token
+                self._record_success(profile, api_key, state.model, (time.monotonic() - attempt_started) * 1000,
+                                     health_latency_ms=ttft_ms)
+                self._record_usage(api_key, est_tokens, estimate_tokens(prompt) + output_chars // 4)
+                return
+
+            self._raise_budget_exhausted(state, profile)
+
+    # --- hedging ---
+
+    def _should_hedge(self, profile: str) -> bool:
+        call_profile = CALL_PROFILES.get(profile, CALL_PROFILES[DEFAULT_PROFILE])
+        return call_profile.hedge and get_hedge_policy().enabled
+
+    def _plan_hedge(self, primary: HedgeLeg, profile: str, models: List[str]) -> Optional[HedgeLeg]:
+        """Second leg on another key, or on the fallback model if no other key is free"""
+        policy = get_hedge_policy()
+        other_keys = [k for k in self.key_manager.available_keys() if k not in primary.keys_used]
+        if other_keys:
+            leg = HedgeLeg("hedge", avoid_keys=primary.keys_used)
+        elif len(models) > 1:
+            leg = HedgeLeg("hedge", start_model_index=1)
+        else:
+            self.metrics.incr("llm.hedge", caller=profile, outcome="no_alternative")
+            return None
+        if not policy.try_spend(profile):
+            self.metrics.incr("llm.hedge", caller=profile, outcome="budget_denied")
+            return None
+        self.metrics.incr("llm.hedge", caller=profile, outcome="fired")
+        return leg
+
+    def _record_hedge_result(self, profile: str, winner: HedgeLeg, effective_ms: float):
+        self.metrics.incr("llm.hedge", caller=profile, outcome=f"{winner.name}_won")
+        self.metrics.observe("llm.hedge_effective_ms", effective_ms, caller=profile)
+        if winner.name == "primary":
+            self.metrics.observe("llm.hedge_primary_ms", effective_ms, caller=profile)
+
+    def _hedged_generate(self, run, profile: str, models: List[str]) -> LLMResult:
+        policy = get_hedge_policy()
+        policy.record_primary(profile)
+        delay = policy.delay_s(profile, "llm.latency_ms", outcome="ok")
+        started = time.monotonic()
+        pool = get_hedge_pool()
+        primary = HedgeLeg("primary")
+        primary_future = pool.submit(run, primary)
+
+        hedge = None
+        if delay is not None:
+            done, _ = wait([primary_future], timeout=delay)
+            if not done:
+                hedge = self._plan_hedge(primary, profile, models)
+        if hedge is None:
+            result = primary_future.result()
+            self._record_hedge_result(profile, primary, (time.monotonic() - started) * 1000)
+            return result
+
+        legs = {primary_future: primary, pool.submit(run, hedge): hedge}
+        pending = set(legs)
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                winner = legs[future]
+                effective_ms = (time.monotonic() - started) * 1000
+                for other in pending:
+                    legs[other].cancelled.set()
+                if winner is hedge:
+                    # The primary cannot be interrupted mid-call; record its real latency when it lands
+                    primary_future.add_done_callback(lambda f: self.metrics.observe(
+                        "llm.hedge_primary_ms", (time.monotonic() - started) * 1000, caller=profile
+                    ))
+                self._record_hedge_result(profile, winner, effective_ms)
+                return result
+        raise first_error
+
+    def _hedged_stream(self, open_leg, profile: str, models: List[str]) -> Iterator[str]:
+        policy = get_hedge_policy()
+        policy.record_primary(profile)
+        delay = policy.delay_s(profile, "llm.ttft_ms")
+        started = time.monotonic()
+        events: "queue.Queue" = queue.Queue()
+
+        def pump(leg: HedgeLeg):
+            chunks = open_leg(leg)
+            try:
+                for chunk in chunks:
+                    if leg.cancelled.is_set():
+                        return
+                    events.put((leg, "chunk", chunk))
+                events.put((leg, "end", None))
+            except BaseException as e:
+                events.put((leg, "error", e))
+            finally:
+                chunks.close()  # closes the provider stream of a cancelled leg
+
+        primary = HedgeLeg("primary")
+        legs = [primary]
+        live = 1
+        hedge_decided = delay is None
+        winner = None
+        first_error = None
+        get_hedge_pool().submit(pump, primary)
+        try:
+            while True:
+                timeout = None
+                if not hedge_decided:
+                    timeout = max(0.0, started + delay - time.monotonic())
+                try:
+                    leg, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_decided = True
+                    hedge = self._plan_hedge(primary, profile, models)
+                    if hedge is not None:
+                        legs.append(hedge)
+                        live += 1
+                        get_hedge_pool().submit(pump, hedge)
+                    continue
+
+                if winner is None:
+                    if kind == "error":
+                        live -= 1
+                        first_error = first_error or value
+                        if live > 0:
+                            continue
+                        raise first_error
+                    winner = leg
+                    hedge_decided = True
+                    for other in legs:
+                        if other is not winner:
+                            other.cancelled.set()
+                    effective_ms = (time.monotonic() - started) * 1000
+                    if winner is not primary:
+                        # Primary was cut off: its latency is at least this long
+                        self.metrics.observe("llm.hedge_primary_ms", effective_ms, caller=profile)
+                    self._record_hedge_result(profile, winner, effective_ms)
+                if leg is not winner:
+                    continue
+                if kind == "chunk":
+                    yield value
+                elif kind == "end":
+                    return
+                else:
+                    raise value
+        finally:
+            for leg in legs:
+                leg.cancelled.set()
+
+    # --- internals ---
+
+    @staticmethod
+    def _model_chain(model: Optional[str], fallback_models: Optional[List[str]]) -> List[str]:
+        primary = model or DEFAULT_MODEL
+        fallbacks = DEFAULT_FALLBACK_MODELS if fallback_models is None else fallback_models
+        return [primary] + [m for m in fallbacks if m != primary]
+
+    def _admit(self, state: _CallState, profile: str, est_tokens: int):
+        """Hold an admission slot for the whole call (bounded concurrency and queue)"""
+        def retry_after() -> float:
+            # A slot frees up roughly one typical call from now, unless keys need longer
+            p50_ms = self.metrics.percentile("llm.latency_ms", 0.5, caller=profile, outcome="ok") or 1000.0
+            return max(self._next_capacity_in(est_tokens), p50_ms / 1000)
+
+        return get_admission_controller().admit(state.deadline, caller=profile, retry_after=retry_after)
+
+    def _next_capacity_in(self, est_tokens: int) -> float:
+        """Seconds until a key is expected to accept this call (cooldowns and rate limits)"""
+        key_manager = self.key_manager
+        wait = key_manager.next_available_in()
+        limiter = get_rate_limiter()
+        if limiter is not None:
+            keys = key_manager.available_keys() or key_manager.keys
+            wait = max(wait, limiter.next_capacity_in(keys, est_tokens))
+        return wait
+
+    def _acquire_key(self, state: _CallState, profile: str, est_tokens: int,
+                     leg: Optional[HedgeLeg] = None) -> str:
+        """
+        Get a key for the next attempt. Keys on cooldown are skipped; with rate
+        limiting on, the caller queues for a key with RPM/TPM headroom. Nothing
+        here sleeps past the call deadline: if no key can be ready in time the
+        call fails fast with QuotaExhaustedError and a real retry_after.
+        """
+        key_manager = self.key_manager
+        limiter = get_rate_limiter()
+        avoid = leg.avoid_keys if leg is not None else ()
+        ranked_keys = lambda: self._ranked_keys(state.model, avoid)
+        while True:
+            if limiter is None:
+                keys = ranked_keys()
+                if keys:
+                    return keys[0]
+            elif key_manager.available_keys():
+                timeout = min(state.remaining(), state.profile.max_quota_wait_s)
+                queued_at = time.monotonic()
+                key = limiter.acquire(ranked_keys, est_tokens, timeout)
+                self.metrics.observe("llm.queue_wait_ms", (time.monotonic() - queued_at) * 1000, caller=profile)
+                if key is not None:
+                    return key
+                self.metrics.incr("llm.calls", caller=profile, model=state.model, outcome="rate_limited")
+                raise QuotaExhaustedError(
+                    "No API key has rate-limit headroom right now.",
+                    retry_after=max(1, limiter.next_capacity_in(key_manager.keys, est_tokens))
+                )
+
+            # Every key is cooling down after a 429
+            wait = key_manager.next_available_in()
+            if wait > state.profile.max_quota_wait_s or wait >= state.remaining():
+                self.metrics.incr("llm.calls", caller=profile, model=state.model, outcome="quota_exhausted")
+                raise QuotaExhaustedError(
+                    f"All {len(key_manager.keys)} API keys are rate-limited. "
+                    f"Next key available in {int(wait)} seconds.",
+                    retry_after=max(1, wait)
+                )
+            logger.warning(f"[LLMGateway] All keys cooling down, queueing for {wait:.1f}s")
+            queued_at = time.monotonic()
+            waited = get_admission_controller().wait_for_capacity(wait + 0.05, state.deadline)
+            self.metrics.observe("llm.queue_wait_ms", (time.monotonic() - queued_at) * 1000, caller=profile)
+            if not waited:
+                # The wait would overrun the deadline; fail now instead of re-checking in a tight loop
+                self.metrics.incr("llm.calls", caller=profile, model=state.model, outcome="quota_exhausted")
+                raise QuotaExhaustedError(
+                    f"All {len(key_manager.keys)} API keys are rate-limited. "
+                    f"Next key available in {int(wait)} seconds.",
+                    retry_after=max(1, wait)
+                )
+
+    def _ranked_keys(self, model: str, avoid=()) -> List[str]:
+        """Keys off cooldown, fastest/least-loaded first for this model (avoided keys last)"""
+        key_manager = self.key_manager
+        ranked = self.health.rank_keys(key_manager.available_keys(), model, key_manager.get_inflight())
+        if avoid:
+            ranked = [k for k in ranked if k not in avoid] + [k for k in ranked if k in avoid]
+        return ranked
+
+    def _record_usage(self, api_key: str, estimated_tokens: int, actual_tokens: int):
+        limiter = get_rate_limiter()
+        if limiter is not None:
+            limiter.record_usage(api_key, estimated_tokens, actual_tokens)
+
+    def _handle_failure(self, error: Exception, api_key: str, state: _CallState, profile: str, attempt_started: float):
+        kind = classify_error(error)
+        state.last_error = error
+        latency_ms = (time.monotonic() - attempt_started) * 1000
+        self.metrics.incr("llm.calls", caller=profile, model=state.model, outcome=kind)
+        self.metrics.observe("llm.latency_ms", latency_ms, caller=profile, outcome="error")
+        logger.warning(f"[LLMGateway] {profile} call failed on {state.model} ({kind}): {str(error)[:200]}")
+
+        # Only 5xx/timeouts (and missing models) say anything about key/model health
+        breaker_opened = self.health.record(
+            api_key, state.model, latency_ms, ok=False, breaker_failure=kind in ("transient", "model")
+        )
+        if breaker_opened:
+            self.metrics.incr("llm.breaker_open", model=state.model)
+            logger.warning(f"[LLMGateway] Circuit breaker opened for {state.model}")
+
+        if kind == "quota":
+            self.key_manager.mark_exhausted(api_key, cooldown_seconds=QUOTA_COOLDOWN_SECONDS)
+            return
+        if kind == "model":
+            if not state.next_model():
+                raise LLMError(f"No usable model in fallback chain: {error}", kind=kind) from error
+            return
+        if kind == "fatal":
+            raise LLMError(str(error), kind=kind) from error
+
+        # Transient: move down the fallback chain at once if the model's breaker is open
+        # (or this call keeps failing on it); otherwise back off and retry
+        state.model_failures += 1
+        if not self.health.model_available(state.model) or state.model_failures >= state.profile.failures_per_model:
+            if state.next_model():
+                return
+        backoff = min(
+            state.profile.backoff_max_s,
+            state.profile.backoff_base_s * (2 ** (state.attempts - 1))
+        ) * random.uniform(0.5, 1.0)
+        if not state.exhausted():
+            time.sleep(max(0.0, min(backoff, state.remaining())))
+
+    def _record_success(self, profile: str, api_key: str, model: str, latency_ms: float,
+                        health_latency_ms: Optional[float] = None):
+        self.metrics.incr("llm.calls", caller=profile, model=model, outcome="ok")
+        self.metrics.observe("llm.latency_ms", latency_ms, caller=profile, outcome="ok")
+        self.health.record(api_key, model, health_latency_ms if health_latency_ms is not None else latency_ms, ok=True)
+        # A key answered: callers queued on cooldowns can re-check right away
+        get_admission_controller().capacity_returned()
+
+    def _raise_budget_exhausted(self, state: _CallState, profile: str):
+        self.metrics.incr("llm.budget_exhausted", caller=profile)
+        if state.last_error is not None and classify_error(state.last_error) == "quota":
+            raise QuotaExhaustedError(
+                f"Quota exhausted after {state.attempts} attempts",
+                retry_after=max(1, self.key_manager.next_available_in())
+            )
+        raise LLMError(
+            f"LLM call failed after {state.attempts} attempts: {state.last_error}",
+            kind="budget"
+        )
+
+
+def create_provider():
+    """
+    Build the provider selected by LLM_PROVIDER:
+        gemini    - default; real Gemini calls
+        simulator - offline fake LLM for load tests and benchmarks (see simulator.py)
+        module.path:ClassName - any class with generate() / stream()
+
+    With OPEC_CASSETTE_MODE=record the provider is wrapped so calls are recorded;
+    with replay, calls are served from the cassette instead.
+    """
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        return CassetteProvider(cassette)
+
+    name = os.environ.get("LLM_PROVIDER", "gemini")
+    if name == "gemini":
+        provider = GeminiProvider()
+    elif name == "simulator":
+        from .simulator import SimulatorProvider
+        provider = SimulatorProvider()
+    else:
+        module_name, _, class_name = name.partition(":")
+        provider = getattr(importlib.import_module(module_name), class_name)()
+
+    if cassette is not None and cassette.recording:
+        return CassetteProvider(cassette, inner=provider)
+    return provider
+
+
+# Global singleton instance
+_gateway: Optional[LLMGateway] = None
+
+
+def get_gateway() -> LLMGateway:
+    """Get or create the global LLMGateway singleton"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(provider=create_provider())
+        logger.info(f"[LLMGateway] Using provider: {_gateway.provider.name}")
+    return _gateway
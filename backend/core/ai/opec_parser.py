@@ -0,0 +1,214 @@
+"""
+Incremental parser for the fast-mode OPEC response format.
+
+The unified prompt asks the model to answer in four marked sections:
+
+    [[OBSERVATION]] ... [[PATTERN]] ... [[EVALUATION]] ... [[CLARITY]] ...
+
+OPECStreamParser consumes the model's token stream chunk by chunk, in a
+single pass, and emits events as text arrives:
+- "delta": new text for the section currently being generated
+- "section": a section is complete (the next marker arrived or the stream ended)
+
+Markers split across chunk boundaries (e.g. "[[PAT" + "TERN]]") are held back
+until they can be resolved, so no partial marker ever leaks into a delta.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+SECTIONS = ("observation", "pattern", "evaluation", "clarity")
+
+_MARKERS = {f"[[{name.upper()}]]": name for name in SECTIONS}
+_MARKER_RE = re.compile(r"\[\[(OBSERVATION|PATTERN|EVALUATION|CLARITY)\]\]")
+_MAX_MARKER_LEN = max(len(m) for m in _MARKERS)
+
+# Canonical pattern id -> phrases the model uses for it
+PATTERN_ALIASES = {
+    "external_pressure": ["external pressure", "external_pressure", "parental pressure", "peer pressure"],
+    "sunk_cost": ["sunk cost", "sunk_cost"],
+    "analysis_paralysis": ["analysis paralysis", "analysis_paralysis", "circular thinking", "circular_thinking"],
+    "imposter_syndrome": ["imposter syndrome", "impostor syndrome", "imposter_syndrome", "confidence issues"],
+    "confirmation_bias": ["confirmation bias", "confirmation_bias"],
+}
+
+_ALIAS_TO_PATTERN = {alias: pid for pid, aliases in PATTERN_ALIASES.items() for alias in aliases}
+_PATTERN_RE = re.compile(
+    r"\b(" + "|".join(re.escape(a) for a in sorted(_ALIAS_TO_PATTERN, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+_INTENSITY_RE = re.compile(r"\b(low|medium|moderate|high|strong|weak)\b|\b(\d{1,2}(?:\.\d+)?)\s*/\s*10\b", re.IGNORECASE)
+_NEGATION_RE = re.compile(r"\b(no|not|none|absent|without)\b", re.IGNORECASE)
+
+INTENSITY_SCORES = {
+    "low": 0.3,
+    "weak": 0.3,
+    "medium": 0.6,
+    "moderate": 0.6,
+    "high": 1.0,
+    "strong": 1.0,
+}
+# A pattern named without a rating keeps the legacy "detected" score
+UNRATED_SCORE = 1.0
+
+
+@dataclass
+class SectionEvent:
+    """A single parser event"""
+    kind: str          # "delta" or "section"
+    section: str       # one of SECTIONS
+    text: str
+
+
+@dataclass
+class OPECParseResult:
+    """Final parsed view of an OPEC response"""
+    final_response: str
+    thinking: Dict[str, str] = field(default_factory=dict)
+    patterns: Dict[str, float] = field(default_factory=dict)
+
+
+def extract_pattern_scores(pattern_text: str) -> Dict[str, float]:
+    """
+    Extract pattern scores from the [[PATTERN]] section.
+
+    Each line is scanned for a known pattern name and an intensity rating
+    (Low/Medium/High or N/10). Lines that negate a pattern ("No sunk cost")
+    are ignored. The highest rating seen for a pattern wins.
+    """
+    scores: Dict[str, float] = {}
+    for line in pattern_text.splitlines():
+        matches = list(_PATTERN_RE.finditer(line))
+        if not matches:
+            continue
+
+        intensity = _INTENSITY_RE.search(line)
+        if intensity and intensity.group(1):
+            score = INTENSITY_SCORES[intensity.group(1).lower()]
+        elif intensity and intensity.group(2):
+            score = max(0.0, min(1.0, float(intensity.group(2)) / 10))
+        else:
+            score = UNRATED_SCORE
+
+        for match in matches:
+            # Only negations in front of the name count ("not imposter syndrome")
+            if _NEGATION_RE.search(line[:match.start()]):
+                continue
+            pid = _ALIAS_TO_PATTERN[match.group(1).lower()]
+            scores[pid] = max(scores.get(pid, 0.0), score)
+    return scores
+
+
+class OPECStreamParser:
+    """
+    Single-pass incremental parser for the OPEC section format.
+
+    Usage:
+        parser = OPECStreamParser()
+        for chunk in stream:
+            for event in parser.feed(chunk):
+                ...
+        for event in parser.close():
+            ...
+        result = parser.result()
+    """
+
+    def __init__(self):
+        self._pending = ""              # unresolved tail (possible partial marker)
+        self._current: Optional[str] = None
+        self._sections: Dict[str, List[str]] = {}
+        self._started = set()           # sections that already have visible text
+        self._preamble: List[str] = []  # text before the first marker
+        self._raw: List[str] = []
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[SectionEvent]:
+        """Consume a chunk of model output and return the resulting events"""
+        if self._closed or not chunk:
+            return []
+        self._raw.append(chunk)
+        text = self._pending + chunk
+        events: List[SectionEvent] = []
+
+        pos = 0
+        for match in _MARKER_RE.finditer(text):
+            self._emit_text(text[pos:match.start()], events)
+            self._switch_section(_MARKERS[match.group(0)], events)
+            pos = match.end()
+
+        # Hold back a tail that may be the start of a marker split across chunks
+        tail = text[pos:]
+        hold = self._partial_marker_len(tail)
+        self._emit_text(tail[:len(tail) - hold], events)
+        self._pending = tail[len(tail) - hold:]
+        return events
+
+    def close(self) -> List[SectionEvent]:
+        """Flush buffered text and complete the open section"""
+        if self._closed:
+            return []
+        events: List[SectionEvent] = []
+        self._emit_text(self._pending, events)
+        self._pending = ""
+        if self._current:
+            events.append(SectionEvent("section", self._current, self.section_text(self._current)))
+        self._closed = True
+        return events
+
+    def section_text(self, section: str) -> str:
+        return "".join(self._sections.get(section, [])).strip()
+
+    def result(self) -> OPECParseResult:
+        """Build the final response, thinking panels and pattern scores"""
+        thinking = {name: self.section_text(name) for name in SECTIONS if name != "clarity"}
+        if "clarity" in self._sections:
+            final_response = self.section_text("clarity")
+        else:
+            # No structured answer: fall back to the raw model text
+            final_response = "".join(self._raw).strip()
+        return OPECParseResult(
+            final_response=final_response,
+            thinking=thinking,
+            patterns=extract_pattern_scores(thinking["pattern"])
+        )
+
+    def _switch_section(self, section: str, events: List[SectionEvent]):
+        if self._current:
+            events.append(SectionEvent("section", self._current, self.section_text(self._current)))
+        self._current = section
+        self._sections.setdefault(section, [])
+
+    def _emit_text(self, text: str, events: List[SectionEvent]):
+        if not text:
+            return
+        if self._current is None:
+            self._preamble.append(text)
+            return
+        if self._current not in self._started:
+            # Drop the whitespace/newline that follows a marker
+            text = text.lstrip()
+            if not text:
+                return
+            self._started.add(self._current)
+        self._sections[self._current].append(text)
+        events.append(SectionEvent("delta", self._current, text))
+
+    @staticmethod
+    def _partial_marker_len(tail: str) -> int:
+        """Length of the longest suffix of tail that is a proper prefix of a marker"""
+        start = tail.find("[", max(0, len(tail) - _MAX_MARKER_LEN))
+        while start != -1:
+            suffix = tail[start:]
+            if any(marker.startswith(suffix) for marker in _MARKERS):
+                return len(suffix)
+            start = tail.find("[", start + 1)
+        return 0
+
+
+def parse_opec_response(raw_response: str) -> OPECParseResult:
+    """Parse a complete (non-streamed) OPEC response"""
+    parser = OPECStreamParser()
+    parser.feed(raw_response)
+    parser.close()
+    return parser.result()
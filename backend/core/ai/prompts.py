@@ -97,6 +97,7 @@ Output your response in the following strictly structured format:
   * Analysis Paralysis / Circular Thinking
   * Imposter Syndrome / Confidence Issues
   * Confirmation Bias
+- List each detected pattern on its own line as "Pattern Name: Low/Medium/High".
 - Rate the strongest pattern's intensity (Low/Medium/High).
 
 [[EVALUATION]]
@@ -0,0 +1,212 @@
+"""
+Proactive per-key rate limiting for Gemini calls.
+
+Instead of firing calls until Gemini answers 429, each API key gets two token
+buckets (requests per minute and tokens per minute). Before a call is sent
+the gateway asks the limiter for a key that has headroom for the estimated
+prompt size; if none does, the caller waits briefly in a FIFO queue until a
+bucket refills. With traffic spread over every key that has headroom, total
+throughput approaches the sum of the key quotas.
+
+Limits (the full quota of each key):
+    GEMINI_RPM_PER_KEY / GEMINI_TPM_PER_KEY       defaults for every key
+    GEMINI_API_KEY_<n>_RPM / GEMINI_API_KEY_<n>_TPM  per-key overrides
+Buckets live in each worker process, so the limits are divided by
+WEB_CONCURRENCY (the gunicorn worker count).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Rough chars-per-token ratio for prompt-size estimates
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str, expected_output_tokens: int = 0) -> int:
+    """Cheap token estimate for a prompt plus the expected reply size"""
+    return max(1, len(text) // CHARS_PER_TOKEN) + expected_output_tokens
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own (callers hold a lock)"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated = now
+
+    def available(self, now: Optional[float] = None) -> float:
+        self._refill(now or time.monotonic())
+        return self.tokens
+
+    def time_until(self, amount: float, now: Optional[float] = None) -> float:
+        """Seconds until `amount` tokens are available (inf if it can never fit)"""
+        now = now or time.monotonic()
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float, now: Optional[float] = None):
+        """Take tokens (may go negative when correcting an under-estimate)"""
+        self._refill(now or time.monotonic())
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class KeyRateLimiter:
+    """
+    Per-key RPM/TPM buckets with a fair (FIFO) wait queue.
+
+    acquire() hands out the first candidate (callers pass keys best-first)
+    that has headroom; callers that cannot be served wait their turn.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]]):
+        """
+        Args:
+            limits: key -> {"rpm": requests per minute, "tpm": tokens per minute}
+        """
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._rpm: Dict[str, TokenBucket] = {}
+        self._tpm: Dict[str, TokenBucket] = {}
+        for key, limit in limits.items():
+            self._rpm[key] = TokenBucket(limit["rpm"], limit["rpm"] / 60.0)
+            self._tpm[key] = TokenBucket(limit["tpm"], limit["tpm"] / 60.0)
+
+    def _headroom_wait(self, key: str, tokens: int, now: float) -> float:
+        if key not in self._rpm:
+            return 0.0  # unknown key: not limited
+        return max(self._rpm[key].time_until(1, now), self._tpm[key].time_until(tokens, now))
+
+    def acquire(self, candidates: Callable[[], List[str]], tokens: int, timeout: float) -> Optional[str]:
+        """
+        Reserve one request and `tokens` tokens on a key with headroom.
+
+        Args:
+            candidates: Returns usable keys (e.g. not cooling down), most preferred first
+            tokens: Estimated tokens for the call
+            timeout: Longest time to wait in the queue
+
+        Returns:
+            The reserved key, or None if nothing had headroom within the timeout
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] is ticket:
+                        keys = candidates()
+                        key = next((k for k in keys if self._headroom_wait(k, tokens, now) == 0.0), None)
+                        if key is not None:
+                            if key in self._rpm:
+                                self._rpm[key].consume(1, now)
+                                self._tpm[key].consume(tokens, now)
+                            return key
+                        wait = min((self._headroom_wait(k, tokens, now) for k in keys), default=0.5)
+                    else:
+                        wait = deadline - now  # woken by notify when the head leaves
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(min(max(wait, 0.01), remaining))
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def record_usage(self, key: str, estimated_tokens: int, actual_tokens: int):
+        """Correct the TPM bucket once the real call size is known"""
+        with self._cond:
+            bucket = self._tpm.get(key)
+            if bucket is None:
+                return
+            delta = actual_tokens - estimated_tokens
+            if delta > 0:
+                bucket.consume(delta)
+            elif delta < 0:
+                bucket.refund(-delta)
+            self._cond.notify_all()
+
+    def next_capacity_in(self, keys: List[str], tokens: int) -> float:
+        """Seconds until any of `keys` has headroom for `tokens`"""
+        with self._cond:
+            now = time.monotonic()
+            return min((self._headroom_wait(k, tokens, now) for k in keys), default=0.0)
+
+    def get_status(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queued": len(self._queue),
+                "keys": [
+                    {
+                        "key_index": i,
+                        "rpm_available": round(self._rpm[k].available(now), 2),
+                        "tpm_available": int(self._tpm[k].available(now)),
+                    }
+                    for i, k in enumerate(self._rpm)
+                ]
+            }
+
+
+def limits_from_env(keys: List[str], env_indexes: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Build per-key limits from the environment (see module docstring).
+
+    Args:
+        keys: API keys
+        env_indexes: key -> n of its GEMINI_API_KEY_<n> variable, so overrides
+            still match when a lower-numbered key is unset (default: position)
+    """
+    workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "2")))
+    default_rpm = float(os.environ.get("GEMINI_RPM_PER_KEY", "15"))
+    default_tpm = float(os.environ.get("GEMINI_TPM_PER_KEY", "1000000"))
+    limits = {}
+    for position, key in enumerate(keys, start=1):
+        i = (env_indexes or {}).get(key, position)
+        rpm = float(os.environ.get(f"GEMINI_API_KEY_{i}_RPM", default_rpm))
+        tpm = float(os.environ.get(f"GEMINI_API_KEY_{i}_TPM", default_tpm))
+        limits[key] = {"rpm": max(1.0, rpm / workers), "tpm": max(1000.0, tpm / workers)}
+    return limits
+
+
+# Global singleton instance
+_rate_limiter: Optional[KeyRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[KeyRateLimiter]:
+    """
+    Get or create the global KeyRateLimiter, or None when rate limiting is
+    disabled (GEMINI_RATE_LIMIT=off).
+    """
+    global _rate_limiter
+    if os.environ.get("GEMINI_RATE_LIMIT", "on").lower() in ("off", "0", "false"):
+        return None
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                from .api_key_manager import get_key_manager
+                manager = get_key_manager()
+                _rate_limiter = KeyRateLimiter(limits_from_env(manager.keys, manager.env_indexes))
+    return _rate_limiter
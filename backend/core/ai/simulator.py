@@ -0,0 +1,242 @@
+"""
+Offline LLM simulator.
+
+A drop-in provider for LLMGateway (LLM_PROVIDER=simulator) that never touches
+the network. It recognises the prompts this backend sends and answers in the
+format each caller parses:
+- OPEC unified prompt  -> [[OBSERVATION]] ... [[CLARITY]] sections
+- LangGraph agents     -> the JSON each agent node expects
+- career simulation    -> roadmap/analysis JSON
+- interview report     -> report JSON
+- anything else        -> plain text
+
+Latency, streaming speed and failures are configurable so key rotation,
+retries, hedging and end-to-end throughput can be measured on a laptop:
+
+    LLM_SIM_LATENCY_MS        median time to first token (default 800)
+    LLM_SIM_LATENCY_SIGMA     lognormal spread of that latency (default 0.5)
+    LLM_SIM_TAIL_RATE         fraction of calls hit by a slow tail (default 0.01)
+    LLM_SIM_TAIL_MS           extra latency for tail calls (default 8000)
+    LLM_SIM_TOKENS_PER_SECOND streaming / generation speed (default 120)
+    LLM_SIM_429_RATE          chance a call fails with 429 (default 0)
+    LLM_SIM_5XX_RATE          chance a call fails with 503 (default 0)
+    LLM_SIM_RPM_PER_KEY       per-key quota; calls over it get 429 (default 0 = off)
+    LLM_SIM_KEYS              fake API keys when none are configured (default 3)
+    LLM_SIM_SEED              random seed for reproducible runs
+"""
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from .rate_limiter import CHARS_PER_TOKEN
+
+PATTERN_NAMES = ["External Pressure", "Sunk Cost Fallacy", "Circular Thinking",
+                 "Imposter Syndrome", "Confirmation Bias"]
+ROLES = ["Intern", "Junior Developer", "Software Engineer", "Senior Engineer", "Tech Lead", "Engineering Manager"]
+
+
+class SimulatedAPIError(Exception):
+    """Error raised by the simulator; its text matches what classify_error expects"""
+    pass
+
+
+def simulator_keys() -> List[str]:
+    """Fake API keys used when the simulator runs without real keys"""
+    return [f"sim-key-{i}" for i in range(1, int(os.environ.get("LLM_SIM_KEYS", "3")) + 1)]
+
+
+class SimulatorProvider:
+    """Fake LLM provider with the same generate()/stream() interface as GeminiProvider"""
+
+    name = "simulator"
+
+    def __init__(self, seed: Optional[int] = None):
+        env_seed = os.environ.get("LLM_SIM_SEED")
+        self.random = random.Random(seed if seed is not None else (int(env_seed) if env_seed else None))
+        self.latency_ms = float(os.environ.get("LLM_SIM_LATENCY_MS", "800"))
+        self.latency_sigma = float(os.environ.get("LLM_SIM_LATENCY_SIGMA", "0.5"))
+        self.tail_rate = float(os.environ.get("LLM_SIM_TAIL_RATE", "0.01"))
+        self.tail_ms = float(os.environ.get("LLM_SIM_TAIL_MS", "8000"))
+        self.tokens_per_second = float(os.environ.get("LLM_SIM_TOKENS_PER_SECOND", "120"))
+        self.rate_429 = float(os.environ.get("LLM_SIM_429_RATE", "0"))
+        self.rate_5xx = float(os.environ.get("LLM_SIM_5XX_RATE", "0"))
+        self.rpm_per_key = int(os.environ.get("LLM_SIM_RPM_PER_KEY", "0"))
+        self._lock = threading.Lock()
+        self._calls: Dict[str, deque] = {}
+
+    # --- provider interface ---
+
+    def generate(self, api_key: str, model: str, prompt: str, temperature: float,
+                 config: Optional[dict] = None) -> str:
+        self._admit(api_key)
+        text = self.respond(prompt)
+        time.sleep(self._first_token_delay() + self._generation_time(text))
+        return text
+
+    def stream(self, api_key: str, model: str, prompt: str, temperature: float,
+               config: Optional[dict] = None) -> Iterator[str]:
+        self._admit(api_key)
+        text = self.respond(prompt)
+        time.sleep(self._first_token_delay())
+        chunk_chars = 40
+        per_chunk = chunk_chars / (self.tokens_per_second * CHARS_PER_TOKEN)
+        for i in range(0, len(text), chunk_chars):
+            if i:
+                time.sleep(per_chunk)
+            yield text[i:i + chunk_chars]
+
+    # --- timing and failures ---
+
+    def _first_token_delay(self) -> float:
+        with self._lock:
+            delay = self.latency_ms * math.exp(self.random.gauss(0, self.latency_sigma))
+            if self.random.random() < self.tail_rate:
+                delay += self.tail_ms
+        return delay / 1000
+
+    def _generation_time(self, text: str) -> float:
+        return len(text) / CHARS_PER_TOKEN / self.tokens_per_second
+
+    def _admit(self, api_key: str):
+        """Raise a simulated 429/503 according to the configured rates and per-key quota"""
+        now = time.monotonic()
+        with self._lock:
+            roll = self.random.random()
+            if self.rpm_per_key:
+                calls = self._calls.setdefault(api_key, deque())
+                while calls and now - calls[0] > 60:
+                    calls.popleft()
+                if len(calls) >= self.rpm_per_key:
+                    raise SimulatedAPIError("429 RESOURCE_EXHAUSTED: simulated per-key quota exceeded")
+                calls.append(now)
+        if roll < self.rate_429:
+            raise SimulatedAPIError("429 RESOURCE_EXHAUSTED: simulated quota error")
+        if roll < self.rate_429 + self.rate_5xx:
+            raise SimulatedAPIError("503 UNAVAILABLE: simulated server error")
+
+    # --- responses ---
+
+    def respond(self, prompt: str) -> str:
+        """Schema-valid response text for a prompt"""
+        if "[[OBSERVATION]]" in prompt and "[[CLARITY]]" in prompt:
+            return self._opec_response(prompt)
+        if "OBSERVATION AGENT" in prompt:
+            return json.dumps({
+                "core_concern": self._user_message(prompt)[:120] or "career direction",
+                "emotional_tone": self._pick(["anxious", "curious", "confused", "hopeful"]),
+                "unspoken_needs": ["reassurance", "a concrete plan"]
+            })
+        if "PATTERN AGENT" in prompt:
+            return json.dumps({"detected_patterns": {
+                "external_pressure": self._randint(0, 10),
+                "internal_conflict": self._randint(0, 10),
+                "circular_thinking": self._randint(0, 10),
+                "identity_uncertainty": self._randint(0, 10)
+            }})
+        if "EVALUATION AGENT" in prompt:
+            return json.dumps({
+                "market_insight": "Entry-level demand is steady for candidates with project experience.",
+                "reality_check": "A focused 6-month plan is realistic; trying everything at once is not."
+            })
+        if '"roadmap"' in prompt:
+            return json.dumps(self._simulation(prompt))
+        if '"overall_score"' in prompt:
+            return json.dumps(self._report())
+        return self._paragraph(self._randint(60, 160))
+
+    def _opec_response(self, prompt: str) -> str:
+        name = self._student_name(prompt)
+        with self._lock:
+            patterns = self.random.sample(PATTERN_NAMES, 2)
+        levels = [self._pick(["Low", "Medium", "High"]) for _ in patterns]
+        return (
+            "[[OBSERVATION]]\n"
+            f"- The student is weighing options and mentions uncertainty about the next step.\n"
+            f"- {self._paragraph(25)}\n\n"
+            "[[PATTERN]]\n"
+            + "".join(f"{p}: {lvl}\n" for p, lvl in zip(patterns, levels))
+            + f"- Strongest pattern intensity: {levels[0]}\n\n"
+            "[[EVALUATION]]\n"
+            f"- Strategy: {self._pick(['Validate and Empathize', 'Challenge Constructively', 'Provide Concrete Information'])}\n"
+            f"- {self._paragraph(20)}\n\n"
+            "[[CLARITY]]\n"
+            f"Hi {name}, {self._paragraph(self._randint(80, 150))}"
+        )
+
+    def _simulation(self, prompt: str) -> dict:
+        years = self._randint(4, 6)
+        roadmap = [
+            {
+                "year": year,
+                "title": f"Year {year}: {self._pick(['Foundation', 'Specialization', 'Impact', 'Leadership'])}",
+                "role": ROLES[min(year - 1, len(ROLES) - 1)],
+                "focus": self._paragraph(6),
+                "skills_to_acquire": [self._paragraph(3) for _ in range(3)],
+                "milestones": [self._paragraph(8) for _ in range(2)]
+            }
+            for year in range(1, years + 1)
+        ]
+        return {
+            "roadmap": roadmap,
+            "analysis": {
+                "counselor_view": f"{self._student_name(prompt)}, {self._paragraph(40)}",
+                "market_outlook": self._paragraph(30),
+                "skill_gaps": self._paragraph(20),
+                "salary_projection": f"₹{self._randint(4, 8)}L - ₹{self._randint(12, 25)}L",
+                "risk_assessment": self._paragraph(20),
+                "backup_paths": ["Technical Product Manager", "Data Analyst"]
+            }
+        }
+
+    def _report(self) -> dict:
+        score = lambda: self._randint(45, 92)
+        return {
+            "overall_score": score(),
+            "communication_score": score(),
+            "technical_score": score(),
+            "confidence_score": score(),
+            "problem_solving_score": score(),
+            "cultural_fit_score": score(),
+            "strengths": [self._paragraph(12) for _ in range(4)],
+            "weaknesses": [self._paragraph(12) for _ in range(3)],
+            "key_insights": self._paragraph(60),
+            "recommendations": self._paragraph(80),
+            "interviewer_notes": self._paragraph(35),
+            "next_steps": [self._paragraph(8) for _ in range(3)],
+            "estimated_readiness": self._pick(["Interview Ready", "Almost There", "Keep Practicing", "Building Foundation"])
+        }
+
+    # --- text helpers ---
+
+    _WORDS = ("career plan skills project practice interview growth focus goal learn build team "
+              "market role experience mentor internship portfolio feedback progress").split()
+
+    def _paragraph(self, words: int) -> str:
+        with self._lock:
+            picked = [self.random.choice(self._WORDS) for _ in range(max(1, words))]
+        return " ".join(picked).capitalize() + "."
+
+    def _pick(self, options: List[str]) -> str:
+        with self._lock:
+            return self.random.choice(options)
+
+    def _randint(self, low: int, high: int) -> int:
+        with self._lock:
+            return self.random.randint(low, high)
+
+    @staticmethod
+    def _student_name(prompt: str) -> str:
+        match = re.search(r"^name:\s*(.+)$", prompt, re.MULTILINE) or re.search(r"This roadmap is for ([^.]+)\.", prompt)
+        return match.group(1).strip() if match else "there"
+
+    @staticmethod
+    def _user_message(prompt: str) -> str:
+        match = re.search(r"USER MESSAGE:\s*(.+)", prompt)
+        return match.group(1).strip() if match else ""
@@ -0,0 +1,296 @@
+"""
+Shared on-disk cache tier.
+
+The in-memory caches are per worker process, so every gunicorn worker used to
+warm its own copy and pay for its own upstream calls. DiskCache keeps entries
+in a WAL-mode SQLite file that every worker on the host reads and writes, and
+that survives restarts (point OPEC_CACHE_DIR at a persistent disk so it
+survives redeploys too). TieredCache puts a BoundedTTLCache in front of it.
+
+Values are stored as zlib-compressed JSON with an absolute expiry time.
+Values that would not read back unchanged are kept in memory only, and an
+unreadable row is treated as a miss.
+A background thread compacts the file: it deletes expired rows, trims the
+oldest entries beyond OPEC_CACHE_MAX_MB and checkpoints the WAL. Workers take
+turns through a lease row so only one of them compacts at a time.
+
+Settings:
+    OPEC_CACHE_DISK              on (default) | off
+    OPEC_CACHE_DIR               directory for cache.sqlite3 (default: system temp dir)
+    OPEC_CACHE_MAX_MB            size budget for the file's payloads (default 256)
+    OPEC_CACHE_COMPACT_SECONDS   compaction interval (default 300)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+from core.sqlite_util import SQLiteFile
+from .memory import MB, BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _pack(value: Any) -> bytes:
+    """
+    Raises:
+        TypeError / ValueError: the value would not read back unchanged (bytes,
+            datetimes, tuples, non-str dict keys, ...); it stays memory-only
+    """
+    text = json.dumps(value)
+    if json.loads(text) != value:
+        raise ValueError("value does not survive a JSON round trip")
+    return zlib.compress(text.encode())
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode())
+
+
+class DiskCache:
+    """Namespaced key/value cache in a SQLite file shared by all workers"""
+
+    def __init__(self, path: str, max_bytes: int = 256 * MB, compact_interval_s: float = 300):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compact_interval_s = compact_interval_s
+        self._db = SQLiteFile(path)
+        self._compactor_pid: Optional[int] = None
+        self._compactor_lock = threading.Lock()
+        self.compactions = 0
+        self.last_compaction: Optional[dict] = None
+        with self._db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, expires_at REAL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_created ON cache_entries (created_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def get(self, namespace: str, key: str) -> Optional[tuple]:
+        """(value, expires_at) for a live entry, or None"""
+        self._ensure_compactor()
+        row = self._db.conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        blob, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None  # the compactor deletes it
+        return _unpack(blob), expires_at
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        self._ensure_compactor()
+        blob = _pack(value)
+        now = time.time()
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, expires_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), now + ttl_seconds if ttl_seconds else None, now)
+            )
+
+    def delete(self, namespace: str, key: str):
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def count(self, namespace: str) -> int:
+        return self._db.conn().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (namespace,)
+        ).fetchone()[0]
+
+    # --- compaction ---
+
+    def _ensure_compactor(self):
+        if self._compactor_pid == os.getpid() or self.compact_interval_s <= 0:
+            return
+        with self._compactor_lock:
+            if self._compactor_pid == os.getpid():
+                return
+            self._compactor_pid = os.getpid()
+            threading.Thread(target=self._compact_loop, name="cache-compactor", daemon=True).start()
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(self.compact_interval_s)
+            try:
+                if self._take_lease():
+                    self.compact()
+            except Exception as e:
+                logger.warning(f"[DiskCache] Compaction failed: {e}")
+
+    def _take_lease(self) -> bool:
+        """Only one worker per interval compacts"""
+        now = time.time()
+        with self._db.transaction() as conn:
+            row = conn.execute("SELECT value FROM cache_meta WHERE name = 'compact_lease'").fetchone()
+            if row is not None and row[0] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_meta (name, value) VALUES ('compact_lease', ?)",
+                (now + self.compact_interval_s * 0.9,)
+            )
+        return True
+
+    def compact(self) -> dict:
+        """Drop expired rows, trim the oldest rows over the size budget, checkpoint the WAL"""
+        now = time.time()
+        with self._db.transaction() as conn:
+            expired = conn.execute(
+                "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            trimmed = 0
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                for rowid, size in conn.execute(
+                    "SELECT rowid, size FROM cache_entries ORDER BY created_at"
+                ).fetchall():
+                    if excess <= 0:
+                        break
+                    conn.execute("DELETE FROM cache_entries WHERE rowid = ?", (rowid,))
+                    excess -= size
+                    total -= size
+                    trimmed += 1
+        self._db.conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compactions += 1
+        self.last_compaction = {"at": now, "expired": expired, "trimmed": trimmed, "bytes": total}
+        if expired or trimmed:
+            logger.info(f"[DiskCache] Compacted: {expired} expired, {trimmed} trimmed, {total} bytes left")
+        return self.last_compaction
+
+    def get_status(self) -> dict:
+        rows = self._db.conn().execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries GROUP BY namespace"
+        ).fetchall()
+        return {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "bytes": sum(size for _, _, size in rows),
+            "namespaces": {ns: {"entries": count, "bytes": size} for ns, count, size in rows},
+            "compactions": self.compactions,
+            "last_compaction": self.last_compaction,
+        }
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of the shared disk tier. Same get/set interface as
+    BoundedTTLCache, so callers do not care which one they hold. With
+    memory_ttl_seconds, a worker re-reads the disk tier at least that often
+    and so picks up entries other workers have overwritten.
+    """
+
+    def __init__(self, memory: BoundedTTLCache, disk: DiskCache, memory_ttl_seconds: Optional[float] = None):
+        self.memory = memory
+        self.disk = disk
+        self.name = memory.name
+        self.ttl_seconds = memory.ttl_seconds
+        self.memory_ttl_seconds = memory_ttl_seconds
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_errors = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            found = self.disk.get(self.name, key)
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            # ValueError covers truncated/corrupt JSON and bad UTF-8; treat as a miss
+            self.disk_errors += 1
+            logger.warning(f"[TieredCache] {self.name}: disk read failed: {e}")
+            return default
+        if found is None:
+            self.disk_misses += 1
+            return default
+        self.disk_hits += 1
+        value, expires_at = found
+        # Promote with the remaining lifetime, so another worker's entry still expires on time
+        remaining = max(0.001, expires_at - time.time()) if expires_at is not None else 0
+        self.memory.set(key, value, ttl_seconds=self._memory_ttl(remaining))
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        self.memory.set(key, value, self._memory_ttl(ttl_seconds))
+        try:
+            self.disk.set(self.name, key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.disk_errors += 1
+            logger.warning(f"[TieredCache] {self.name}: disk write failed: {e}")
+
+    def _memory_ttl(self, ttl_seconds: Optional[float]) -> Optional[float]:
+        """Lifetime of the memory copy: the entry's own, capped by memory_ttl_seconds (0 = no expiry)"""
+        if not self.memory_ttl_seconds:
+            return ttl_seconds
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        return min(ttl, self.memory_ttl_seconds) if ttl else self.memory_ttl_seconds
+
+    def delete(self, key: str) -> bool:
+        found = self.memory.delete(key)
+        try:
+            self.disk.delete(self.name, key)
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning(f"[TieredCache] {self.name}: disk delete failed: {e}")
+        return found
+
+    def clear(self):
+        self.memory.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def get_status(self) -> dict:
+        status = self.memory.get_status()
+        status["disk"] = {
+            "hits": self.disk_hits,
+            "misses": self.disk_misses,
+            "errors": self.disk_errors,
+            "entries": self.disk.count(self.name),
+        }
+        return status
+
+
+# Global singleton instance
+_disk_cache: Optional[DiskCache] = None
+_disk_lock = threading.Lock()
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """The shared disk tier, or None when OPEC_CACHE_DISK is off or the file cannot be opened"""
+    global _disk_cache
+    if os.environ.get("OPEC_CACHE_DISK", "on").lower() in ("off", "0", "false"):
+        return None
+    if _disk_cache is None:
+        with _disk_lock:
+            if _disk_cache is None:
+                directory = os.environ.get("OPEC_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "opec_cache")
+                try:
+                    _disk_cache = DiskCache(
+                        os.path.join(directory, "cache.sqlite3"),
+                        max_bytes=int(float(os.environ.get("OPEC_CACHE_MAX_MB", "256")) * MB),
+                        compact_interval_s=float(os.environ.get("OPEC_CACHE_COMPACT_SECONDS", "300"))
+                    )
+                    logger.info(f"[DiskCache] Shared cache at {_disk_cache.path}")
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"[DiskCache] Disabled, could not open cache in {directory}: {e}")
+                    return None
+    return _disk_cache
@@ -0,0 +1,208 @@
+"""
+Bounded in-memory cache with LRU eviction and per-entry TTL.
+
+Replaces the module-level dicts that used to grow without limit. Each cache
+has an entry cap and a byte budget (sizes are estimated from the JSON
+encoding of the value), evicts least-recently-used entries when either is
+exceeded, and counts hits, misses, expirations and evictions.
+
+Usage:
+    from core.cache.memory import get_cache
+    cache = get_cache("adzuna", max_entries=512, max_bytes=8 * MB, ttl_seconds=300)
+    cache.set(key, value)
+    cache.get(key)
+
+Every cache created through get_cache() is reported by cache_stats() and
+therefore by GET /api/metrics. With persistent=True the cache is backed by the
+shared disk tier (see disk.py) so all workers see each other's entries.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple, Union
+
+MB = 1024 * 1024
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory cost of a cached value in bytes"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", "ignore"))
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class BoundedTTLCache:
+    """Thread-safe LRU cache bounded by entry count and estimated bytes"""
+
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: int = 16 * MB,
+                 ttl_seconds: Optional[float] = 300):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (value, expires_at or None, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache (not copied; treat it as read-only afterwards)
+            ttl_seconds: Overrides the cache's default TTL (None = use the default)
+        """
+        size = estimate_size(value)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # A single value larger than the whole budget would flush everything
+                self.rejected += 1
+                return
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict_one()
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict_one(self):
+        # Expired entries are only dropped lazily, so the LRU victim may already be stale
+        _, (_, expires_at, size) = self._entries.popitem(last=False)
+        self._bytes -= size
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.expirations += 1
+        else:
+            self.evictions += 1
+
+    def get_status(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
+
+
+# Named caches for this worker process
+_caches: Dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, max_entries: int = 1024, max_bytes: int = 16 * MB,
+              ttl_seconds: Optional[float] = 300, persistent: bool = False,
+              memory_ttl_seconds: Optional[float] = None) -> Union[BoundedTTLCache, "TieredCache"]:
+    """
+    Get or create the named cache (settings apply only on first creation).
+
+    Args:
+        name: Cache name; also the namespace in the disk tier
+        max_entries / max_bytes: Bounds of the in-memory tier
+        ttl_seconds: Default entry lifetime (None = no expiry)
+        persistent: Back the cache with the shared disk tier when it is enabled.
+            Values must then be JSON-serialisable and keys strings.
+        memory_ttl_seconds: For persistent caches, how long a worker serves an
+            entry from memory before reading the shared tier again (None = as
+            long as ttl_seconds). Set it when other workers overwrite entries.
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = BoundedTTLCache(name, max_entries, max_bytes, ttl_seconds)
+                if persistent:
+                    from .disk import TieredCache, get_disk_cache
+                    disk = get_disk_cache()
+                    if disk is not None:
+                        cache = TieredCache(cache, disk, memory_ttl_seconds)
+                    elif memory_ttl_seconds:
+                        # No shared tier: re-read the source of truth instead
+                        cache.ttl_seconds = min(ttl_seconds or memory_ttl_seconds, memory_ttl_seconds)
+                _caches[name] = cache
+    return cache
+
+
+def register_cache(cache) -> Any:
+    """Report another cache type (anything with .name and get_status()) in cache_stats()"""
+    with _caches_lock:
+        _caches.setdefault(cache.name, cache)
+    return _caches[cache.name]
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Status of every named cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.get_status() for cache in caches}
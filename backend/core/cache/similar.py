@@ -0,0 +1,216 @@
+"""
+Near-duplicate text cache using MinHash signatures and an LSH index.
+
+Students ask the same factual question in many ways ("what does a data
+analyst earn", "data analyst salary?"), so exact-match keys rarely hit. Here
+the text is normalised into a set of content words, with stopwords dropped and
+synonyms folded. That set gets a MinHash signature of NUM_HASHES values,
+indexed in BANDS bands of ROWS values. Sets with Jaccard similarity 0.75
+share at least one band with probability > 0.99, and sets at 0.5 with
+probability 0.9. A lookup only compares
+against the entries in its own band buckets, never the whole cache.
+
+Candidates must then pass a precision guard. The exact Jaccard similarity of
+the token sets must reach the cache's min_jaccard. Every word that only one
+of the two texts has must also be in the cache's `ignorable` set ("role",
+"currently", ...). This stops "data analyst salary in Pune" from matching
+"data analyst salary" or "... in Bangalore".
+
+MinHash fits better than SimHash here: questions are only a handful of words,
+and one changed word flips too many SimHash bits for a Hamming threshold to
+work.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+NUM_HASHES = 16
+ROWS = 2
+BANDS = NUM_HASHES // ROWS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1071)  # fixed: signatures must match across workers and restarts
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+STOPWORDS = frozenset("""
+a an the is are was were be been being do does did doing to of in on at for from by with about as into
+what whats which who whom how much many there their they them it its this that these those can could
+should would will shall may might must i me my we our you your please tell know want like get give
+and or but so if then than also just any some very really typical typically average usually
+""".split())
+
+# Different words for the same thing, mapped to one token
+SYNONYMS = {
+    "earn": "salary", "earns": "salary", "earning": "salary", "earnings": "salary",
+    "pay": "salary", "paid": "salary", "pays": "salary", "package": "salary", "ctc": "salary",
+    "income": "salary", "wage": "salary", "wages": "salary", "salaries": "salary", "lpa": "salary",
+    "jobs": "job", "roles": "role", "careers": "career", "skills": "skill", "companies": "company",
+    "becoming": "become", "engineers": "engineer", "developers": "developer",
+    "analysts": "analyst", "scientists": "scientist", "courses": "course", "certifications": "certification",
+}
+
+# Words that rarely change what a factual question is asking
+LOW_INFORMATION_WORDS = frozenset("""
+role job field career position profession domain current currently nowadays today now right exactly
+approximately approx roughly range general generally india indian market actually expected
+""".split())
+
+
+def normalize_tokens(text: str) -> FrozenSet[str]:
+    """Lower-cased content words with synonyms folded together"""
+    tokens = set()
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.add(SYNONYMS.get(token, token))
+    return frozenset(tokens)
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    """MinHash signature of a non-empty token set"""
+    hashes = [_token_hash(token) for token in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _bands(signature: Tuple[int, ...]):
+    return [(i, signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+
+class _Entry:
+    __slots__ = ("tokens", "signature", "value", "expires_at")
+
+    def __init__(self, tokens: FrozenSet[str], signature: Tuple[int, ...], value: Any, expires_at: Optional[float]):
+        self.tokens = tokens
+        self.signature = signature
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SimilarityCache:
+    """Thread-safe LRU cache keyed by approximate text similarity"""
+
+    def __init__(self, name: str, max_entries: int = 2000, ttl_seconds: Optional[float] = 3600,
+                 min_jaccard: float = 0.5, min_tokens: int = 2,
+                 ignorable: FrozenSet[str] = LOW_INFORMATION_WORDS):
+        """
+        Args:
+            name: Cache name (for stats)
+            max_entries: LRU bound
+            ttl_seconds: Entry lifetime (None = no expiry)
+            min_jaccard: Precision guard on the normalised token sets
+            ignorable: Words allowed to differ between a query and a cached text
+            min_tokens: Texts with fewer content words are never cached
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_jaccard = min_jaccard
+        self.min_tokens = min_tokens
+        self.ignorable = ignorable
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[FrozenSet[str], _Entry]" = OrderedDict()
+        self._index: Dict[Tuple[int, Tuple[int, ...]], Set[FrozenSet[str]]] = {}
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.guard_rejections = 0
+
+    def get(self, text: str) -> Optional[Any]:
+        """Value cached for a text similar enough to `text`, or None"""
+        tokens = normalize_tokens(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        signature = minhash(tokens)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(tokens)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(tokens)
+                self.hits += 1
+                self.exact_hits += 1
+                return entry.value
+
+            best, best_score, rejected = None, 0.0, False
+            seen = set()
+            for band in _bands(signature):
+                for key in self._index.get(band, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    candidate = self._entries[key]
+                    if self._expired(candidate, now):
+                        continue
+                    score = jaccard(tokens, candidate.tokens)
+                    if score < self.min_jaccard or not (tokens ^ candidate.tokens) <= self.ignorable:
+                        rejected = True
+                    elif score > best_score:
+                        best, best_score = candidate, score
+            if best is None:
+                self.misses += 1
+                if rejected:
+                    self.guard_rejections += 1
+                return None
+            self._entries.move_to_end(best.tokens)
+            self.hits += 1
+            return best.value
+
+    def set(self, text: str, value: Any):
+        tokens = normalize_tokens(text)
+        if len(tokens) < self.min_tokens:
+            return
+        signature = minhash(tokens)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if tokens in self._entries:
+                self._remove(tokens)
+            self._entries[tokens] = _Entry(tokens, signature, value, expires_at)
+            for band in _bands(signature):
+                self._index.setdefault(band, set()).add(tokens)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    @staticmethod
+    def _expired(entry: _Entry, now: float) -> bool:
+        return entry.expires_at is not None and entry.expires_at <= now
+
+    def _remove(self, tokens: FrozenSet[str]):
+        entry = self._entries.pop(tokens)
+        for band in _bands(entry.signature):
+            bucket = self._index.get(band)
+            if bucket is not None:
+                bucket.discard(tokens)
+                if not bucket:
+                    del self._index[band]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_status(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "guard_rejections": self.guard_rejections,
+                "min_jaccard": self.min_jaccard,
+            }
@@ -0,0 +1,155 @@
+"""
+Stale-while-revalidate on top of a named cache.
+
+A plain TTL cache makes the first request after expiry wait for the upstream
+(up to Adzuna's 10 s timeout), and when a popular key expires every
+concurrent request calls the upstream at once. StaleWhileRevalidate stores
+each value with the time it was fetched:
+- fresh (younger than fresh_seconds)   -> served from the cache
+- stale (up to fresh + stale_seconds)  -> served from the cache at once; one
+                                          background refresh replaces it
+- missing                              -> fetched inline; concurrent callers
+                                          for the same key wait for that one
+                                          fetch instead of starting their own
+A failed refresh keeps the stale value, so an upstream outage degrades to old
+data instead of errors until the stale window runs out.
+
+Single-flight is per worker process; other workers see the refreshed value
+through the shared disk tier.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StaleWhileRevalidate:
+    """Serve-stale, refresh-once wrapper around a BoundedTTLCache or TieredCache"""
+
+    def __init__(self, cache, fresh_seconds: float, stale_seconds: float):
+        """
+        Args:
+            cache: Named cache (see core.cache.memory.get_cache); entries are kept
+                for fresh_seconds + stale_seconds
+            fresh_seconds: Age up to which a value is served without a refresh
+            stale_seconds: How much longer it may be served while refreshing
+        """
+        self.cache = cache
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+    def get(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Cached value for key, calling fetch() when there is none.
+
+        Raises:
+            Whatever fetch() raises, when there is no cached value to fall back on
+        """
+        entry = self._load(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < self.fresh_seconds:
+                self._count("fresh")
+                return entry["value"]
+            self._count("stale")
+            self._refresh_in_background(key, fetch)
+            return entry["value"]
+
+        future, leader = self._flight(key)
+        if not leader:
+            self._count("joined")
+            return future.result()
+        self._count("miss")
+        try:
+            value = self._fetch_and_store(key, fetch)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._land(key, future)
+
+    def invalidate(self, key: str):
+        self.cache.delete(key)
+
+    def _load(self, key: str) -> Optional[dict]:
+        entry = self.cache.get(key)
+        if isinstance(entry, dict) and "fetched_at" in entry and "value" in entry:
+            return entry
+        return None  # missing, or written in an older format
+
+    def _fetch_and_store(self, key: str, fetch: Callable[[], Any]) -> Any:
+        value = fetch()
+        self.cache.set(key, {"value": value, "fetched_at": time.time()},
+                       ttl_seconds=self.fresh_seconds + self.stale_seconds)
+        return value
+
+    def _flight(self, key: str):
+        """(future, True) if the caller should fetch, or the running fetch's (future, False)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _land(self, key: str, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], Any]):
+        future, leader = self._flight(key)
+        if not leader:
+            return  # a refresh for this key is already running
+
+        def refresh():
+            try:
+                future.set_result(self._fetch_and_store(key, fetch))
+                self._count("refreshed")
+            except Exception as e:
+                # Keep serving the stale value; the next stale hit tries again
+                future.set_exception(e)
+                self._count("refresh_failed")
+                logger.warning(f"[SWR] {self.cache.name}: refresh failed, serving stale data: {e}")
+            finally:
+                self._land(key, future)
+
+        try:
+            get_refresh_pool().submit(refresh)
+        except RuntimeError:
+            self._land(key, future)  # interpreter shutting down
+
+    def _count(self, outcome: str):
+        self.metrics.incr("cache.swr", cache=self.cache.name, outcome=outcome)
+
+
+# Threads that run background refreshes
+_refresh_pool: Optional[ThreadPoolExecutor] = None
+_refresh_lock = threading.Lock()
+
+
+def get_refresh_pool() -> ThreadPoolExecutor:
+    """Shared executor for stale-while-revalidate refreshes"""
+    global _refresh_pool
+    if _refresh_pool is None:
+        with _refresh_lock:
+            if _refresh_pool is None:
+                _refresh_pool = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("CACHE_REFRESH_THREADS", "4")),
+                    thread_name_prefix="cache-refresh"
+                )
+    return _refresh_pool
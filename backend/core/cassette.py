@@ -0,0 +1,291 @@
+"""
+Record/replay cassettes for LLM and upstream API calls.
+
+In record mode every Gemini call and every Adzuna, DuckDuckGo, Tavily and
+Topmate request is written to a cassette with its response (or error) and
+timing. In replay mode the same calls are answered from the cassette without
+touching the network, so /api/opec/chat/message, /api/simulate and /api/mcp/*
+can be benchmarked offline against captured traffic.
+
+Settings:
+    OPEC_CASSETTE_MODE           off (default) | record | replay
+    OPEC_CASSETTE_PATH           cassette file (SQLite, payloads zlib-compressed)
+    OPEC_CASSETTE_LATENCY_SCALE  replay delay as a multiple of the recorded
+                                 latency (1.0 = original, 0 = no delay)
+    OPEC_CASSETTE_ON_MISS        error (default) | live - what replay does for
+                                 a request that was never recorded
+
+Requests are matched on (service, request) with credentials left out. When
+the same request was recorded several times, replays cycle through the
+recordings in order, so runs are deterministic.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from core.sqlite_util import SQLiteFile
+
+logger = logging.getLogger(__name__)
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(Exception):
+    """Replay found no recording for a request"""
+    pass
+
+
+class CassetteError(Exception):
+    """A recorded upstream error, raised again on replay"""
+    pass
+
+
+def _request_key(service: str, request: Dict[str, Any]) -> str:
+    canonical = json.dumps({"service": service, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, default=str).encode())
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode())
+
+
+class Cassette:
+    """A cassette file plus the record/replay logic around calls"""
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0, on_miss: str = "error"):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.on_miss = on_miss
+        self._db = SQLiteFile(path)
+        self._lock = threading.Lock()
+        self._replay_cursor: Dict[str, int] = {}
+        self._replay_index: Dict[str, List[int]] = {}
+        with self._db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS interactions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, service TEXT NOT NULL, request_key TEXT NOT NULL, "
+                "request BLOB NOT NULL, response BLOB, error TEXT, latency_ms REAL NOT NULL, "
+                "recorded_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_interactions_key ON interactions (request_key, id)")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    # --- storage ---
+
+    def record(self, service: str, request: Dict[str, Any], response: Any = None,
+               error: Optional[str] = None, latency_ms: float = 0.0):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO interactions (service, request_key, request, response, error, latency_ms, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (service, _request_key(service, request), _pack(request),
+                 _pack(response) if response is not None else None, error, latency_ms, time.time())
+            )
+
+    def lookup(self, service: str, request: Dict[str, Any]) -> Optional[Tuple[Any, Optional[str], float]]:
+        """Next recording for a request as (response, error, latency_ms), cycling through repeats"""
+        key = _request_key(service, request)
+        with self._lock:
+            ids = self._replay_index.get(key)
+            if ids is None:
+                rows = self._db.conn().execute(
+                    "SELECT id FROM interactions WHERE request_key = ? ORDER BY id", (key,)
+                ).fetchall()
+                ids = self._replay_index[key] = [row[0] for row in rows]
+            if not ids:
+                return None
+            position = self._replay_cursor.get(key, 0)
+            self._replay_cursor[key] = position + 1
+            row_id = ids[position % len(ids)]
+        response, error, latency_ms = self._db.conn().execute(
+            "SELECT response, error, latency_ms FROM interactions WHERE id = ?", (row_id,)
+        ).fetchone()
+        return (_unpack(response) if response is not None else None), error, latency_ms
+
+    def _sleep(self, latency_ms: float):
+        if self.latency_scale > 0 and latency_ms > 0:
+            time.sleep(latency_ms * self.latency_scale / 1000)
+
+    # --- call wrappers ---
+
+    def call(self, service: str, request: Dict[str, Any], fn: Callable[[], Any],
+             error_cls: Type[Exception] = CassetteError) -> Any:
+        """
+        Run fn() through the cassette.
+
+        Args:
+            service: Upstream name, e.g. "adzuna.search"
+            request: JSON-serialisable description of the request (no credentials)
+            fn: Makes the live call; its result must be JSON-serialisable
+            error_cls: Exception type raised when replaying a recorded error, so
+                the caller's except clauses behave as they did live
+        """
+        if self.replaying:
+            found = self.lookup(service, request)
+            if found is not None:
+                response, error, latency_ms = found
+                self._sleep(latency_ms)
+                if error is not None:
+                    raise error_cls(error)
+                return response
+            if self.on_miss != "live":
+                raise CassetteMiss(f"No recording for {service} request")
+            logger.warning(f"[Cassette] Miss for {service}, calling live")
+
+        started = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            if self.recording:
+                self.record(service, request, error=str(e), latency_ms=(time.monotonic() - started) * 1000)
+            raise
+        if self.recording:
+            self.record(service, request, response=result, latency_ms=(time.monotonic() - started) * 1000)
+        return result
+
+    def stream(self, service: str, request: Dict[str, Any], fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        Stream chunks through the cassette. Recordings keep each chunk's offset
+        from the start of the call, so replays reproduce first-token latency
+        and streaming speed.
+        """
+        if self.replaying:
+            found = self.lookup(service, request)
+            if found is not None:
+                response, error, _ = found
+                if error is not None and not response:
+                    raise CassetteError(error)
+                elapsed_ms = 0.0
+                for offset_ms, chunk in response or []:
+                    self._sleep(offset_ms - elapsed_ms)
+                    elapsed_ms = offset_ms
+                    yield chunk
+                if error is not None:
+                    raise CassetteError(error)
+                return
+            if self.on_miss != "live":
+                raise CassetteMiss(f"No recording for {service} request")
+            logger.warning(f"[Cassette] Miss for {service}, calling live")
+
+        started = time.monotonic()
+        chunks: List[Tuple[float, str]] = []
+        try:
+            for chunk in fn():
+                chunks.append(((time.monotonic() - started) * 1000, chunk))
+                yield chunk
+        except Exception as e:
+            if self.recording:
+                self.record(service, request, response=chunks, error=str(e),
+                            latency_ms=(time.monotonic() - started) * 1000)
+            raise
+        if self.recording:
+            self.record(service, request, response=chunks, latency_ms=(time.monotonic() - started) * 1000)
+
+    def get_status(self) -> dict:
+        rows = self._db.conn().execute(
+            "SELECT service, COUNT(*), AVG(latency_ms) FROM interactions GROUP BY service"
+        ).fetchall()
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "latency_scale": self.latency_scale,
+            "services": {service: {"count": count, "avg_latency_ms": round(avg or 0, 1)}
+                         for service, count, avg in rows}
+        }
+
+
+class CassetteProvider:
+    """Wraps an LLM provider so gateway calls are recorded or replayed"""
+
+    def __init__(self, cassette: Cassette, inner=None):
+        self.cassette = cassette
+        self.inner = inner
+        self.name = f"cassette({inner.name if inner is not None else 'replay'})"
+
+    @staticmethod
+    def _request(prompt: str, temperature: float, config: Optional[dict]) -> Dict[str, Any]:
+        # Keys and models are left out: rotation and fallback must not change the match
+        return {"prompt": prompt, "temperature": temperature, "config": config}
+
+    def generate(self, api_key: str, model: str, prompt: str, temperature: float,
+                 config: Optional[dict] = None) -> str:
+        return self.cassette.call(
+            "llm.generate", self._request(prompt, temperature, config),
+            lambda: self._inner().generate(api_key, model, prompt, temperature, config)
+        )
+
+    def stream(self, api_key: str, model: str, prompt: str, temperature: float,
+               config: Optional[dict] = None) -> Iterator[str]:
+        return self.cassette.stream(
+            "llm.stream", self._request(prompt, temperature, config),
+            lambda: self._inner().stream(api_key, model, prompt, temperature, config)
+        )
+
+    def _inner(self):
+        if self.inner is None:
+            raise CassetteMiss("No live LLM provider in replay mode")
+        return self.inner
+
+
+# Global singleton instance
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The active cassette, or None when OPEC_CASSETTE_MODE is off"""
+    global _cassette
+    mode = os.environ.get("OPEC_CASSETTE_MODE", OFF).lower()
+    if mode not in (RECORD, REPLAY):
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(
+                    path=os.environ.get(
+                        "OPEC_CASSETTE_PATH",
+                        os.path.join(tempfile.gettempdir(), "opec_cassette.sqlite3")
+                    ),
+                    mode=mode,
+                    latency_scale=float(os.environ.get("OPEC_CASSETTE_LATENCY_SCALE", "1.0")),
+                    on_miss=os.environ.get("OPEC_CASSETTE_ON_MISS", "error").lower()
+                )
+                logger.info(f"[Cassette] {mode} mode, file {_cassette.path}")
+    return _cassette
+
+
+def is_replaying() -> bool:
+    """True when upstream calls are served from a cassette (credentials not needed)"""
+    cassette = get_cassette()
+    return cassette is not None and cassette.replaying
+
+
+def through_cassette(service: str, request: Dict[str, Any], fn: Callable[[], Any],
+                     error_cls: Type[Exception] = CassetteError) -> Any:
+    """Run fn() through the active cassette, or directly when cassettes are off"""
+    cassette = get_cassette()
+    if cassette is None:
+        return fn()
+    return cassette.call(service, request, fn, error_cls=error_cls)
@@ -0,0 +1,145 @@
+"""
+Shared outbound HTTP client.
+
+Every integration used to open its own connections: bare requests.get/post
+calls (a new TCP + TLS handshake each time), some without any timeout, so a
+stalled upstream could hang a worker thread forever. HTTPClient wraps one
+requests.Session per worker process with:
+- per-host connection pools with keep-alive (urllib3 PoolManager)
+- default connect/read timeouts on every request
+- bounded retries with backoff for connection errors and 502/503/504, on
+  idempotent methods only (a POST is never replayed)
+- latency and outcome metrics per upstream:
+  http.requests{upstream,outcome} and http.latency_ms{upstream}
+
+Usage:
+    from core.http_client import get_http_client
+    response = get_http_client().get("adzuna", url, params=params)
+
+Settings:
+    HTTP_CONNECT_TIMEOUT   seconds (default 3.05)
+    HTTP_READ_TIMEOUT      seconds (default 15)
+    HTTP_RETRIES           retries per request (default 2)
+    HTTP_POOL_MAXSIZE      connections kept per host (default 32)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float]]
+
+RETRY_STATUSES = (502, 503, 504)
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+
+class HTTPClient:
+    """Pooled, instrumented requests.Session shared by all integrations"""
+
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 15.0,
+                 retries: int = 2, pool_maxsize: int = 32):
+        self.default_timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.pool_maxsize = pool_maxsize
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._pid: Optional[int] = None
+
+    def _build_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=0.3,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,  # the caller sees the last response and decides
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    # Pooled sockets must not be shared with a forked parent
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def request(self, method: str, upstream: str, url: str, timeout: Optional[Timeout] = None,
+                **kwargs) -> requests.Response:
+        """
+        Send a request through the shared pool.
+
+        Args:
+            method: HTTP method
+            upstream: Name used in metrics and logs ("adzuna", "tavus", ...)
+            url: Full URL
+            timeout: Seconds, or (connect, read); defaults to HTTP_CONNECT/READ_TIMEOUT
+            **kwargs: Passed to requests (params, json, headers, ...)
+
+        Raises:
+            requests.exceptions.RequestException: connection failure or timeout,
+                after the retries for idempotent methods; POST is never retried
+                (HTTP error statuses are returned, not raised)
+        """
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.default_timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            outcome = "timeout" if isinstance(e, requests.exceptions.Timeout) else "error"
+            self._record(upstream, outcome, started)
+            # Only idempotent methods are retried (see _build_session)
+            attempts = f"after {self.retries} retries" if method.upper() in IDEMPOTENT_METHODS else "(not retried)"
+            logger.warning(f"[HTTP] {upstream} {method} failed {attempts}: {e}")
+            raise
+        self._record(upstream, f"{response.status_code // 100}xx", started)
+        return response
+
+    def get(self, upstream: str, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", upstream, url, **kwargs)
+
+    def post(self, upstream: str, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", upstream, url, **kwargs)
+
+    def _record(self, upstream: str, outcome: str, started: float):
+        self.metrics.incr("http.requests", upstream=upstream, outcome=outcome)
+        self.metrics.observe("http.latency_ms", (time.monotonic() - started) * 1000, upstream=upstream)
+
+
+# Global singleton instance
+_client: Optional[HTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Get or create the global HTTPClient singleton"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient(
+                    connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05")),
+                    read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT", "15")),
+                    retries=int(os.environ.get("HTTP_RETRIES", "2")),
+                    pool_maxsize=int(os.environ.get("HTTP_POOL_MAXSIZE", "32")),
+                )
+    return _client
@@ -0,0 +1,111 @@
+"""
+Lightweight in-process metrics for CareerPath.
+
+Counters and latency samples are kept per worker process in memory and
+exposed through GET /api/metrics. Labels are folded into the metric key,
+e.g. "llm.calls{caller=chat,outcome=ok}".
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+# Samples kept per timer for percentile estimates
+MAX_SAMPLES = 512
+
+
+def _metric_key(name: str, labels: Dict[str, object]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and timers"""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self._lock = threading.Lock()
+        self._max_samples = max_samples
+        self._counters: Dict[str, float] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+        self._totals: Dict[str, List[float]] = {}  # key -> [count, sum]
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a sample (typically a latency in milliseconds)"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self._max_samples)
+                self._totals[key] = [0, 0.0]
+            samples.append(value)
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += value
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0)
+
+    def sample_count(self, name: str, **labels) -> int:
+        """Number of recent samples kept for a timer"""
+        with self._lock:
+            samples = self._samples.get(_metric_key(name, labels))
+            return len(samples) if samples else 0
+
+    def percentile(self, name: str, q: float, **labels) -> Optional[float]:
+        """Percentile (0-1) over recent samples, or None if there are none"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples:
+                return None
+            values = sorted(samples)
+        return _percentile(values, q)
+
+    def snapshot(self) -> dict:
+        """Counters plus count/avg/p50/p95/p99 for every timer"""
+        with self._lock:
+            counters = dict(self._counters)
+            samples = {k: sorted(v) for k, v in self._samples.items()}
+            totals = {k: list(v) for k, v in self._totals.items()}
+
+        timers = {}
+        for key, values in samples.items():
+            count, total = totals[key]
+            timers[key] = {
+                "count": count,
+                "avg": round(total / count, 2) if count else 0.0,
+                "p50": round(_percentile(values, 0.50), 2),
+                "p95": round(_percentile(values, 0.95), 2),
+                "p99": round(_percentile(values, 0.99), 2),
+            }
+        return {"counters": counters, "timers": timers}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._samples.clear()
+            self._totals.clear()
+
+
+# Global singleton instance
+metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return metrics
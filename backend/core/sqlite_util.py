@@ -0,0 +1,79 @@
+"""
+Shared SQLite access for state kept in a file that every worker on the host
+reads and writes (disk cache, API key state, simulation jobs, job index,
+cassettes).
+
+Each thread gets its own connection in WAL mode, reopened after a fork so a
+connection never crosses processes. Writes go through transaction(), which
+takes the write lock up front (BEGIN IMMEDIATE) so read-modify-write updates
+are atomic across workers.
+
+Usage:
+    from core.sqlite_util import SQLiteFile
+    db = SQLiteFile(path)
+    with db.transaction() as conn:
+        conn.execute("INSERT ...")
+    db.conn().execute("SELECT ...")
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class SQLiteFile:
+    """Per-thread, fork-safe connections to one SQLite file"""
+
+    def __init__(self, path: str, row_factory: Optional[type] = None, timeout: float = 5.0):
+        """
+        Args:
+            path: Database file; its directory is created if missing
+            row_factory: Row type for every connection (e.g. sqlite3.Row)
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self.row_factory = row_factory
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit outside transaction())"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # New thread, or we were forked (connections must not cross fork)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction holding the database lock from the start"""
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def pid_alive(pid: Optional[int]) -> bool:
+    """Whether a process on this host still exists (for state owned by a worker)"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
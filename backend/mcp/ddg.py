@@ -0,0 +1,32 @@
+"""
+DuckDuckGo search client reused per thread.
+
+News and video search used to open a new DDGS() context per query, paying for
+a fresh HTTP client and TLS handshake every time. A DDGS instance is not safe
+to share between threads, so each thread keeps its own and reuses it. It is
+rebuilt after a fork, and after an error in case the error left it broken.
+"""
+
+import os
+import threading
+
+from duckduckgo_search import DDGS
+
+DDG_TIMEOUT_SECONDS = 10
+
+_local = threading.local()
+
+
+def get_ddgs() -> DDGS:
+    """This thread's DDGS client"""
+    client = getattr(_local, "client", None)
+    if client is None or getattr(_local, "pid", None) != os.getpid():
+        client = DDGS(timeout=DDG_TIMEOUT_SECONDS)
+        _local.client = client
+        _local.pid = os.getpid()
+    return client
+
+
+def reset_ddgs():
+    """Drop this thread's client (after a failure); the next call builds a new one"""
+    _local.client = None
@@ -0,0 +1,134 @@
+"""
+Live-data enrichment for chat questions.
+
+A question can ask for several things at once ("jobs and salary for data
+analysts in Pune"). Every intent mcp/router.py finds in it is dispatched to
+its MCP tool concurrently on a shared thread pool, under one deadline for the
+whole enrichment. Tools that finish in time are merged into one dict keyed by
+intent; late ones are dropped (and logged) so a slow Tavily or Adzuna call
+cannot stall the chat turn.
+
+Settings:
+    MCP_ENRICH_DEADLINE_SECONDS   budget for all tools together (default 8)
+    MCP_ENRICH_THREADS            shared pool size per worker (default 8)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.metrics import get_metrics
+from .router import get_router
+from .tools import MCPJobTools
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCATION = 'bangalore'
+
+
+def plan_calls(question: str) -> List[Tuple[str, Callable[..., Dict[str, Any]], tuple]]:
+    """(intent, tool, args) for every intent in the question that has something to look up"""
+    route = get_router().route(question)
+    topic = route.topic
+    calls = []
+    for intent in route.intents:
+        if intent == "jobs":
+            location = route.location or DEFAULT_LOCATION
+            if route.company and not topic:
+                # "Google jobs in Pune": openings at the company, as POST /api/mcp/query does
+                calls.append((intent, MCPJobTools.get_company_job_count, (route.company.title(), location)))
+            else:
+                query = " ".join(part for part in (topic, route.company) if part) or "software engineer"
+                calls.append((intent, MCPJobTools.search_live_jobs, (query, location, route.salary_min_lpa)))
+        elif intent == "salary" and topic:
+            calls.append((intent, MCPJobTools.get_salary_data, (topic,)))
+        elif intent == "news" and topic:
+            calls.append((intent, MCPJobTools.get_industry_news, (topic,)))
+        elif intent == "videos" and topic:
+            calls.append((intent, MCPJobTools.find_learning_videos, (topic,)))
+        elif intent == "company_research":
+            company = route.company or topic
+            if len(company) > 2:
+                calls.append((intent, MCPJobTools.autonomous_company_research, (company,)))
+    return calls
+
+
+def _timed(tool: Callable[..., Dict[str, Any]], args: tuple) -> Tuple[Dict[str, Any], float]:
+    started = time.monotonic()
+    try:
+        return tool(*args), (time.monotonic() - started) * 1000
+    except Exception as e:
+        return {"status": "error", "error": str(e)}, (time.monotonic() - started) * 1000
+
+
+def enrich(question: str, deadline_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Live data for a chat question.
+
+    Args:
+        question: The student's message
+        deadline_s: Overall budget (default MCP_ENRICH_DEADLINE_SECONDS)
+
+    Returns:
+        {intent: tool data} for the tools that succeeded in time, or None
+    """
+    calls = plan_calls(question)
+    if not calls:
+        return None
+    if deadline_s is None:
+        deadline_s = float(os.environ.get("MCP_ENRICH_DEADLINE_SECONDS", "8"))
+    metrics = get_metrics()
+    started = time.monotonic()
+    pool = get_enrichment_pool()
+    pending = {pool.submit(_timed, tool, args): intent for intent, tool, args in calls}
+    merged: Dict[str, Any] = {}
+    timings: Dict[str, str] = {}
+
+    while pending:
+        remaining = deadline_s - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            intent = pending.pop(future)
+            result, elapsed_ms = future.result()
+            outcome = result.get("status") if result.get("status") in ("success", "error") else "empty"
+            if outcome == "success" and result.get("data"):
+                merged[intent] = result["data"]
+            elif outcome == "success":
+                outcome = "empty"
+            timings[intent] = f"{elapsed_ms:.0f}ms {outcome}"
+            metrics.observe("mcp.tool_ms", elapsed_ms, tool=intent)
+            metrics.incr("mcp.enrich", tool=intent, outcome=outcome)
+
+    for future, intent in pending.items():
+        # Still running: it finishes in the background, but nobody waits for it
+        future.cancel()
+        timings[intent] = "dropped (deadline)"
+        metrics.incr("mcp.enrich", tool=intent, outcome="late")
+
+    total_ms = (time.monotonic() - started) * 1000
+    metrics.observe("mcp.enrich_ms", total_ms)
+    logger.info(f"[MCP] Enrichment in {total_ms:.0f}ms: {timings}")
+    return merged or None
+
+
+# Shared executor for tool calls
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_enrichment_pool() -> ThreadPoolExecutor:
+    """Shared executor for MCP tool calls"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("MCP_ENRICH_THREADS", "8")),
+                    thread_name_prefix="mcp-enrich"
+                )
+    return _pool
@@ -4,17 +4,76 @@ Provides real-time job market data for the CareerPath AI
 """
 
 import os
+import sqlite3
+import threading
+import time
 import requests
 import logging
 from typing import Optional, Dict, Any, List
 from functools import lru_cache
 from datetime import datetime, timedelta
 
+from core.cache.memory import MB, get_cache
+from core.ai.rate_limiter import TokenBucket
+from core.cache.swr import StaleWhileRevalidate
+from core.cassette import is_replaying, through_cassette
+from core.http_client import get_http_client
+from .job_store import get_job_store
+
 logger = logging.getLogger(__name__)
 
-# Cache for API responses (simple in-memory cache)
-_cache: Dict[str, tuple] = {}
+# Cache for API responses (bounded LRU, shared by workers on disk). Entries are
+# fresh for CACHE_TTL_SECONDS, then served stale for up to STALE_TTL_SECONDS
+# more while one background call refreshes them.
 CACHE_TTL_SECONDS = 300  # 5 minutes
+STALE_TTL_SECONDS = int(os.environ.get("ADZUNA_STALE_SECONDS", "86400"))
+_cache = get_cache("adzuna", max_entries=1024, max_bytes=8 * MB,
+                   ttl_seconds=CACHE_TTL_SECONDS + STALE_TTL_SECONDS, persistent=True)
+_swr = StaleWhileRevalidate(_cache, fresh_seconds=CACHE_TTL_SECONDS, stale_seconds=STALE_TTL_SECONDS)
+
+
+class AdzunaRateLimitError(requests.exceptions.RequestException):
+    """No request budget left within the wait limit; handled like a failed call"""
+
+
+class RequestRateLimiter:
+    """
+    Token bucket over outgoing Adzuna requests, shared by all threads of a worker.
+
+    Multi-page fetches (mcp/job_pages.py) send several requests at once; the
+    bucket keeps the worker under ADZUNA_RPM (split across WEB_CONCURRENCY
+    workers) while allowing a burst of ADZUNA_BURST requests.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: float):
+        self._bucket = TokenBucket(burst, requests_per_minute / 60.0)
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one request, waiting up to `timeout` seconds; False if none came free"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                wait = self._bucket.time_until(1)
+                if wait == 0.0:
+                    self._bucket.consume(1)
+                    return True
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    return False
+                self._cond.wait(wait)
+
+    def available(self) -> float:
+        with self._cond:
+            return self._bucket.available()
+
+
+_workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "2")))
+_limiter = RequestRateLimiter(
+    requests_per_minute=max(1.0, float(os.environ.get("ADZUNA_RPM", "25")) / _workers),
+    burst=float(os.environ.get("ADZUNA_BURST", "5"))
+)
+RATE_LIMIT_WAIT_SECONDS = float(os.environ.get("ADZUNA_RATE_WAIT_SECONDS", "3"))
 
 
 class AdzunaClient:
@@ -29,21 +88,6 @@ class AdzunaClient:
         if not self.app_id or not self.api_key:
             logger.warning("Adzuna API credentials not found. Job search will use mock data.")
     
-    def _get_cached(self, cache_key: str) -> Optional[Dict]:
-        """Get cached response if still valid"""
-        if cache_key in _cache:
-            data, timestamp = _cache[cache_key]
-            if datetime.now() - timestamp < timedelta(seconds=CACHE_TTL_SECONDS):
-                logger.info(f"Cache hit for: {cache_key[:50]}...")
-                return data
-            else:
-                del _cache[cache_key]
-        return None
-    
-    def _set_cache(self, cache_key: str, data: Dict):
-        """Cache response with timestamp"""
-        _cache[cache_key] = (data, datetime.now())
-    
     def search_jobs(
         self,
         query: str,
@@ -71,17 +115,15 @@ class AdzunaClient:
         Returns:
             Dictionary with job results and metadata
         """
-        # Check cache first
-        cache_key = f"{query}_{location}_{country}_{page}_{salary_min}_{salary_max}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        results_per_page = min(results_per_page, 50)
+        # Every parameter that changes the response, so a 10-result page never answers a 50-result request
+        cache_key = f"{query}_{location}_{country}_{page}_{results_per_page}_{salary_min}_{salary_max}_{full_time}"
         
-        # If no API credentials, return mock data
-        if not self.app_id or not self.api_key:
+        # If no API credentials, return mock data (replays need no credentials)
+        if (not self.app_id or not self.api_key) and not is_replaying():
             return self._get_mock_jobs(query, location)
         
-        try:
+        def fetch():
             url = f"{self.BASE_URL}/jobs/{country}/search/{page}"
             
             params = {
@@ -89,7 +131,7 @@ class AdzunaClient:
                 "app_key": self.api_key,
                 "what": query,
                 "where": location,
-                "results_per_page": min(results_per_page, 50),
+                "results_per_page": results_per_page,
                 "content-type": "application/json"
             }
             
@@ -100,9 +142,7 @@ class AdzunaClient:
             if full_time:
                 params["full_time"] = 1
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json("adzuna.search", url, params)
             
             # Transform to our format
             result = {
@@ -114,16 +154,46 @@ class AdzunaClient:
                 "source": "adzuna_live",
                 "timestamp": datetime.now().isoformat()
             }
-            
-            # Cache the result
-            self._set_cache(cache_key, result)
-            
             logger.info(f"Adzuna API returned {len(result['jobs'])} jobs for '{query}' in '{location}'")
+            # The first page marks the search (with its filters) as fresh in the local index
+            self._index_listings(result["jobs"], query, location, page == 1, salary_min, salary_max)
             return result
-            
+        
+        try:
+            # Cached (possibly stale while a refresh runs), or fetched once for all concurrent callers
+            return _swr.get(cache_key, fetch)
         except requests.exceptions.RequestException as e:
             logger.error(f"Adzuna API error: {e}")
-            return self._get_mock_jobs(query, location, error=str(e))
+            return self._get_mock_jobs(query, location, error=str(e),
+                                       rate_limited=isinstance(e, AdzunaRateLimitError))
+    
+    def _index_listings(self, jobs: List[Dict], query: Optional[str], location: str, mark_fresh: bool,
+                        salary_min: Optional[int] = None, salary_max: Optional[int] = None):
+        """Add live listings to the local job store (best effort)"""
+        store = get_job_store()
+        if store is None:
+            return
+        try:
+            counts = store.ingest(jobs, query=query, location=location, mark_fresh=mark_fresh,
+                                  salary_min=salary_min, salary_max=salary_max)
+            logger.info(f"Job store: {counts}")
+        except sqlite3.Error as e:
+            logger.warning(f"Job store ingest failed: {e}")
+    
+    def _get_json(self, service: str, url: str, params: Dict) -> Dict:
+        """GET an Adzuna endpoint (recorded/replayed when cassettes are on)"""
+        def fetch():
+            if not _limiter.acquire(RATE_LIMIT_WAIT_SECONDS):
+                raise AdzunaRateLimitError(f"Adzuna rate limit: request budget exhausted ({service})")
+            response = get_http_client().get("adzuna", url, params=params, timeout=10)
+            response.raise_for_status()
+            return response.json()
+        
+        public_params = {k: v for k, v in params.items() if k not in ("app_id", "app_key")}
+        return through_cassette(
+            service, {"url": url, "params": public_params}, fetch,
+            error_cls=requests.exceptions.RequestException
+        )
     
     def _transform_jobs(self, jobs: List[Dict]) -> List[Dict]:
         """Transform Adzuna job format to our standard format"""
@@ -162,10 +232,11 @@ class AdzunaClient:
             return f"Up to ₹{max_lpa}L per annum"
         return "Not Disclosed"
     
-    def _get_mock_jobs(self, query: str, location: str, error: str = None) -> Dict:
-        """Return mock data when API is unavailable"""
+    def _get_mock_jobs(self, query: str, location: str, error: str = None, rate_limited: bool = False) -> Dict:
+        """Return mock data when API is unavailable (rate_limited: the request budget ran out)"""
         return {
             "success": True,
+            "rate_limited": rate_limited,
             "total_count": 3,
             "query": query,
             "location": location,
@@ -216,14 +287,11 @@ class AdzunaClient:
         Get salary distribution data for a job title
         """
         cache_key = f"salary_{job_title}_{location}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
         
-        if not self.app_id or not self.api_key:
+        if (not self.app_id or not self.api_key) and not is_replaying():
             return self._get_mock_salary(job_title, location)
         
-        try:
+        def fetch():
             url = f"{self.BASE_URL}/jobs/{country}/history"
             params = {
                 "app_id": self.app_id,
@@ -232,11 +300,9 @@ class AdzunaClient:
                 "location0": location
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json("adzuna.history", url, params)
             
-            result = {
+            return {
                 "success": True,
                 "job_title": job_title,
                 "location": location,
@@ -244,10 +310,9 @@ class AdzunaClient:
                 "source": "adzuna_live",
                 "timestamp": datetime.now().isoformat()
             }
-            
-            self._set_cache(cache_key, result)
-            return result
-            
+        
+        try:
+            return _swr.get(cache_key, fetch)
         except requests.exceptions.RequestException as e:
             logger.error(f"Salary API error: {e}")
             return self._get_mock_salary(job_title, location)
@@ -0,0 +1,332 @@
+"""
+Concurrent multi-page Adzuna fetches with streamed aggregation.
+
+Company and market questions used to read page 1 only: get_company_job_count
+filtered 10 listings by substring, so any company with more openings than
+fit on one page was undercounted. fetch_pages() reads up to max_pages pages
+of 50:
+- page 1 first, which gives the total count (and is often the whole answer)
+- the remaining pages concurrently (ADZUNA_PAGE_THREADS at a time), each
+  under the Adzuna request budget
+  (see job_api.RequestRateLimiter); a page the budget cannot cover in time
+  ends the fetch instead of waiting
+- each page is fed to the aggregators as it arrives (listings repeated across
+  pages are dropped), and once every aggregator reports a stable answer no
+  further pages are requested
+
+Pages go through AdzunaClient.search_jobs, so they are cached and added to
+the job store like any other search.
+
+Settings:
+    ADZUNA_MAX_PAGES       pages per multi-page fetch (default 5)
+    ADZUNA_PAGE_THREADS    concurrent page requests per worker (default 4)
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from core.metrics import get_metrics
+from .job_api import get_adzuna_client
+from .skills import get_skill_matcher
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50  # Adzuna's maximum results_per_page
+
+
+class Aggregator(ABC):
+    """
+    Running summary over the listings of a multi-page fetch.
+
+    Subclasses implement add() and snapshot(); the answer is stable once the
+    last `patience` page snapshots agree (see _close).
+    """
+
+    patience = 2
+
+    def __init__(self):
+        self.jobs_seen = 0
+        self._history: List[Any] = []
+
+    def feed(self, jobs: List[Dict], total_count: int):
+        self.jobs_seen += len(jobs)
+        for job in jobs:
+            self.add(job)
+        self._history.append(self.snapshot(total_count))
+
+    @abstractmethod
+    def add(self, job: Dict):
+        """Count one listing"""
+
+    @abstractmethod
+    def snapshot(self, total_count: int) -> Any:
+        """The current answer, compared between pages to decide stability"""
+
+    def _close(self, previous: Any, current: Any) -> bool:
+        return previous == current
+
+    def stable(self) -> bool:
+        recent = self._history[-(self.patience + 1):]
+        return len(recent) > self.patience and all(
+            self._close(a, b) for a, b in zip(recent, recent[1:]))
+
+
+def _words(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9&+#]+", (text or "").lower()))
+
+
+class CompanyCounter(Aggregator):
+    """Listings per company; with a target, its count and an estimate over all pages"""
+
+    tolerance = 0.05  # relative change in the estimate still counted as stable
+
+    def __init__(self, company: Optional[str] = None, samples: int = 5):
+        super().__init__()
+        self.target = _words(company) if company else None
+        self.samples = samples
+        self.counts: Dict[str, int] = {}
+        self.matches: List[Dict] = []
+
+    def is_target(self, company: str) -> bool:
+        # Whole words, so "ola" does not match "Motorola"
+        return bool(self.target) and f" {self.target} " in f" {_words(company)} "
+
+    def add(self, job: Dict):
+        company = job.get("company") or "Company Not Listed"
+        self.counts[company] = self.counts.get(company, 0) + 1
+        if self.is_target(company):
+            self.matches.append(job)
+
+    def estimate(self, total_count: int) -> int:
+        """Target listings among all total_count results, extrapolated from the pages seen"""
+        if not self.jobs_seen or total_count <= self.jobs_seen:
+            return len(self.matches)
+        return round(len(self.matches) * total_count / self.jobs_seen)
+
+    def snapshot(self, total_count: int) -> int:
+        return self.estimate(total_count)
+
+    def _close(self, previous: int, current: int) -> bool:
+        return abs(current - previous) <= max(1, self.tolerance * max(previous, current))
+
+    def top(self, k: int = 5) -> List[Dict[str, Any]]:
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [{"company": name, "jobs": n} for name, n in ranked]
+
+    def sample_jobs(self) -> List[Dict]:
+        return self.matches[:self.samples]
+
+
+class SalaryHistogram(Aggregator):
+    """Histogram of listing salaries (midpoint of the range) in LPA bands"""
+
+    tolerance = 0.05  # relative change in the median still counted as stable
+
+    def __init__(self, band_lpa: float = 5):
+        super().__init__()
+        self.band_lpa = band_lpa
+        self.salaries: List[float] = []
+
+    def add(self, job: Dict):
+        low, high = job.get("salary_min"), job.get("salary_max")
+        if low or high:
+            self.salaries.append(((low or high) + (high or low)) / 2 / 100000)
+
+    def median(self) -> Optional[float]:
+        if not self.salaries:
+            return None
+        ordered = sorted(self.salaries)
+        return round(ordered[len(ordered) // 2], 1)
+
+    def snapshot(self, total_count: int) -> Optional[float]:
+        return self.median()
+
+    def _close(self, previous: Optional[float], current: Optional[float]) -> bool:
+        if previous is None or current is None:
+            return previous == current
+        return abs(current - previous) <= self.tolerance * max(previous, current)
+
+    def histogram(self) -> List[Dict[str, Any]]:
+        bands: Dict[int, int] = {}
+        for salary in self.salaries:
+            band = int(salary // self.band_lpa)
+            bands[band] = bands.get(band, 0) + 1
+        return [
+            {"range_lpa": f"{band * self.band_lpa:g}-{(band + 1) * self.band_lpa:g}", "jobs": n}
+            for band, n in sorted(bands.items())
+        ]
+
+
+class SkillCounter(Aggregator):
+    """Skill mentions per listing (taxonomy in mcp/skills.py); stable when the top-k stops changing"""
+
+    def __init__(self, top_k: int = 5):
+        super().__init__()
+        self.top_k = top_k
+        self.counts: Dict[str, int] = {}
+        self._matcher = get_skill_matcher()
+
+    def add(self, job: Dict):
+        for skill in self._matcher.extract(f"{job.get('title', '')} {job.get('description', '')}"):
+            self.counts[skill] = self.counts.get(skill, 0) + 1
+
+    def top(self, k: Optional[int] = None) -> List[str]:
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return [skill for skill, _ in ranked[:k or self.top_k]]
+
+    def snapshot(self, total_count: int) -> frozenset:
+        return frozenset(self.top())
+
+
+@dataclass
+class PagedFetch:
+    """Outcome of fetch_pages()"""
+    total_count: int = 0
+    pages_available: int = 0
+    pages_fetched: int = 0
+    jobs_seen: int = 0
+    stop_reason: str = "exhausted"  # exhausted | stable | max_pages | deadline | rate_limited | error
+    is_live_data: bool = False
+    elapsed_ms: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        """Every listing was seen, so aggregates are exact rather than estimates"""
+        return self.stop_reason == "exhausted"
+
+    def to_dict(self) -> dict:
+        return {
+            "total_count": self.total_count,
+            "pages_available": self.pages_available,
+            "pages_fetched": self.pages_fetched,
+            "jobs_analyzed": self.jobs_seen,
+            "stop_reason": self.stop_reason,
+            "is_live_data": self.is_live_data,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+        }
+
+
+def fetch_pages(query: str, location: str, aggregators: Sequence[Aggregator],
+                max_pages: Optional[int] = None, deadline_s: float = 12.0) -> PagedFetch:
+    """
+    Fetch up to max_pages pages for a search, feeding every page to the aggregators.
+
+    Args:
+        query: Adzuna "what"
+        location: Adzuna "where"
+        aggregators: Summaries to update; the fetch stops early when all are stable
+        max_pages: Page limit (default ADZUNA_MAX_PAGES)
+        deadline_s: Pages not back by then are abandoned
+
+    Returns:
+        PagedFetch with counts and why the fetch stopped
+    """
+    started = time.monotonic()
+    max_pages = max_pages or int(os.environ.get("ADZUNA_MAX_PAGES", "5"))
+    client = get_adzuna_client()
+    outcome = PagedFetch()
+    seen_ids = set()
+
+    def fetch(page: int) -> Dict:
+        return client.search_jobs(query=query, location=location, results_per_page=PAGE_SIZE, page=page)
+
+    def absorb(result: Dict) -> Optional[str]:
+        """Feed one page to the aggregators, or return why the fetch has to stop"""
+        outcome.pages_fetched += 1
+        source = result.get("source", "")
+        if source != "adzuna_live":
+            # Mock data (no credentials) or a failed call; never mix it into live aggregates
+            return "rate_limited" if result.get("rate_limited") else "error"
+        jobs = []
+        for job in result.get("jobs", []):
+            key = job.get("id") or id(job)
+            if key not in seen_ids:
+                seen_ids.add(key)
+                jobs.append(job)
+        outcome.jobs_seen += len(jobs)
+        for aggregator in aggregators:
+            aggregator.feed(jobs, outcome.total_count)
+        return None
+
+    def all_stable() -> bool:
+        return bool(aggregators) and all(aggregator.stable() for aggregator in aggregators)
+
+    first = fetch(1)
+    outcome.total_count = first.get("total_count", 0)
+    stop = absorb(first)
+    outcome.is_live_data = stop is None
+    outcome.pages_available = max(1, math.ceil(outcome.total_count / PAGE_SIZE))
+    remaining_pages = list(range(2, min(outcome.pages_available, max_pages) + 1))
+    if stop:
+        outcome.stop_reason = stop
+        remaining_pages = []
+    elif outcome.pages_available > max_pages:
+        outcome.stop_reason = "max_pages"
+
+    # Keep at most ADZUNA_PAGE_THREADS pages in flight and only start another
+    # after checking stability, so an early stop does not spend requests
+    in_flight = max(1, int(os.environ.get("ADZUNA_PAGE_THREADS", "4")))
+    pending = set()
+
+    def top_up():
+        while remaining_pages and len(pending) < in_flight:
+            pending.add(get_page_pool().submit(fetch, remaining_pages.pop(0)))
+
+    top_up()
+    while pending:
+        timeout = deadline_s - (time.monotonic() - started)
+        if timeout <= 0:
+            outcome.stop_reason = "deadline"
+            break
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        pending.difference_update(done)
+        for future in done:
+            try:
+                stop = absorb(future.result())
+            except Exception as e:
+                logger.warning(f"[Pages] '{query}' page failed: {e}")
+                stop = "error"
+            if stop:
+                outcome.stop_reason = stop
+                break
+        if stop:
+            break
+        if (pending or remaining_pages) and all_stable():
+            outcome.stop_reason = "stable"
+            break
+        top_up()
+    # Pages still running finish in the background (and are cached and indexed)
+
+    outcome.elapsed_ms = (time.monotonic() - started) * 1000
+    metrics = get_metrics()
+    metrics.incr("adzuna.paged_fetch", stop=outcome.stop_reason)
+    metrics.observe("adzuna.pages", outcome.pages_fetched)
+    logger.info(f"[Pages] '{query}' in '{location}': {outcome.pages_fetched}/{outcome.pages_available} pages, "
+                f"stopped: {outcome.stop_reason}, {outcome.elapsed_ms:.0f}ms")
+    return outcome
+
+
+# Threads that fetch result pages
+_page_pool: Optional[ThreadPoolExecutor] = None
+_page_lock = threading.Lock()
+
+
+def get_page_pool() -> ThreadPoolExecutor:
+    """Shared executor for concurrent Adzuna page requests"""
+    global _page_pool
+    if _page_pool is None:
+        with _page_lock:
+            if _page_pool is None:
+                _page_pool = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("ADZUNA_PAGE_THREADS", "4")),
+                    thread_name_prefix="adzuna-page"
+                )
+    return _page_pool
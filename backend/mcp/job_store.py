@@ -0,0 +1,489 @@
+"""
+Local store of ingested job listings.
+
+Every live Adzuna search used to return one page of listings, which were
+dropped again when the cache entry expired. Listings are now kept in a SQLite
+file (WAL mode, shared by all workers on the host), keyed by the Adzuna id:
+- the same job cross-posted under different ids (agencies, job boards) is
+  detected by a 64-bit SimHash of its title, company, city and description,
+  and stored as a duplicate of the first copy so it does not crowd results
+  (when that copy is pruned, its newest remaining copy takes its place)
+- title, company and description are full-text indexed (SQLite FTS5 with
+  Porter stemming, or LIKE matching where the SQLite build has no FTS5), and city, company, salary and
+  posted date are indexed columns
+so /api/mcp/jobs can answer from here first, including filters and sort
+orders Adzuna cannot do, and only call Adzuna when the listings for a query
+are older than JOB_STORE_FRESH_SECONDS. Ingesting also counts skill mentions
+per day for the search's domain and city (see mcp/skills.py).
+
+Settings:
+    JOB_STORE_PATH             SQLite file (default: system temp dir)
+    JOB_STORE_FRESH_SECONDS    age after which a query is re-fetched live (default 3600)
+    JOB_STORE_RETENTION_DAYS   listings not seen for this long are deleted (default 30)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.sqlite_util import SQLiteFile
+from .router import get_router
+from .skills import day_bucket, get_skill_matcher, normalize_domain
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+# Listings within this Hamming distance are the same job. With 4 bands of 16
+# bits, two hashes this close always share at least one band exactly.
+DUPLICATE_DISTANCE = 3
+_BANDS = 4
+_BAND_BITS = SIMHASH_BITS // _BANDS
+
+SORTS = ("relevance", "salary", "date")
+NATIONWIDE = "india"  # the router's canonical value for "india" and "remote"
+PRUNE_INTERVAL_SECONDS = 3600
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the text's words and word pairs"""
+    words = _tokens(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _bands(value: int) -> List[int]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(value >> (i * _BAND_BITS)) & mask for i in range(_BANDS)]
+
+
+def _posted_timestamp(posted_date: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an Adzuna "created" value ("2024-05-01T09:30:00Z")"""
+    if not posted_date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(posted_date.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def listing_fingerprint(job: Dict[str, Any]) -> int:
+    # The description is truncated by the transform, so it is still comparable across copies
+    return simhash(" ".join(str(job.get(field) or "") for field in ("title", "company", "location", "description")))
+
+
+def normalize_city(location: Optional[str]) -> Optional[str]:
+    """Canonical city for a location string ("Bengaluru, Karnataka" -> "bangalore")"""
+    if not location:
+        return None
+    return get_router().route(location).location or location.split(",")[0].strip().lower() or None
+
+
+def city_filter(location: Optional[str]) -> Optional[str]:
+    """Canonical city to filter on, or None for a country-wide search ("india", "remote")"""
+    city = get_router().route(location or "").location
+    return None if city == NATIONWIDE else city
+
+
+class JobStore:
+    """Job listings with dedup, full-text search and structured filters"""
+
+    COLUMNS = ("id", "title", "company", "location", "city", "salary_min", "salary_max",
+               "salary_display", "description", "url", "posted_date", "contract_type", "category")
+
+    def __init__(self, path: str, fresh_seconds: float = 3600, retention_days: float = 30):
+        self.path = path
+        self.fresh_seconds = fresh_seconds
+        self.retention_seconds = retention_days * 86400
+        self._db = SQLiteFile(path, row_factory=sqlite3.Row)
+        self._last_prune = 0.0
+        with self._db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_listings ("
+                "id TEXT PRIMARY KEY, title TEXT, company TEXT, location TEXT, city TEXT, "
+                "salary_min REAL, salary_max REAL, salary_display TEXT, description TEXT, url TEXT, "
+                "posted_date TEXT, contract_type TEXT, category TEXT, "
+                "simhash INTEGER NOT NULL, band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER, "
+                "duplicate_of TEXT, first_seen_at REAL NOT NULL, last_seen_at REAL NOT NULL)"
+            )
+            for column in ("city", "company", "salary_min", "salary_max", "posted_date", "last_seen_at",
+                           "band0", "band1", "band2", "band3"):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_job_listings_{column} ON job_listings ({column})")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_queries ("
+                "query_key TEXT PRIMARY KEY, fetched_at REAL NOT NULL)"
+            )
+            # Skill analytics: each posting counts once per search domain, in the
+            # day bucket of its posted date
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_domains ("
+                "job_id TEXT NOT NULL, domain TEXT NOT NULL, PRIMARY KEY (job_id, domain))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS posting_buckets ("
+                "domain TEXT NOT NULL, city TEXT NOT NULL, bucket INTEGER NOT NULL, postings INTEGER NOT NULL, "
+                "PRIMARY KEY (domain, city, bucket))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS skill_buckets ("
+                "domain TEXT NOT NULL, city TEXT NOT NULL, bucket INTEGER NOT NULL, skill TEXT NOT NULL, "
+                "mentions INTEGER NOT NULL, PRIMARY KEY (domain, city, bucket, skill))"
+            )
+            try:
+                self._create_fts(conn)
+                self.fts = True
+            except sqlite3.OperationalError:
+                logger.warning("[JobStore] SQLite has no FTS5; using LIKE matching")
+                self.fts = False
+
+    @staticmethod
+    def _create_fts(conn: sqlite3.Connection):
+        # Porter stemming, so "developers" matches a listing titled "Developer"
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'job_listings_fts'").fetchone()
+        if row is not None and "porter" in row["sql"]:
+            return
+        if row is not None:
+            # Index from before stemming: rebuild it from the canonical listings
+            conn.execute("DROP TABLE job_listings_fts")
+        conn.execute(
+            "CREATE VIRTUAL TABLE job_listings_fts USING fts5("
+            "title, company, description, content='job_listings', content_rowid='rowid', "
+            "tokenize='porter unicode61')"
+        )
+        conn.execute(
+            "INSERT INTO job_listings_fts (rowid, title, company, description) "
+            "SELECT rowid, title, company, description FROM job_listings WHERE duplicate_of IS NULL"
+        )
+
+    # --- ingestion ---
+
+    def ingest(self, jobs: Iterable[Dict[str, Any]], query: Optional[str] = None,
+               location: Optional[str] = None, mark_fresh: bool = True,
+               salary_min: Optional[float] = None, salary_max: Optional[float] = None) -> Dict[str, int]:
+        """
+        Store transformed Adzuna listings (see AdzunaClient._transform_jobs).
+
+        Args:
+            jobs: Listings; entries without an id are skipped
+            query / location: The search that returned them; for unfiltered
+                searches the query is the domain their skill mentions count towards
+            mark_fresh: Record the search as fetched now (for its first page)
+            salary_min / salary_max: Salary filters of the search; part of its
+                freshness key (see query_key)
+
+        Returns:
+            Counts of inserted, updated and duplicate listings
+        """
+        now = time.time()
+        counts = {"inserted": 0, "updated": 0, "duplicates": 0}
+        # A salary-filtered page is a skewed sample of the domain, so it is not counted
+        filtered = bool(salary_min or salary_max)
+        domain = normalize_domain(query) if query and not filtered else None
+        with self._db.transaction() as conn:
+            for job in jobs:
+                if not job.get("id"):
+                    continue
+                job_id = str(job["id"])
+                row = {column: job.get(column) for column in self.COLUMNS}
+                row["id"] = job_id
+                row["city"] = normalize_city(job.get("location"))
+                existing = conn.execute("SELECT rowid, duplicate_of FROM job_listings WHERE id = ?", (job_id,)).fetchone()
+                if existing is not None:
+                    self._fts_delete(conn, existing["rowid"])
+                    conn.execute(
+                        f"UPDATE job_listings SET {', '.join(f'{c} = ?' for c in self.COLUMNS[1:])}, "
+                        "last_seen_at = ? WHERE id = ?",
+                        [row[c] for c in self.COLUMNS[1:]] + [now, job_id]
+                    )
+                    if not existing["duplicate_of"]:
+                        self._fts_insert(conn, existing["rowid"], row)
+                    counts["updated"] += 1
+                    if domain:
+                        self._count_skills(conn, existing["duplicate_of"] or job_id, domain, row, now)
+                    continue
+                fingerprint = listing_fingerprint(job)
+                duplicate_of = self._find_duplicate(conn, fingerprint)
+                cursor = conn.execute(
+                    f"INSERT INTO job_listings ({', '.join(self.COLUMNS)}, simhash, band0, band1, band2, band3, "
+                    "duplicate_of, first_seen_at, last_seen_at) "
+                    f"VALUES ({', '.join('?' * len(self.COLUMNS))}, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row[c] for c in self.COLUMNS] + [_signed(fingerprint)] + _bands(fingerprint)
+                    + [duplicate_of, now, now]
+                )
+                if duplicate_of:
+                    counts["duplicates"] += 1
+                else:
+                    self._fts_insert(conn, cursor.lastrowid, row)
+                    counts["inserted"] += 1
+                if domain:
+                    self._count_skills(conn, duplicate_of or job_id, domain, row, now)
+            if query is not None and mark_fresh:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_queries (query_key, fetched_at) VALUES (?, ?)",
+                    (self.query_key(query, location, salary_min, salary_max), now)
+                )
+        if now - self._last_prune > PRUNE_INTERVAL_SECONDS:
+            self.prune()
+        return counts
+
+    def _count_skills(self, conn: sqlite3.Connection, job_id: str, domain: str,
+                      row: Dict[str, Any], now: float):
+        """Add a posting's skill mentions to its domain's buckets, the first time only"""
+        if not conn.execute("INSERT OR IGNORE INTO job_domains (job_id, domain) VALUES (?, ?)",
+                            (job_id, domain)).rowcount:
+            return  # already counted for this domain (or it is a copy of one that was)
+        city = row.get("city") or ""
+        bucket = day_bucket(min(_posted_timestamp(row.get("posted_date")) or now, now))
+        conn.execute(
+            "INSERT INTO posting_buckets (domain, city, bucket, postings) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (domain, city, bucket) DO UPDATE SET postings = postings + 1",
+            (domain, city, bucket)
+        )
+        skills = get_skill_matcher().extract(f"{row.get('title') or ''} {row.get('description') or ''}")
+        conn.executemany(
+            "INSERT INTO skill_buckets (domain, city, bucket, skill, mentions) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT (domain, city, bucket, skill) DO UPDATE SET mentions = mentions + 1",
+            [(domain, city, bucket, skill) for skill in skills]
+        )
+
+    def _find_duplicate(self, conn: sqlite3.Connection, fingerprint: int) -> Optional[str]:
+        bands = _bands(fingerprint)
+        rows = conn.execute(
+            "SELECT id, simhash, duplicate_of FROM job_listings "
+            "WHERE band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?", bands
+        ).fetchall()
+        for row in rows:
+            if bin((row["simhash"] & (2 ** 64 - 1)) ^ fingerprint).count("1") <= DUPLICATE_DISTANCE:
+                return row["duplicate_of"] or row["id"]
+        return None
+
+    def _fts_insert(self, conn: sqlite3.Connection, rowid: int, row: Dict[str, Any]):
+        if self.fts:
+            conn.execute(
+                "INSERT INTO job_listings_fts (rowid, title, company, description) VALUES (?, ?, ?, ?)",
+                (rowid, row.get("title") or "", row.get("company") or "", row.get("description") or "")
+            )
+
+    def _fts_delete(self, conn: sqlite3.Connection, rowid: int):
+        if not self.fts:
+            return
+        row = conn.execute(
+            "SELECT title, company, description, duplicate_of FROM job_listings WHERE rowid = ?", (rowid,)
+        ).fetchone()
+        if row is not None and not row["duplicate_of"]:
+            conn.execute(
+                "INSERT INTO job_listings_fts (job_listings_fts, rowid, title, company, description) "
+                "VALUES ('delete', ?, ?, ?, ?)",
+                (rowid, row["title"] or "", row["company"] or "", row["description"] or "")
+            )
+
+    def prune(self) -> int:
+        """Delete listings not seen for JOB_STORE_RETENTION_DAYS (a deleted listing's newest copy replaces it)"""
+        self._last_prune = time.time()
+        cutoff = self._last_prune - self.retention_seconds
+        with self._db.transaction() as conn:
+            stale = conn.execute(
+                "SELECT rowid, id, duplicate_of FROM job_listings WHERE last_seen_at < ?", (cutoff,)
+            ).fetchall()
+            for row in stale:
+                self._fts_delete(conn, row["rowid"])
+                if not row["duplicate_of"]:
+                    self._promote_duplicate(conn, row["id"], cutoff)
+            deleted = conn.execute("DELETE FROM job_listings WHERE last_seen_at < ?", (cutoff,)).rowcount
+            conn.execute("DELETE FROM job_queries WHERE fetched_at < ?", (cutoff,))
+            conn.execute("DELETE FROM job_domains WHERE job_id NOT IN (SELECT id FROM job_listings)")
+            for table in ("posting_buckets", "skill_buckets"):
+                conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (day_bucket(cutoff),))
+        return deleted
+
+    def _promote_duplicate(self, conn: sqlite3.Connection, job_id: str, cutoff: float):
+        """
+        A canonical listing is being pruned: its newest copy still seen since
+        the cutoff takes its place, so the job stays searchable.
+        """
+        successor = conn.execute(
+            "SELECT rowid, id, title, company, description FROM job_listings "
+            "WHERE duplicate_of = ? AND last_seen_at >= ? ORDER BY last_seen_at DESC LIMIT 1",
+            (job_id, cutoff)
+        ).fetchone()
+        if successor is None:
+            return
+        conn.execute("UPDATE job_listings SET duplicate_of = NULL WHERE rowid = ?", (successor["rowid"],))
+        conn.execute(
+            "UPDATE job_listings SET duplicate_of = ? WHERE duplicate_of = ? AND last_seen_at >= ?",
+            (successor["id"], job_id, cutoff)
+        )
+        # Skill mentions already counted for the job stay counted once
+        conn.execute("UPDATE OR IGNORE job_domains SET job_id = ? WHERE job_id = ?", (successor["id"], job_id))
+        self._fts_insert(conn, successor["rowid"], dict(successor))
+
+    # --- search ---
+
+    @staticmethod
+    def query_key(query: str, location: Optional[str], salary_min: Optional[float] = None,
+                  salary_max: Optional[float] = None) -> str:
+        key = f"{' '.join(_tokens(query))}|{normalize_city(location) or ''}"
+        if salary_min or salary_max:
+            key += f"|{int(salary_min or 0)}-{int(salary_max or 0)}"
+        return key
+
+    def is_fresh(self, query: str, location: Optional[str], salary_min: Optional[float] = None,
+                 salary_max: Optional[float] = None) -> bool:
+        """Whether this search (with these salary filters) was fetched live within JOB_STORE_FRESH_SECONDS"""
+        row = self._db.conn().execute(
+            "SELECT fetched_at FROM job_queries WHERE query_key = ?",
+            (self.query_key(query, location, salary_min, salary_max),)
+        ).fetchone()
+        return row is not None and time.time() - row["fetched_at"] < self.fresh_seconds
+
+    def search(self, query: str = "", city: Optional[str] = None, company: Optional[str] = None,
+               salary_min: Optional[float] = None, salary_max: Optional[float] = None,
+               posted_after: Optional[str] = None, sort: str = "relevance",
+               limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """
+        Listings matching a keyword query and filters, without duplicates.
+
+        Args:
+            query: Keywords; every word must appear in the title, company or description
+                (with full-text search, in any inflection: "developers" matches "developer")
+            city: City name or alias ("bengaluru")
+            company: Company name (case-insensitive substring)
+            salary_min / salary_max: Annual INR; listings without a salary never match
+            posted_after: ISO date; only listings posted on or after it
+            sort: "relevance" (full-text rank, then newest), "salary" (highest first) or "date" (newest first)
+            limit / offset: Paging
+
+        Returns:
+            {"total": matching listings, "jobs": this page}
+        """
+        words = _tokens(query)
+        where, params = ["j.duplicate_of IS NULL"], []
+        source = "job_listings j"
+        if words and self.fts:
+            source = ("(SELECT rowid, bm25(job_listings_fts) AS score FROM job_listings_fts "
+                      "WHERE job_listings_fts MATCH ?) f JOIN job_listings j ON j.rowid = f.rowid")
+            params.append(" ".join(f'"{word}"' for word in words))
+        elif words:
+            for word in words:
+                where.append("(j.title LIKE ? OR j.company LIKE ? OR j.description LIKE ?)")
+                params.extend([f"%{word}%"] * 3)
+        if city:
+            where.append("j.city = ?")
+            params.append(normalize_city(city))
+        if company:
+            where.append("j.company LIKE ?")
+            params.append(f"%{company}%")
+        if salary_min:
+            where.append("COALESCE(j.salary_max, j.salary_min) >= ?")
+            params.append(salary_min)
+        if salary_max:
+            where.append("COALESCE(j.salary_min, j.salary_max) <= ?")
+            params.append(salary_max)
+        if posted_after:
+            where.append("j.posted_date >= ?")
+            params.append(posted_after)
+
+        if sort == "salary":
+            order = "COALESCE(j.salary_max, j.salary_min) IS NULL, COALESCE(j.salary_max, j.salary_min) DESC"
+        elif sort == "date" or not (words and self.fts):
+            order = "j.posted_date DESC"
+        else:
+            order = "f.score, j.posted_date DESC"
+        rows = self._db.conn().execute(
+            f"SELECT {', '.join('j.' + c for c in self.COLUMNS)}, COUNT(*) OVER () AS total FROM {source} "
+            f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        jobs = [dict(row) for row in rows]
+        total = jobs[0]["total"] if jobs else 0
+        for job in jobs:
+            del job["total"]
+        return {"total": total, "jobs": jobs}
+
+    def skill_counts(self, domain: str, city: Optional[str], since_bucket: int) -> Dict[str, dict]:
+        """
+        Raw day buckets for a domain (see mcp/skills.trending_skills).
+
+        Returns:
+            {"postings": {bucket: postings}, "mentions": {(skill, bucket): mentions}}
+        """
+        where, params = "domain = ? AND bucket >= ?", [domain, since_bucket]
+        if city:
+            where += " AND city = ?"
+            params.append(normalize_city(city))
+        conn = self._db.conn()
+        postings: Dict[int, int] = {}
+        for bucket, n in conn.execute(
+                f"SELECT bucket, SUM(postings) FROM posting_buckets WHERE {where} GROUP BY bucket", params):
+            postings[bucket] = n
+        mentions = {
+            (skill, bucket): n for skill, bucket, n in conn.execute(
+                f"SELECT skill, bucket, SUM(mentions) FROM skill_buckets WHERE {where} GROUP BY skill, bucket",
+                params)
+        }
+        return {"postings": postings, "mentions": mentions}
+
+    def get_status(self) -> dict:
+        conn = self._db.conn()
+        total, duplicates = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(duplicate_of IS NOT NULL), 0) FROM job_listings"
+        ).fetchone()
+        return {
+            "path": self.path,
+            "listings": total - duplicates,
+            "duplicates": duplicates,
+            "queries": conn.execute("SELECT COUNT(*) FROM job_queries").fetchone()[0],
+            "full_text": "fts5" if self.fts else "like",
+        }
+
+
+# Global singleton instance
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> Optional[JobStore]:
+    """The shared job store, or None if its file cannot be opened"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = os.environ.get("JOB_STORE_PATH") or os.path.join(
+                    tempfile.gettempdir(), "opec_job_listings.sqlite3")
+                try:
+                    _store = JobStore(
+                        path,
+                        fresh_seconds=float(os.environ.get("JOB_STORE_FRESH_SECONDS", "3600")),
+                        retention_days=float(os.environ.get("JOB_STORE_RETENTION_DAYS", "30"))
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"[JobStore] Disabled, could not open {path}: {e}")
+                    return None
+    return _store
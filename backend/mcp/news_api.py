@@ -4,7 +4,9 @@ Uses DuckDuckGo to fetch real-time news and industry trends.
 """
 import logging
 from typing import List, Dict, Any
-from duckduckgo_search import DDGS
+
+from core.cassette import through_cassette
+from .ddg import get_ddgs, reset_ddgs
 
 logger = logging.getLogger(__name__)
 
@@ -14,19 +16,25 @@ def search_news(query: str, max_results: int = 5) -> Dict[str, Any]:
     """
     try:
         results = []
-        with DDGS() as ddgs:
-            # 'n' for news search
-            ddgs_news = ddgs.news(query, max_results=max_results)
-            if ddgs_news:
-                for r in ddgs_news:
-                    results.append({
-                        "title": r.get('title'),
-                        "body": r.get('body'), # Snippet
-                        "url": r.get('url'),
-                        "source": r.get('source'),
-                        "date": r.get('date'),
-                        "image": r.get('image')
-                    })
+        
+        def fetch():
+            try:
+                return list(get_ddgs().news(query, max_results=max_results) or [])
+            except Exception:
+                reset_ddgs()
+                raise
+        
+        ddgs_news = through_cassette("ddg.news", {"query": query, "max_results": max_results}, fetch)
+        if ddgs_news:
+            for r in ddgs_news:
+                results.append({
+                    "title": r.get('title'),
+                    "body": r.get('body'), # Snippet
+                    "url": r.get('url'),
+                    "source": r.get('source'),
+                    "date": r.get('date'),
+                    "image": r.get('image')
+                })
         
         return {
             "success": True,
@@ -0,0 +1,284 @@
+"""
+Intent router and entity extractor for live-data questions.
+
+Chat enrichment (mcp/enrichment.py) and POST /api/mcp/query both need to know
+what a message asks for (jobs, salary, news, ...) and about what (a city, a
+company, a role, a salary floor). Every trigger phrase and gazetteer entry is
+compiled into one regex, a character trie of all phrases, which is run over
+the message once. At each word it follows only the trie branch for the next
+character, so routing cost grows with message length, not with the number
+of phrases:
+
+    route = get_router().route("jobs and salary for data analysts in Pune")
+    route.intents      -> ["jobs", "salary"]
+    route.location     -> "pune"
+    route.topic        -> "data analyst"
+
+Phrases only match whole words ("in" never matches inside "engineering") and
+longer phrases win over their prefixes ("interview process" over
+"interview"). Words that are not part of a phrase and not filler make up the
+topic; trigger phrases are left out only before the first or after the last
+topic word, so "python package manager tutorial" keeps "python package
+manager". Aliases are folded to one canonical value (bengaluru -> bangalore,
+sde -> software engineer).
+
+scripts/bench_router.py measures routing cost against message length.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INTENTS = ("jobs", "salary", "news", "videos", "company_research", "skills")
+
+# Intent -> trigger phrases (whole words; inflections listed explicitly)
+INTENT_PHRASES = {
+    "jobs": ["job", "jobs", "hiring", "hire", "vacancy", "vacancies", "opening", "openings",
+             "work", "working", "internship", "internships", "placement", "placements"],
+    "salary": ["salary", "salaries", "earn", "earns", "earning", "earnings", "pay", "pays", "paid",
+               "ctc", "compensation", "stipend"],
+    "news": ["news", "trend", "trends", "trending", "latest", "happening", "update", "updates"],
+    "videos": ["learn", "learning", "how to", "tutorial", "tutorials", "video", "videos",
+               "course", "courses", "guide", "guides"],
+    "company_research": ["research", "culture", "interview process", "values", "analyze company",
+                         "tell me about", "work culture", "reviews"],
+    "skills": ["skill", "skills", "trending", "in demand", "in-demand", "learn"],
+}
+
+# Phrases that ask about salary only next to a salary amount or unit
+# ("a 12 LPA package", "package in lakhs"), not on their own ("python package")
+SALARY_CONTEXT_PHRASES = ["package", "packages"]
+SALARY_UNIT_WORDS = frozenset(["lpa", "lakh", "lakhs", "annum"])
+# Verbs that ask about salary only after "how much" or a role ("how much does a
+# data analyst make", "what do data scientists make"), not on their own
+# ("how to make a portfolio")
+SALARY_VERB_PHRASES = ["make", "makes"]
+SALARY_CUE_PHRASES = ["how much"]
+
+# Subjects whose names contain trigger phrases; they stay whole in the topic
+SUBJECT_PHRASES = ["machine learning", "deep learning", "reinforcement learning"]
+
+# Canonical city -> spellings
+CITIES = {
+    "bangalore": ["bangalore", "bengaluru", "blr"],
+    "mumbai": ["mumbai", "bombay"],
+    "delhi": ["delhi", "new delhi", "ncr"],
+    "hyderabad": ["hyderabad", "hyd"],
+    "chennai": ["chennai", "madras"],
+    "pune": ["pune"],
+    "kolkata": ["kolkata", "calcutta"],
+    "noida": ["noida"],
+    "gurgaon": ["gurgaon", "gurugram"],
+    "ahmedabad": ["ahmedabad"],
+    "kochi": ["kochi", "cochin"],
+    "india": ["india", "remote"],
+}
+
+COMPANIES = {
+    "google": ["google", "alphabet"], "microsoft": ["microsoft"], "amazon": ["amazon", "aws"],
+    "flipkart": ["flipkart"], "swiggy": ["swiggy"], "zomato": ["zomato"], "infosys": ["infosys"],
+    "tcs": ["tcs", "tata consultancy services"], "wipro": ["wipro"], "accenture": ["accenture"],
+    "deloitte": ["deloitte"], "cognizant": ["cognizant"], "hcl": ["hcl", "hcltech"],
+    "zoho": ["zoho"], "razorpay": ["razorpay"], "paytm": ["paytm"], "meta": ["meta", "facebook"],
+    "apple": ["apple"], "adobe": ["adobe"], "oracle": ["oracle"], "ibm": ["ibm"],
+    "goldman sachs": ["goldman sachs", "goldman"], "jp morgan": ["jp morgan", "jpmorgan"],
+}
+
+ROLES = {
+    "software engineer": ["software engineer", "software engineers", "software developer",
+                          "software developers", "sde", "swe"],
+    "frontend developer": ["frontend developer", "front end developer", "frontend developers"],
+    "backend developer": ["backend developer", "back end developer", "backend developers"],
+    "full stack developer": ["full stack developer", "fullstack developer", "full stack developers"],
+    "data analyst": ["data analyst", "data analysts"],
+    "data scientist": ["data scientist", "data scientists"],
+    "data engineer": ["data engineer", "data engineers"],
+    "machine learning engineer": ["machine learning engineer", "ml engineer", "ml engineers",
+                                  "machine learning engineers", "ai engineer", "ai engineers"],
+    "devops engineer": ["devops engineer", "devops engineers", "sre", "site reliability engineer"],
+    "product manager": ["product manager", "product managers"],
+    "ui ux designer": ["ui ux designer", "ux designer", "ui designer", "product designer"],
+    "business analyst": ["business analyst", "business analysts"],
+    "cybersecurity analyst": ["cybersecurity analyst", "security analyst", "security engineer"],
+    "cloud engineer": ["cloud engineer", "cloud engineers"],
+    "mechanical engineer": ["mechanical engineer", "mechanical engineers"],
+    "civil engineer": ["civil engineer", "civil engineers"],
+    "chartered accountant": ["chartered accountant", "chartered accountants"],
+}
+
+# Words that carry no topic once intents and entities are known
+FILLER_WORDS = frozenset("""
+a an and or the of in at on for to as about with from into me my i we you your is are was be what whats
+which who how much many does do did can could should would tell give show find get any some please
+want looking need near around best top good way ways company companies role roles field current currently
+lpa lakh lakhs per annum year month salary range analyze interview process
+above below over under more less than
+""".split())
+
+_SALARY_PATTERN = r"(?P<salary>\d+(?:\.\d+)?)\s*(?:lpa|lakhs?|l)\b"
+_WORD_PATTERN = r"(?P<word>[a-z0-9+#]+(?:[.\-][a-z0-9+#]+)*)"
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Regex matching any of the phrases, factored into a trie: "job", "jobs" and
+    "journal" become "jo(?:b(?:s)?|urnal)". Optional tails are greedy, so the
+    longest phrase is tried first and shorter ones only on backtracking.
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [
+            (r"\s+" if ch == " " else re.escape(ch)) + build(child)
+            for ch, child in sorted(node.items()) if ch
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+@dataclass
+class Route:
+    """What a message asks for and about what"""
+    intents: List[str] = field(default_factory=list)
+    locations: List[str] = field(default_factory=list)
+    companies: List[str] = field(default_factory=list)
+    roles: List[str] = field(default_factory=list)
+    salary_min_lpa: Optional[float] = None
+    topic: str = ""
+
+    @property
+    def location(self) -> Optional[str]:
+        return self.locations[0] if self.locations else None
+
+    @property
+    def company(self) -> Optional[str]:
+        return self.companies[0] if self.companies else None
+
+    @property
+    def role(self) -> Optional[str]:
+        return self.roles[0] if self.roles else None
+
+    def has(self, intent: str) -> bool:
+        return intent in self.intents
+
+    def to_dict(self) -> dict:
+        return {
+            "intents": self.intents,
+            "location": self.location,
+            "company": self.company,
+            "role": self.role,
+            "salary_min_lpa": self.salary_min_lpa,
+            "topic": self.topic,
+        }
+
+
+class IntentRouter:
+    """One compiled pass over a message for intents and entities"""
+
+    def __init__(self, intent_phrases: Dict[str, List[str]] = None, cities: Dict[str, List[str]] = None,
+                 companies: Dict[str, List[str]] = None, roles: Dict[str, List[str]] = None,
+                 filler_words: Iterable[str] = FILLER_WORDS):
+        # phrase -> [(kind, value)]; a phrase can be a trigger and an entity ("trending")
+        self._labels: Dict[str, List[Tuple[str, str]]] = {}
+        for intent, phrases in (intent_phrases or INTENT_PHRASES).items():
+            for phrase in phrases:
+                self._add(phrase, "intent", intent)
+        for phrase in SALARY_CONTEXT_PHRASES:
+            self._add(phrase, "salary_context", "salary")
+        for phrase in SALARY_VERB_PHRASES:
+            self._add(phrase, "salary_verb", "salary")
+        for phrase in SALARY_CUE_PHRASES:
+            self._add(phrase, "salary_cue", "salary")
+        for phrase in SUBJECT_PHRASES:
+            self._add(phrase, "subject", phrase)
+        for kind, gazetteer in (("city", cities or CITIES), ("company", companies or COMPANIES),
+                                ("role", roles or ROLES)):
+            for canonical, spellings in gazetteer.items():
+                for phrase in spellings:
+                    self._add(phrase, kind, canonical)
+        self.filler_words = frozenset(filler_words)
+        self._pattern = re.compile(
+            rf"{_SALARY_PATTERN}|(?P<phrase>{_trie_pattern(self._labels)})(?![a-z0-9+#])|{_WORD_PATTERN}"
+        )
+
+    def _add(self, phrase: str, kind: str, value: str):
+        labels = self._labels.setdefault(phrase.lower(), [])
+        if (kind, value) not in labels:
+            labels.append((kind, value))
+
+    def route(self, message: str) -> Route:
+        route = Route()
+        intents = set()
+        # (text, is_trigger) for each topic word and trigger phrase, in order
+        parts: List[Tuple[str, bool]] = []
+        salary_phrase = salary_unit = salary_cue = False
+        for match in self._pattern.finditer(message.lower()):
+            kind = match.lastgroup
+            if kind == "word":
+                word = match.group("word")
+                salary_unit = salary_unit or word in SALARY_UNIT_WORDS
+                if word not in self.filler_words:
+                    parts.append((word, False))
+            elif kind == "salary":
+                if route.salary_min_lpa is None:
+                    route.salary_min_lpa = float(match.group("salary"))
+            else:
+                phrase = " ".join(match.group("phrase").split())
+                trigger = False
+                for label, value in self._labels[phrase]:
+                    if label == "intent":
+                        intents.add(value)
+                        trigger = True
+                    elif label == "salary_context":
+                        salary_phrase = trigger = True
+                    elif label == "salary_verb":
+                        if salary_cue or route.roles:
+                            intents.add(value)
+                        trigger = True
+                    elif label == "salary_cue":
+                        salary_cue = True
+                    elif label == "city" and value not in route.locations:
+                        route.locations.append(value)
+                    elif label == "company" and value not in route.companies:
+                        route.companies.append(value)
+                    elif label == "role":
+                        if value not in route.roles:
+                            route.roles.append(value)
+                        parts.append((value, False))
+                    elif label == "subject":
+                        parts.append((value, False))
+                if trigger:
+                    parts.append((phrase, True))
+        if salary_phrase and (salary_unit or route.salary_min_lpa is not None):
+            intents.add("salary")
+        route.intents = [intent for intent in INTENTS if intent in intents]
+        # Triggers between topic words are part of the subject ("python package manager")
+        subject = [i for i, (_, is_trigger) in enumerate(parts) if not is_trigger]
+        if subject:
+            route.topic = " ".join(text for text, _ in parts[subject[0]:subject[-1] + 1])
+        return route
+
+
+# Global singleton instance
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> IntentRouter:
+    """Get or create the global IntentRouter singleton"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter()
+    return _router
@@ -0,0 +1,223 @@
+"""
+Skill taxonomy, skill extraction and trending-skill analytics.
+
+get_trending_skills used to fetch one page of 20 Adzuna results per call and
+scan each for 28 keywords with substring checks, so "java" counted every
+JavaScript job and "ai" every posting that said "maintain". Now:
+- SkillMatcher compiles every alias in SKILL_TAXONOMY into one trie regex
+  (see mcp/router.py) that only matches whole terms, and folds aliases into
+  one canonical skill (k8s -> kubernetes, nodejs -> node.js)
+- the job store (mcp/job_store.py) runs it over every posting it ingests and
+  adds the mentions to per-day buckets for the search's (domain, city), once
+  per posting and domain
+- trending_skills() sums this week's and last week's buckets: an indexed
+  SQLite query instead of a live API call
+
+Domains are normalised search queries ("Data Science" -> "data science").
+
+Settings:
+    SKILL_TAXONOMY_PATH   optional JSON file {"skill": ["alias", ...]} merged
+                          into the built-in taxonomy
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from .router import _trie_pattern
+
+logger = logging.getLogger(__name__)
+
+WEEK_DAYS = 7
+
+# Canonical skill -> aliases (the canonical name is always an alias)
+SKILL_TAXONOMY: Dict[str, List[str]] = {
+    # Languages
+    "python": ["python", "python3"],
+    "java": ["java", "core java", "java8", "java 8"],
+    "javascript": ["javascript", "js", "es6", "ecmascript"],
+    "typescript": ["typescript", "ts"],
+    "golang": ["golang", "go lang"],
+    "c++": ["c++", "cpp"],
+    "c#": ["c#", "csharp"],
+    "kotlin": ["kotlin"],
+    "swift": ["swift"],
+    "rust": ["rust"],
+    "scala": ["scala"],
+    "php": ["php"],
+    "ruby": ["ruby", "ruby on rails", "rails"],
+    "sql": ["sql", "t-sql", "pl/sql", "plsql"],
+    # Web and frameworks
+    "react": ["react", "react.js", "reactjs"],
+    "angular": ["angular", "angularjs"],
+    "vue": ["vue", "vue.js", "vuejs"],
+    "node.js": ["node.js", "nodejs", "node"],
+    "django": ["django"],
+    "flask": ["flask"],
+    "fastapi": ["fastapi"],
+    "spring boot": ["spring boot", "springboot", "spring framework"],
+    ".net": [".net", "dotnet", "asp.net"],
+    "rest api": ["rest api", "rest apis", "restful"],
+    "graphql": ["graphql"],
+    "microservices": ["microservices", "microservice"],
+    # Data and ML
+    "machine learning": ["machine learning", "ml"],
+    "deep learning": ["deep learning"],
+    "ai": ["ai", "artificial intelligence", "genai", "generative ai"],
+    "llm": ["llm", "llms", "large language models"],
+    "nlp": ["nlp", "natural language processing"],
+    "data science": ["data science"],
+    "data analysis": ["data analysis", "data analytics"],
+    "tensorflow": ["tensorflow"],
+    "pytorch": ["pytorch"],
+    "pandas": ["pandas"],
+    "spark": ["spark", "pyspark", "apache spark"],
+    "hadoop": ["hadoop"],
+    "kafka": ["kafka", "apache kafka"],
+    "airflow": ["airflow"],
+    "power bi": ["power bi", "powerbi"],
+    "tableau": ["tableau"],
+    "excel": ["ms excel", "advanced excel", "microsoft excel"],
+    # Databases
+    "postgresql": ["postgresql", "postgres"],
+    "mysql": ["mysql"],
+    "mongodb": ["mongodb", "mongo"],
+    "redis": ["redis"],
+    "elasticsearch": ["elasticsearch", "elastic search"],
+    # Cloud and ops
+    "aws": ["aws", "amazon web services"],
+    "azure": ["azure"],
+    "gcp": ["gcp", "google cloud"],
+    "docker": ["docker"],
+    "kubernetes": ["kubernetes", "k8s"],
+    "terraform": ["terraform"],
+    "ci/cd": ["ci/cd", "cicd", "ci cd"],
+    "jenkins": ["jenkins"],
+    "linux": ["linux", "unix"],
+    "git": ["git", "github", "gitlab"],
+    "devops": ["devops"],
+    "cloud": ["cloud"],
+    # Practices and other
+    "agile": ["agile", "scrum"],
+    "testing": ["unit testing", "test automation", "selenium"],
+    "figma": ["figma"],
+    "android": ["android"],
+    "ios": ["ios"],
+}
+
+# Terms match as whole words: no letter, digit, +, # or "." joined on either side
+# (so "js" does not match inside "node.js" and "java" not inside "javascript")
+_BEFORE = r"(?<![a-z0-9+#.])"
+_AFTER = r"(?![a-z0-9+#])"
+
+
+def _load_taxonomy_file(path: str) -> Dict[str, List[str]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            extra = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"[Skills] Could not load SKILL_TAXONOMY_PATH {path}: {e}")
+        return {}
+    return {str(skill): [str(alias) for alias in aliases] for skill, aliases in extra.items()
+            if isinstance(aliases, list)}
+
+
+class SkillMatcher:
+    """Finds taxonomy skills in text with one compiled regex"""
+
+    def __init__(self, taxonomy: Optional[Dict[str, List[str]]] = None):
+        self._aliases: Dict[str, str] = {}
+        self.add_skills(taxonomy if taxonomy is not None else SKILL_TAXONOMY)
+
+    def add_skills(self, taxonomy: Dict[str, Iterable[str]]):
+        """Add skills (or aliases of existing skills) and recompile"""
+        for skill, aliases in taxonomy.items():
+            canonical = skill.lower()
+            for alias in [canonical, *aliases]:
+                self._aliases[" ".join(alias.lower().split())] = canonical
+        self._pattern = re.compile(f"{_BEFORE}(?:{_trie_pattern(self._aliases)}){_AFTER}")
+
+    @property
+    def skills(self) -> Set[str]:
+        return set(self._aliases.values())
+
+    def extract(self, text: str) -> Set[str]:
+        """Canonical skills mentioned in the text"""
+        return {
+            self._aliases[" ".join(match.group(0).split())]
+            for match in self._pattern.finditer((text or "").lower())
+        }
+
+
+def normalize_domain(domain: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9+#.]+", (domain or "").lower()))
+
+
+def day_bucket(timestamp: float) -> int:
+    """Days since the epoch (UTC)"""
+    return int(timestamp // 86400)
+
+
+def trending_skills(store, domain: str, city: Optional[str] = None, top_k: int = 10,
+                    now: Optional[float] = None) -> Dict:
+    """
+    Top skills for a domain over the last 7 days, with the change from the 7 before.
+
+    Args:
+        store: JobStore holding the skill buckets
+        domain: Search domain ("data science")
+        city: Canonical city, or None for all cities
+        top_k: Number of skills to return
+
+    Returns:
+        {"postings", "previous_postings", "skills": [{"skill", "mentions",
+        "share", "previous_mentions", "delta", "delta_pct"}, ...]}
+    """
+    today = day_bucket(now or time.time())
+    this_week = today - WEEK_DAYS + 1
+    last_week = this_week - WEEK_DAYS
+    counts = store.skill_counts(normalize_domain(domain), city, since_bucket=last_week)
+
+    postings = sum(n for bucket, n in counts["postings"].items() if bucket >= this_week)
+    previous_postings = sum(n for bucket, n in counts["postings"].items() if bucket < this_week)
+    current: Dict[str, int] = {}
+    previous: Dict[str, int] = {}
+    for (skill, bucket), mentions in counts["mentions"].items():
+        target = current if bucket >= this_week else previous
+        target[skill] = target.get(skill, 0) + mentions
+
+    skills = []
+    for skill, mentions in sorted(current.items(), key=lambda item: (-item[1], item[0]))[:top_k]:
+        before = previous.get(skill, 0)
+        skills.append({
+            "skill": skill,
+            "mentions": mentions,
+            "share": round(mentions / postings, 3) if postings else 0.0,
+            "previous_mentions": before,
+            "delta": mentions - before,
+            "delta_pct": round((mentions - before) * 100 / before, 1) if before else None,
+        })
+    return {"postings": postings, "previous_postings": previous_postings, "skills": skills}
+
+
+# Global singleton instance
+_matcher: Optional[SkillMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_skill_matcher() -> SkillMatcher:
+    """Get or create the global SkillMatcher (built-in taxonomy plus SKILL_TAXONOMY_PATH)"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                matcher = SkillMatcher()
+                path = os.environ.get("SKILL_TAXONOMY_PATH")
+                if path:
+                    matcher.add_skills(_load_taxonomy_file(path))
+                _matcher = matcher
+    return _matcher
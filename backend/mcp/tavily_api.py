@@ -1,7 +1,10 @@
 import os
+import threading
 from tavily import TavilyClient
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from core.cassette import is_replaying, through_cassette
 
 logger = logging.getLogger(__name__)
 
@@ -23,19 +26,23 @@ class TavilyAPI:
                 logger.error(f"Failed to initialize Tavily client: {e}")
                 self.client = None
 
+    def _search(self, **kwargs) -> Dict[str, Any]:
+        """Tavily search (recorded/replayed when cassettes are on)"""
+        return through_cassette("tavily.search", kwargs, lambda: self.client.search(**kwargs))
+
     def research_company(self, company_name: str) -> Dict[str, Any]:
         """
         Conducts a deep-dive research on a company.
         Returns a structured summary of culture, interview process, and values.
         """
-        if not self.client:
+        if not self.client and not is_replaying():
             return {"status": "error", "error": "Tavily API key missing"}
 
         try:
             # We perform a "search" but with advanced depth
             query = f"working at {company_name} engineering culture interview process values"
             
-            response = self.client.search(
+            response = self._search(
                 query=query,
                 search_depth="advanced",
                 include_answer=True,
@@ -60,13 +67,13 @@ class TavilyAPI:
         """
         Finds live job listings across the web using Tavily.
         """
-        if not self.client:
+        if not self.client and not is_replaying():
             return {"status": "error", "error": "Tavily API key missing"}
 
         try:
             query = f"latest {role} jobs in {location} apply now"
             
-            response = self.client.search(
+            response = self._search(
                 query=query,
                 search_depth="basic",
                 max_results=7
@@ -81,3 +88,18 @@ class TavilyAPI:
             }
         except Exception as e:
             return {"status": "error", "error": str(e)}
+
+
+# Global singleton instance (the Tavily client is stateless and thread-safe to share)
+_tavily_api: Optional[TavilyAPI] = None
+_tavily_lock = threading.Lock()
+
+
+def get_tavily_api() -> TavilyAPI:
+    """Get or create the global TavilyAPI singleton"""
+    global _tavily_api
+    if _tavily_api is None:
+        with _tavily_lock:
+            if _tavily_api is None:
+                _tavily_api = TavilyAPI()
+    return _tavily_api
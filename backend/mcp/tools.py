@@ -4,16 +4,47 @@ Provides structured tools that AI can use to fetch live job market data
 """
 
 import logging
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+import threading
+from typing import Callable, Optional, Dict, Any, List
+from datetime import datetime, timedelta
+from core.cache.swr import get_refresh_pool
 from .job_api import search_jobs, get_salary_insights, get_adzuna_client
-from .news_api import search_news
+from .job_pages import CompanyCounter, SkillCounter, fetch_pages
+from .job_store import city_filter, get_job_store
 from .news_api import search_news
 from .youtube_api import search_videos
-from .tavily_api import TavilyAPI
+from .tavily_api import get_tavily_api
+from .skills import WEEK_DAYS, get_skill_matcher, trending_skills
 
 logger = logging.getLogger(__name__)
 
+# Background index top-ups in flight, by JobStore.query_key
+_topups = set()
+_topups_lock = threading.Lock()
+
+
+def _top_up_once(query_key: str, fetch: Callable[[], Any]) -> bool:
+    """
+    Run fetch() on the refresh pool unless a top-up for the same search is
+    already running in this worker. Returns whether one was started.
+    """
+    with _topups_lock:
+        if query_key in _topups:
+            return False
+        _topups.add(query_key)
+
+    def run():
+        try:
+            fetch()
+        except Exception as e:
+            logger.warning(f"[JobIndex] Background top-up for '{query_key}' failed: {e}")
+        finally:
+            with _topups_lock:
+                _topups.discard(query_key)
+
+    get_refresh_pool().submit(run)
+    return True
+
 
 class MCPJobTools:
     """
@@ -55,7 +86,7 @@ class MCPJobTools:
         🕵️ Autonomous Company Research using Tavily
         """
         try:
-            tavily = TavilyAPI()
+            tavily = get_tavily_api()
             result = tavily.research_company(company_name)
             
             if result.get("status") == "error":
@@ -157,7 +188,112 @@ class MCPJobTools:
                 "error": str(e),
                 "interpretation_hint": "Job search failed. Apologize and suggest trying again."
             }
-    
+
+    @staticmethod
+    def search_indexed_jobs(
+        query: str,
+        location: str = "bangalore",
+        salary_min_lpa: Optional[float] = None,
+        salary_max_lpa: Optional[float] = None,
+        company: Optional[str] = None,
+        posted_within_days: Optional[int] = None,
+        sort: str = "relevance",
+        max_results: int = 5,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        🗂️ Search job postings in the local listing index, topped up from Adzuna
+
+        Searches fetched live within JOB_STORE_FRESH_SECONDS are answered from
+        the index (or from the cached Adzuna page, when the index matches
+        nothing). Older ones are answered from the index while Adzuna is
+        called in the background, unless the index has too few matches; then
+        Adzuna is called inline first.
+
+        Args:
+            query: Job title or skills
+            location: City name; unknown places ("india", "remote") do not filter
+            salary_min_lpa / salary_max_lpa: Salary range in LPA
+            company: Company name (substring match)
+            posted_within_days: Only postings at most this old
+            sort: "relevance", "salary" or "date"
+            max_results: Page size (max 50)
+            offset: Listings to skip, for paging
+
+        Returns:
+            Same shape as search_live_jobs, plus "source" and the applied filters
+        """
+        store = get_job_store()
+        if store is None:
+            return MCPJobTools.search_live_jobs(query, location, salary_min_lpa, max_results)
+
+        salary_min = int(salary_min_lpa * 100000) if salary_min_lpa else None
+        salary_max = int(salary_max_lpa * 100000) if salary_max_lpa else None
+        posted_after = None
+        if posted_within_days:
+            posted_after = (datetime.now() - timedelta(days=posted_within_days)).date().isoformat()
+        filters = {
+            "city": city_filter(location),
+            "company": company,
+            "salary_min": salary_min,
+            "salary_max": salary_max,
+            "posted_after": posted_after,
+        }
+        max_results = max(1, min(int(max_results), 50))
+
+        def local_search():
+            return store.search(query, sort=sort, limit=max_results, offset=offset, **filters)
+
+        def fetch_live():
+            # A full page, so later searches with other filters and sorts can stay local
+            return get_adzuna_client().search_jobs(
+                query=query, location=location, results_per_page=50,
+                salary_min=salary_min, salary_max=salary_max
+            )
+
+        try:
+            source = "local_index"
+            found = local_search()
+            live = None
+            if not store.is_fresh(query, location, salary_min, salary_max):
+                if found["total"] >= offset + max_results:
+                    source = "local_index_refreshing"
+                    _top_up_once(store.query_key(query, location, salary_min, salary_max), fetch_live)
+                else:
+                    live = fetch_live()
+                    source = "local_index+adzuna" if live.get("source") == "adzuna_live" else "local_index+mock"
+                    found = local_search()
+            elif not found["jobs"] and not offset:
+                # Fresh, but the index matches nothing: the fetched page is still cached
+                live = fetch_live()
+                source = "adzuna" if live.get("source") == "adzuna_live" else "mock"
+            if live is not None and not found["jobs"] and not offset:
+                # Adzuna matched more loosely than the index (or served mock data)
+                found = {"total": live.get("total_count", 0), "jobs": live.get("jobs", [])[:max_results]}
+
+            return {
+                "tool": "search_indexed_jobs",
+                "status": "success",
+                "data": {
+                    "query": query,
+                    "location": location,
+                    "total_available": found["total"],
+                    "jobs_returned": len(found["jobs"]),
+                    "jobs": found["jobs"],
+                    "is_live_data": live is not None and live.get("source") == "adzuna_live",
+                    "source": source,
+                    "filters": {k: v for k, v in filters.items() if v},
+                    "sort": sort,
+                    "offset": offset,
+                    "timestamp": datetime.now().isoformat()
+                },
+                "interpretation_hint": f"Found {found['total']} jobs for '{query}' in {location}. Present the top results to the user with company names, salaries, and mention they can apply via the links."
+            }
+
+        except Exception as e:
+            logger.error(f"search_indexed_jobs error: {e}")
+            return MCPJobTools.search_live_jobs(query, location, salary_min_lpa, max_results)
+
     @staticmethod
     def get_salary_data(
         job_title: str,
@@ -205,7 +341,8 @@ class MCPJobTools:
     @staticmethod
     def get_trending_skills(
         domain: str = "software engineering",
-        location: str = "bangalore"
+        location: str = "bangalore",
+        top_k: int = 10
     ) -> Dict[str, Any]:
         """
         📈 Analyze trending skills from job postings
@@ -215,54 +352,59 @@ class MCPJobTools:
         - What they should learn
         - Market trends in tech/their field
         
+        Skill mentions are counted as postings are ingested into the local job
+        store, so this reads day buckets instead of calling Adzuna. Adzuna is
+        only called inline when the domain has no postings yet, and in the
+        background when its postings are older than JOB_STORE_FRESH_SECONDS.
+        
         Args:
             domain: The field to analyze (e.g., "software engineering", "data science")
-            location: City to focus on
+            location: City to focus on; unknown places ("india") cover all cities
+            top_k: Number of skills to return
             
         Returns:
-            List of trending skills extracted from recent job postings
+            Top skills of the last 7 days with their change from the 7 days before
         """
         try:
-            # Get a batch of recent jobs to analyze
-            result = search_jobs(
-                query=domain,
-                location=location,
-                results_per_page=20
-            )
-            
-            # Extract skills from job descriptions (simple keyword analysis)
-            skills_count = {}
-            tech_keywords = [
-                "python", "javascript", "react", "node.js", "aws", "docker", 
-                "kubernetes", "sql", "mongodb", "typescript", "java", "golang",
-                "machine learning", "ai", "data science", "devops", "cloud",
-                "microservices", "rest api", "graphql", "ci/cd", "agile",
-                "tensorflow", "pytorch", "spark", "kafka", "redis", "postgresql"
-            ]
-            
-            for job in result.get("jobs", []):
-                desc = job.get("description", "").lower()
-                title = job.get("title", "").lower()
-                combined = f"{desc} {title}"
-                
-                for skill in tech_keywords:
-                    if skill in combined:
-                        skills_count[skill] = skills_count.get(skill, 0) + 1
-            
-            # Sort by frequency
-            trending = sorted(skills_count.items(), key=lambda x: x[1], reverse=True)[:10]
-            
+            store = get_job_store()
+            if store is None:
+                return MCPJobTools._trending_skills_live(domain, location, top_k)
+
+            city = city_filter(location)
+
+            def fetch_live():
+                return get_adzuna_client().search_jobs(query=domain, location=location, results_per_page=50)
+
+            source = "skill_index"
+            trends = trending_skills(store, domain, city, top_k)
+            if not store.is_fresh(domain, location):
+                if trends["postings"]:
+                    source = "skill_index_refreshing"
+                    _top_up_once(store.query_key(domain, location), fetch_live)
+                else:
+                    # Cold domain: read pages until the top skills settle (all are indexed)
+                    fetch_pages(domain, location, [SkillCounter(top_k)])
+                    source = "skill_index+adzuna"
+                    trends = trending_skills(store, domain, city, top_k)
+            if not trends["postings"]:
+                # Nothing posted this week (or only mock data is available)
+                return MCPJobTools._trending_skills_live(domain, location, top_k)
+
+            trending = trends["skills"]
             return {
                 "tool": "get_trending_skills",
                 "status": "success",
                 "data": {
                     "domain": domain,
                     "location": location,
-                    "jobs_analyzed": len(result.get("jobs", [])),
-                    "trending_skills": [{"skill": s[0], "mentions": s[1]} for s in trending],
-                    "top_5": [s[0] for s in trending[:5]]
+                    "jobs_analyzed": trends["postings"],
+                    "previous_week_jobs": trends["previous_postings"],
+                    "window_days": WEEK_DAYS,
+                    "trending_skills": trending,
+                    "top_5": [s["skill"] for s in trending[:5]],
+                    "source": source
                 },
-                "interpretation_hint": f"Share the top trending skills in {domain} based on {len(result.get('jobs', []))} recent job postings. Recommend learning the top 3-5 skills."
+                "interpretation_hint": f"Share the top trending skills in {domain} based on {trends['postings']} job postings from the last {WEEK_DAYS} days. Mention skills with a large positive delta as rising. Recommend learning the top 3-5 skills."
             }
             
         except Exception as e:
@@ -272,6 +414,30 @@ class MCPJobTools:
                 "status": "error",
                 "error": str(e)
             }
+
+    @staticmethod
+    def _trending_skills_live(domain: str, location: str, top_k: int) -> Dict[str, Any]:
+        """Skill counts from one live page, when the job store has nothing to go on"""
+        result = search_jobs(query=domain, location=location, results_per_page=20)
+        matcher = get_skill_matcher()
+        skills_count: Dict[str, int] = {}
+        for job in result.get("jobs", []):
+            for skill in matcher.extract(f"{job.get('title', '')} {job.get('description', '')}"):
+                skills_count[skill] = skills_count.get(skill, 0) + 1
+        trending = sorted(skills_count.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+        return {
+            "tool": "get_trending_skills",
+            "status": "success",
+            "data": {
+                "domain": domain,
+                "location": location,
+                "jobs_analyzed": len(result.get("jobs", [])),
+                "trending_skills": [{"skill": s[0], "mentions": s[1]} for s in trending],
+                "top_5": [s[0] for s in trending[:5]],
+                "source": result.get("source")
+            },
+            "interpretation_hint": f"Share the top trending skills in {domain} based on {len(result.get('jobs', []))} recent job postings. Recommend learning the top 3-5 skills."
+        }
     
     @staticmethod
     def get_company_job_count(
@@ -291,29 +457,27 @@ class MCPJobTools:
             Number of open positions and sample job listings
         """
         try:
-            result = search_jobs(
-                query=company_name,
-                location=location,
-                results_per_page=10
-            )
-            
-            # Filter to only jobs from this company
-            company_jobs = [
-                job for job in result.get("jobs", [])
-                if company_name.lower() in job.get("company", "").lower()
-            ]
+            # Several pages at once, stopping as soon as the count settles
+            counter = CompanyCounter(company_name)
+            fetched = fetch_pages(company_name, location, [counter])
+            if not fetched.is_live_data:
+                return MCPJobTools._company_job_count_page(company_name, location)
             
+            open_positions = counter.estimate(fetched.total_count)
             return {
                 "tool": "get_company_job_count",
                 "status": "success",
                 "data": {
                     "company": company_name,
                     "location": location,
-                    "open_positions": len(company_jobs),
-                    "sample_jobs": company_jobs[:5],
-                    "total_market_jobs": result.get("total_count", 0)
+                    "open_positions": open_positions,
+                    "is_estimate": not fetched.complete,
+                    "sample_jobs": counter.sample_jobs(),
+                    "total_market_jobs": fetched.total_count,
+                    "top_companies": counter.top(),
+                    "fetch": fetched.to_dict()
                 },
-                "interpretation_hint": f"Found {len(company_jobs)} jobs at {company_name}. Share the job titles and encourage the user to explore."
+                "interpretation_hint": f"Found {'about ' if not fetched.complete else ''}{open_positions} jobs at {company_name}. Share the job titles and encourage the user to explore."
             }
             
         except Exception as e:
@@ -324,6 +488,26 @@ class MCPJobTools:
                 "error": str(e)
             }
 
+    @staticmethod
+    def _company_job_count_page(company_name: str, location: str) -> Dict[str, Any]:
+        """Company count from one page, when Adzuna is unavailable (mock data)"""
+        result = search_jobs(query=company_name, location=location, results_per_page=10)
+        counter = CompanyCounter(company_name)
+        for job in result.get("jobs", []):
+            counter.add(job)
+        return {
+            "tool": "get_company_job_count",
+            "status": "success",
+            "data": {
+                "company": company_name,
+                "location": location,
+                "open_positions": len(counter.matches),
+                "sample_jobs": counter.sample_jobs(),
+                "total_market_jobs": result.get("total_count", 0)
+            },
+            "interpretation_hint": f"Found {len(counter.matches)} jobs at {company_name}. Share the job titles and encourage the user to explore."
+        }
+
 
 # Tool registry for AI to discover available tools
 MCP_TOOLS = {
@@ -340,7 +524,7 @@ MCP_TOOLS = {
     "get_trending_skills": {
         "function": MCPJobTools.get_trending_skills,
         "description": "Analyze in-demand skills from recent job postings",
-        "parameters": ["domain", "location"]
+        "parameters": ["domain", "location", "top_k"]
     },
     "get_company_job_count": {
         "function": MCPJobTools.get_company_job_count,
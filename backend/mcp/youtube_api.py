@@ -4,7 +4,9 @@ Uses DuckDuckGo Video Search (more reliable context) to fetch learning videos.
 """
 import logging
 from typing import List, Dict, Any
-from duckduckgo_search import DDGS
+
+from core.cassette import through_cassette
+from .ddg import get_ddgs, reset_ddgs
 
 logger = logging.getLogger(__name__)
 
@@ -14,19 +16,26 @@ def search_videos(query: str, max_results: int = 5) -> Dict[str, Any]:
     """
     try:
         videos = []
-        with DDGS() as ddgs:
-            ddgs_videos = ddgs.videos(query, max_results=max_results)
-            if ddgs_videos:
-                for v in ddgs_videos:
-                    videos.append({
-                        "title": v.get('title'),
-                        "link": v.get('content'), # DDG returns link in 'content' or 'url'
-                        "description": v.get('description'),
-                        "duration": v.get('duration'),
-                        "views": v.get('views'),
-                        "channel": v.get('publisher'),
-                        "thumbnail": v.get('images', {}).get('large') or v.get('image')
-                    })
+        
+        def fetch():
+            try:
+                return list(get_ddgs().videos(query, max_results=max_results) or [])
+            except Exception:
+                reset_ddgs()
+                raise
+        
+        ddgs_videos = through_cassette("ddg.videos", {"query": query, "max_results": max_results}, fetch)
+        if ddgs_videos:
+            for v in ddgs_videos:
+                videos.append({
+                    "title": v.get('title'),
+                    "link": v.get('content'), # DDG returns link in 'content' or 'url'
+                    "description": v.get('description'),
+                    "duration": v.get('duration'),
+                    "views": v.get('views'),
+                    "channel": v.get('publisher'),
+                    "thumbnail": v.get('images', {}).get('large') or v.get('image')
+                })
 
         return {
             "success": True,
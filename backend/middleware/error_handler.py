@@ -6,6 +6,7 @@ Provides consistent error responses and proper HTTP status codes.
 from flask import jsonify
 from functools import wraps
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,7 @@ class QuotaExceededError(APIError):
     """Raised when API quota is exhausted"""
     def __init__(self, message: str, retry_after: int = 120):
         super().__init__(message, 429, "QUOTA_EXCEEDED")
-        self.retry_after = retry_after
+        self.retry_after = max(1, int(math.ceil(retry_after)))
 
 
 class NotFoundError(APIError):
@@ -60,6 +61,7 @@ def handle_error(error):
             response["details"] = error.details
         elif isinstance(error, QuotaExceededError):
             response["retry_after"] = error.retry_after
+            return jsonify(response), error.status_code, {"Retry-After": str(error.retry_after)}
         
         return jsonify(response), error.status_code
     
@@ -77,6 +79,8 @@ def with_error_handling(f):
     Decorator to add error handling to route functions.
     Catches exceptions and converts them to proper JSON responses.
     """
+    from core.ai.api_key_manager import QuotaExhaustedError
+    
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
@@ -84,6 +88,9 @@ def with_error_handling(f):
         except APIError as e:
             # Let APIError propagate to global handler
             raise
+        except QuotaExhaustedError:
+            # Mapped to 429 + Retry-After by the global handler
+            raise
         except Exception as e:
             # Wrap unexpected errors
             logger.error(f"Error in {f.__name__}: {str(e)}", exc_info=True)
@@ -98,11 +105,20 @@ def with_error_handling(f):
 
 def register_error_handlers(app):
     """Register error handlers with Flask app"""
+    from core.ai.api_key_manager import QuotaExhaustedError
     
     @app.errorhandler(APIError)
     def handle_api_error(error):
         return handle_error(error)
     
+    @app.errorhandler(QuotaExhaustedError)
+    def handle_quota_exhausted(error):
+        # Gateway ran out of capacity before the request deadline: fail fast with 429
+        return handle_error(QuotaExceededError(
+            "AI capacity is temporarily exhausted. Please try again shortly.",
+            retry_after=error.retry_after
+        ))
+    
     @app.errorhandler(500)
     def handle_500(error):
         return handle_error(error)
@@ -1,87 +1,177 @@
-from flask import Blueprint, jsonify, request
-from services.ai_engine import run_career_simulation, chat_with_coach
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from services.ai_engine import chat_with_coach
+from core.ai.api_key_manager import QuotaExhaustedError
+from services.simulation_jobs import JobQueueFullError, get_job_runner
+from services.simulation_service import get_simulation_service, load_simulation_profile
 from core.supabase_client import get_supabase_client
+from middleware.error_handler import NotFoundError, QuotaExceededError
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/simulate', methods=['POST'])
 def simulate_career():
-    data = request.json
+    """
+    Career simulation for a student. Results are stored per student and reused
+    while their profile and chat insights are unchanged.
+    
+    POST /api/simulate
+    Body: {
+        "clerk_id": "user_...",
+        "user_profile": {...},   # optional extra fields (DB profile takes precedence)
+        "refresh": false,        # true: regenerate in the background
+        "async": false           # true (or ?mode=async): run as a background job
+    }
+    
+    In async mode a stored simulation that still matches is returned directly
+    (200). Otherwise a job is queued and the response is 202 with its id:
+        {"job_id": "...", "status": "queued", "poll_url": "...", "stream_url": "..."}
+    """
+    data = request.json or {}
     clerk_id = data.get('clerk_id')
+    refresh = _flag(data.get('refresh', request.args.get('refresh', '')))
+    run_async = _flag(data.get('async', '')) or request.args.get('mode') == 'async'
     
-    # Fetch student profile from database
-    student_profile = None
-    chat_context = None
+    # Student profile from DB plus chat insights, merged over any request data
+    user_profile = load_simulation_profile(clerk_id, data.get('user_profile', {}))
     
-    if clerk_id:
-        try:
-            supabase = get_supabase_client()
-            if supabase:
-                # Fetch student profile
-                student_res = supabase.table('students').select('*').eq('clerk_user_id', clerk_id).limit(1).execute()
-                if student_res.data and len(student_res.data) > 0:
-                    student_data = student_res.data[0]
-                    student_profile = {
-                        "name": student_data.get('name'),
-                        "education_level": student_data.get('education_level'),
-                        "grade_or_year": student_data.get('grade_or_year'),
-                        "stream_or_branch": student_data.get('stream_or_branch'),
-                        "interests": student_data.get('interests'),
-                        "goals": student_data.get('goals'),
-                        "location": student_data.get('location')
-                    }
-                    
-                    # Fetch chat history to enhance simulation with conversation insights
-                    student_id = student_data.get('id')
-                    if student_id:
-                        # Get active conversation
-                        conv_res = supabase.table('conversations').select('*').eq('student_id', student_id).eq('is_active', True).execute()
-                        if conv_res.data and len(conv_res.data) > 0:
-                            conversation_id = conv_res.data[0]['id']
-                            
-                            # Get recent messages (last 20 for context)
-                            messages_res = supabase.table('messages').select('*').eq('conversation_id', conversation_id).order('created_at', desc=False).limit(20).execute()
-                            
-                            if messages_res.data:
-                                # Extract chat insights
-                                user_concerns = []
-                                user_questions = []
-                                
-                                for msg in messages_res.data:
-                                    if msg.get('role') == 'user':
-                                        content = msg.get('content', '')
-                                        if '?' in content:
-                                            user_questions.append(content)
-                                        else:
-                                            user_concerns.append(content)
-                                
-                                chat_context = {
-                                    "total_messages": len(messages_res.data),
-                                    "recent_questions": user_questions[-5:],  # Last 5 questions
-                                    "recent_concerns": user_concerns[-5:],    # Last 5 statements
-                                    "engagement_level": "high" if len(messages_res.data) > 10 else "moderate"
-                                }
-                                
-                                print(f"[SIMULATION] Enhanced with chat context: {len(messages_res.data)} messages")
-                                
-        except Exception as e:
-            print(f"Error fetching student profile/chat: {e}")
+    if not user_profile:
+        return jsonify({"error": "Missing user profile. Please complete onboarding first."}), 400
+    
+    service = get_simulation_service()
+    if not run_async:
+        result, meta = service.get_simulation(clerk_id, user_profile, refresh=refresh)
+        return jsonify({**result, "simulation_meta": meta})
     
-    # Merge with any additional data from request
-    user_profile = data.get('user_profile', {})
-    if student_profile:
-        # Student profile from DB takes precedence
-        user_profile = {**user_profile, **student_profile}
+    if not refresh:
+        found = service.lookup(clerk_id, user_profile)
+        if found is not None:
+            result, meta = found
+            return jsonify({**result, "simulation_meta": meta})
     
-    # Add chat context to profile
-    if chat_context:
-        user_profile['chat_insights'] = chat_context
+    def run(emit):
+        if refresh:
+            result, meta = service.get_simulation(clerk_id, user_profile, refresh=True)
+            return {**result, "simulation_meta": meta}
+        # Roadmap years become job events as the model writes them
+        for event in service.stream_simulation(clerk_id, user_profile):
+            if event["type"] == "result":
+                return {**event["result"], "simulation_meta": event["simulation_meta"]}
+            emit(event)
+    
+    try:
+        job_id = get_job_runner().submit(clerk_id, run)
+    except JobQueueFullError as e:
+        raise QuotaExceededError("Too many simulations in progress. Please try again shortly.", e.retry_after)
+    
+    poll_url = f"/api/simulate/jobs/{job_id}"
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "poll_url": poll_url,
+        "stream_url": f"{poll_url}/events"
+    }), 202, {"Location": poll_url}
+
+@main_bp.route('/simulate/stream', methods=['POST'])
+def stream_simulation():
+    """
+    Career simulation as Server-Sent Events, so the dashboard can render each
+    year of the roadmap as soon as the model has written it.
+    
+    POST /api/simulate/stream
+    Body: same as /api/simulate
+    
+    Events (data: JSON):
+        {"type": "roadmap_year", "index": 0, "year": {...}}
+        {"type": "analysis", "section": "market_outlook", "value": "..."}
+        {"type": "result", "result": {...}, "simulation_meta": {...}}
+        {"type": "error", "error": "..."}
+    """
+    data = request.json or {}
+    clerk_id = data.get('clerk_id')
+    user_profile = load_simulation_profile(clerk_id, data.get('user_profile', {}))
     
     if not user_profile:
         return jsonify({"error": "Missing user profile. Please complete onboarding first."}), 400
-        
-    result = run_career_simulation(user_profile)
-    return jsonify(result)
+    
+    service = get_simulation_service()
+    
+    def generate():
+        try:
+            for event in service.stream_simulation(clerk_id, user_profile):
+                yield f"data: {json.dumps(event)}\n\n"
+        except QuotaExhaustedError:
+            yield f"data: {json.dumps({'type': 'error', 'error': 'AI capacity is exhausted right now. Please try again shortly.'})}\n\n"
+        except Exception as e:
+            print(f"Error streaming simulation: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'error': 'Simulation failed. Please try again.'})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@main_bp.route('/simulate/jobs/<job_id>', methods=['GET'])
+def get_simulation_job(job_id):
+    """
+    Poll a simulation job
+    
+    GET /api/simulate/jobs/<job_id>
+    Returns: {"job_id", "status": queued|running|succeeded|failed, "result", "error"}
+    """
+    job = _own_job(job_id)
+    job.pop("clerk_id", None)
+    return jsonify(job)
+
+@main_bp.route('/simulate/jobs/<job_id>/events', methods=['GET'])
+def stream_simulation_job(job_id):
+    """
+    Server-Sent Events for a simulation job: status changes (and progress
+    events) until it succeeds or fails.
+    
+    GET /api/simulate/jobs/<job_id>/events?clerk_id=user_...
+    
+    Polling the job is the primary mode. A connection is closed after
+    SIMULATION_JOB_STREAM_SECONDS so it does not hold a worker thread;
+    EventSource reconnects on its own and resumes after Last-Event-ID.
+    """
+    runner = get_job_runner()
+    _own_job(job_id)
+    try:
+        after_seq = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        after_seq = 0
+    
+    def generate():
+        yield "retry: 1000\n\n"
+        for seq, event in runner.stream_events(job_id, after_seq):
+            if event.get("type") == "status" and event.get("status") == "succeeded":
+                job = runner.store.get(job_id)
+                event = {**event, "result": job["result"] if job else None}
+            yield f"id: {seq}\ndata: {json.dumps(event)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _own_job(job_id):
+    """
+    The caller's simulation job. Jobs of other students are reported as not
+    found. The caller is X-Clerk-User-Id or, for EventSource, which cannot
+    send headers, ?clerk_id=.
+    """
+    job = get_job_runner().store.get(job_id)
+    caller = request.headers.get('X-Clerk-User-Id') or request.args.get('clerk_id')
+    if job is None or (job["clerk_id"] and job["clerk_id"] != caller):
+        raise NotFoundError("Simulation job not found")
+    return job
+
+def _flag(value) -> bool:
+    return str(value).lower() in ('true', '1', 'yes')
 
 @main_bp.route('/chat', methods=['POST'])
 def chat():
@@ -185,3 +275,43 @@ def save_skill_assessment():
             'success': True,  # Return success even on error (non-critical)
             'message': 'Assessment logged'
         })
+
+
+@main_bp.route('/metrics', methods=['GET'])
+def get_runtime_metrics():
+    """
+    In-process metrics for this worker (LLM calls, latencies, pools)
+    
+    GET /api/metrics
+    """
+    from core.metrics import get_metrics
+    from core.ai.client_pool import get_client_pool
+    from core.ai.api_key_manager import get_key_manager
+    from core.ai.rate_limiter import get_rate_limiter
+    from core.ai.admission import get_admission_controller
+    from core.ai.health import get_health_tracker
+    from core.ai.hedging import get_hedge_policy
+    from core.cassette import get_cassette
+    from core.cache.memory import cache_stats
+    from core.cache.disk import get_disk_cache
+    
+    payload = {
+        **get_metrics().snapshot(),
+        "client_pool": get_client_pool().get_status(),
+        "admission": get_admission_controller().get_status(),
+        "health": get_health_tracker().get_status(),
+        "hedging": get_hedge_policy().get_status(),
+        "caches": cache_stats(),
+        "simulation_jobs": get_job_runner().get_status()
+    }
+    cassette = get_cassette()
+    payload["cassette"] = cassette.get_status() if cassette else None
+    disk_cache = get_disk_cache()
+    payload["disk_cache"] = disk_cache.get_status() if disk_cache else None
+    try:
+        payload["api_keys"] = get_key_manager().get_status()
+        limiter = get_rate_limiter()
+        payload["rate_limiter"] = limiter.get_status() if limiter else None
+    except ValueError:
+        payload["api_keys"] = None
+    return jsonify(payload)
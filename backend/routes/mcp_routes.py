@@ -5,7 +5,9 @@ Flask blueprint exposing MCP tools as REST endpoints
 
 from flask import Blueprint, jsonify, request
 from mcp.tools import MCPJobTools, execute_tool, get_tool_descriptions
-from mcp.job_api import get_adzuna_client
+from mcp.job_api import get_adzuna_client, _cache as adzuna_cache
+from mcp.router import get_router
+from mcp.job_store import SORTS, get_job_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,14 +18,19 @@ mcp_bp = Blueprint('mcp', __name__)
 @mcp_bp.route('/jobs', methods=['POST'])
 def search_jobs():
     """
-    Search for live job postings
+    Search job postings (local listing index first, Adzuna for freshness)
     
     POST /api/mcp/jobs
     Body: {
         "query": "software engineer",
         "location": "bangalore",
         "salary_min_lpa": 10,
-        "max_results": 5
+        "salary_max_lpa": 30,            (optional)
+        "company": "flipkart",           (optional)
+        "posted_within_days": 14,        (optional)
+        "sort": "relevance",             (relevance | salary | date)
+        "max_results": 5,
+        "offset": 0
     }
     """
     data = request.json or {}
@@ -32,20 +39,32 @@ def search_jobs():
     if not query:
         return jsonify({"error": "Missing 'query' parameter"}), 400
     
-    location = data.get('location', 'bangalore')
-    salary_min_lpa = data.get('salary_min_lpa')
-    max_results = data.get('max_results', 5)
+    sort = data.get('sort', 'relevance')
+    if sort not in SORTS:
+        return jsonify({"error": f"'sort' must be one of: {', '.join(SORTS)}"}), 400
     
-    result = MCPJobTools.search_live_jobs(
-        query=query,
-        location=location,
-        salary_min_lpa=salary_min_lpa,
-        max_results=max_results
-    )
+    try:
+        result = MCPJobTools.search_indexed_jobs(
+            query=query,
+            location=data.get('location', 'bangalore'),
+            salary_min_lpa=_optional_number(data.get('salary_min_lpa')),
+            salary_max_lpa=_optional_number(data.get('salary_max_lpa')),
+            company=data.get('company') or None,
+            posted_within_days=_optional_number(data.get('posted_within_days')),
+            sort=sort,
+            max_results=int(data.get('max_results', 5)),
+            offset=max(0, int(data.get('offset', 0)))
+        )
+    except (TypeError, ValueError):
+        return jsonify({"error": "Numeric parameters must be numbers"}), 400
     
     return jsonify(result)
 
 
+def _optional_number(value):
+    return float(value) if value not in (None, '') else None
+
+
 @mcp_bp.route('/salary', methods=['GET'])
 def get_salary():
     """
@@ -70,16 +89,18 @@ def get_salary():
 @mcp_bp.route('/skills', methods=['GET'])
 def get_trending_skills():
     """
-    Get trending skills in a domain
+    Get trending skills in a domain, with week-over-week change
     
-    GET /api/mcp/skills?domain=software+engineering&location=bangalore
+    GET /api/mcp/skills?domain=software+engineering&location=bangalore&top_k=10
     """
     domain = request.args.get('domain', 'software engineering')
     location = request.args.get('location', 'bangalore')
+    top_k = min(max(request.args.get('top_k', 10, type=int), 1), 50)
     
     result = MCPJobTools.get_trending_skills(
         domain=domain,
-        location=location
+        location=location,
+        top_k=top_k
     )
     
     return jsonify(result)
@@ -119,68 +140,33 @@ def natural_language_query():
     This endpoint parses the natural language and calls appropriate tools.
     """
     data = request.json or {}
-    nl_query = data.get('query', '').lower()
+    nl_query = data.get('query', '')
     
     if not nl_query:
         return jsonify({"error": "Missing 'query' parameter"}), 400
     
-    # Simple NL parsing (in production, use AI for this)
-    result = None
-    
-    # Detect salary mentions
-    salary_min_lpa = None
-    import re
-    salary_match = re.search(r'(\d+)\s*(?:lpa|lakhs?|l\b)', nl_query)
-    if salary_match:
-        salary_min_lpa = float(salary_match.group(1))
+    # Intents and entities in one pass (mcp/router.py)
+    route = get_router().route(nl_query)
+    detected_location = route.location or 'bangalore'  # default
     
-    # Detect location
-    locations = ['bangalore', 'mumbai', 'delhi', 'hyderabad', 'chennai', 'pune', 'kolkata', 'noida', 'gurgaon', 'india']
-    detected_location = 'bangalore'  # default
-    for loc in locations:
-        if loc in nl_query:
-            detected_location = loc
-            break
-    
-    # Determine intent and extract job title
-    if 'salary' in nl_query and ('for' in nl_query or 'of' in nl_query):
+    if route.has('salary') and not route.has('jobs'):
         # Salary query
-        job_title = nl_query.split('salary')[0].replace('what is the', '').replace('what', '').strip()
-        if not job_title:
-            job_title = "software engineer"
-        result = MCPJobTools.get_salary_data(job_title, detected_location)
+        result = MCPJobTools.get_salary_data(route.topic or "software engineer", detected_location)
         
-    elif 'trending' in nl_query or 'skills' in nl_query or 'learn' in nl_query:
+    elif route.has('skills'):
         # Skills query
-        result = MCPJobTools.get_trending_skills(domain="software engineering", location=detected_location)
+        result = MCPJobTools.get_trending_skills(domain=route.topic or "software engineering", location=detected_location)
+        
+    elif route.company:
+        # Company query
+        result = MCPJobTools.get_company_job_count(route.company.title(), detected_location)
         
-    elif 'company' in nl_query or 'at ' in nl_query:
-        # Company query - try to extract company name
-        companies = ['google', 'microsoft', 'amazon', 'flipkart', 'swiggy', 'zomato', 'infosys', 'tcs', 'wipro']
-        company = None
-        for c in companies:
-            if c in nl_query:
-                company = c.title()
-                break
-        if company:
-            result = MCPJobTools.get_company_job_count(company, detected_location)
-        else:
-            # Fall back to job search
-            result = MCPJobTools.search_live_jobs(nl_query, detected_location, salary_min_lpa)
     else:
         # Default: Job search
-        # Extract job title by removing common words
-        job_title = nl_query
-        for word in ['find', 'me', 'jobs', 'job', 'openings', 'for', 'in', 'with', 'lpa', 'salary', 'lakhs']:
-            job_title = job_title.replace(word, '')
-        job_title = ' '.join(job_title.split())  # Clean whitespace
-        if not job_title:
-            job_title = "software developer"
-        
         result = MCPJobTools.search_live_jobs(
-            query=job_title,
+            query=route.topic or "software developer",
             location=detected_location,
-            salary_min_lpa=salary_min_lpa,
+            salary_min_lpa=route.salary_min_lpa,
             max_results=5
         )
     
@@ -188,7 +174,8 @@ def natural_language_query():
         "original_query": data.get('query'),
         "parsed": {
             "detected_location": detected_location,
-            "detected_salary": salary_min_lpa
+            "detected_salary": route.salary_min_lpa,
+            **route.to_dict()
         },
         "result": result
     })
@@ -238,11 +225,14 @@ def health_check():
     """Check if MCP and Adzuna API are configured correctly"""
     client = get_adzuna_client()
     has_credentials = bool(client.app_id and client.api_key)
+    store = get_job_store()
     
     return jsonify({
         "mcp_status": "operational",
         "adzuna_configured": has_credentials,
-        "cache_size": len(client._cache) if hasattr(client, '_cache') else 0
+        "cache_size": len(adzuna_cache),
+        "cache": adzuna_cache.get_status(),
+        "job_store": store.get_status() if store else None
     })
 
 
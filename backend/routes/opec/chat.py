@@ -1,6 +1,9 @@
-from flask import Blueprint, jsonify, request
+import itertools
+import json
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from core.supabase_client import get_supabase_client
 from core.ai.agents import get_orchestrator
+from core.ai.api_key_manager import QuotaExhaustedError
 from datetime import datetime
 
 chat_bp = Blueprint('opec_chat', __name__)
@@ -96,6 +99,37 @@ def create_conversation():
         print(f"Error creating conversation: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _save_ai_turn(supabase, conv_id, student_id, user_msg_id, message, ai_response_text, detected_signals, is_new_conversation):
+    """Persist detected signals and the AI reply, and title new conversations. Returns the new title."""
+    # 5. Update user message with detected signals
+    if detected_signals and user_msg_id:
+        supabase.table('messages').update({"signals": detected_signals}).eq('id', user_msg_id).execute()
+    
+    # 6. Save AI Message
+    ai_msg = {
+        "conversation_id": conv_id,
+        "student_id": student_id,
+        "role": "assistant",
+        "content": ai_response_text
+    }
+    supabase.table('messages').insert(ai_msg).execute()
+
+    # 7. Smart Title Generation (Auto-Update) - NON-BLOCKING
+    # This runs AFTER the response is ready, so it won't block the chat
+    generated_title = None
+    try:
+        # Only try if conversation is brand new
+        if is_new_conversation:
+            # Keep it super simple - just use first message content
+            simple_title = message[:30].strip()
+            if simple_title:
+                supabase.table('conversations').update({"title": simple_title}).eq('id', conv_id).execute()
+                generated_title = simple_title
+    except Exception as e:
+        # Title generation is non-critical - log and continue
+        print(f"Title generation failed (non-blocking): {e}")
+    return generated_title
+
 @chat_bp.route('/message', methods=['POST'])
 def send_message():
     try:
@@ -177,6 +211,40 @@ def send_message():
                 pass
         
         orchestrator = get_orchestrator(fast_mode=use_fast_mode)
+        
+        if data.get('stream', False):
+            events = orchestrator.stream_message(
+                message=message,
+                context_messages=context_messages,
+                student_context=student_context,
+                mcp_data=mcp_data
+            )
+            # Wait for the first event before committing to a 200: a request that
+            # cannot get AI capacity in time still gets a plain 429 + Retry-After
+            first_event = next(events)
+            
+            # Stream thinking panels and the answer as Server-Sent Events
+            def generate_events():
+                for event in itertools.chain([first_event], events):
+                    if event["type"] == "done":
+                        generated_title = _save_ai_turn(
+                            supabase, conv_id, student_id, user_msg_id, message,
+                            event["response"], event["signals"], is_new_conversation
+                        )
+                        event = {
+                            **event,
+                            "conversation_id": conv_id,
+                            "title": generated_title,
+                            "agents_used": ["observation", "pattern", "evaluation", "clarity"]
+                        }
+                    yield f"data: {json.dumps(event)}\n\n"
+            
+            return Response(
+                stream_with_context(generate_events()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
         ai_response_text, detected_signals, thinking = orchestrator.process_message(
             message=message,
             context_messages=context_messages,
@@ -184,33 +252,10 @@ def send_message():
             mcp_data=mcp_data
         )
         
-        # 5. Update user message with detected signals
-        if detected_signals and user_msg_id:
-            supabase.table('messages').update({"signals": detected_signals}).eq('id', user_msg_id).execute()
-        
-        # 6. Save AI Message
-        ai_msg = {
-            "conversation_id": conv_id,
-            "student_id": student_id,
-            "role": "assistant",
-            "content": ai_response_text
-        }
-        supabase.table('messages').insert(ai_msg).execute()
-
-        # 7. Smart Title Generation (Auto-Update) - NON-BLOCKING
-        # This runs AFTER the response is ready, so it won't block the chat
-        generated_title = None
-        try:
-            # Only try if conversation is brand new
-            if is_new_conversation:
-                # Keep it super simple - just use first message content
-                simple_title = message[:30].strip()
-                if simple_title:
-                    supabase.table('conversations').update({"title": simple_title}).eq('id', conv_id).execute()
-                    generated_title = simple_title
-        except Exception as e:
-            # Title generation is non-critical - log and continue
-            print(f"Title generation failed (non-blocking): {e}")
+        generated_title = _save_ai_turn(
+            supabase, conv_id, student_id, user_msg_id, message,
+            ai_response_text, detected_signals, is_new_conversation
+        )
 
         return jsonify({
             "response": ai_response_text,
@@ -221,6 +266,9 @@ def send_message():
             "agents_used": ["observation", "pattern", "evaluation", "clarity"]
         }), 200
 
+    except QuotaExhaustedError:
+        # Mapped to 429 + Retry-After by the global error handler
+        raise
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         import traceback
@@ -403,14 +451,9 @@ def generate_session_report():
         2. [Actionable step 2]
         """
         
-        # Call Gemini (reusing existing service logic or direct call)
-        # For prototype speed, we'll try to use the generate_chat_response generic or import model directly if needed.
-        # Assuming generate_chat_response can handle this or we make a new helper.
-        # For now, let's use a simplified logical report if Gemini isn't directly exposed for this content type, 
-        # but better to use the AI.
-        from core.ai.gemini_service import model # Assuming model is accessible or generic generation function
-        response = model.generate_content(prompt)
-        report_content = response.text
+        # Call Gemini through the shared LLM gateway
+        from core.ai.llm_gateway import get_gateway
+        report_content = get_gateway().generate(prompt, profile="report").text
         
         return jsonify({"report": report_content}), 200
         
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from core.supabase_client import get_supabase_client
+from services.simulation_service import get_simulation_service
 
 student_bp = Blueprint('opec_student', __name__)
 
@@ -41,6 +42,9 @@ def update_profile():
         else:
             # Insert
             supabase.table('students').insert(student_data).execute()
+        
+        # The stored career simulation was built from the old profile
+        get_simulation_service().invalidate(clerk_id)
             
         return jsonify({"message": "Profile updated successfully"}), 200
         
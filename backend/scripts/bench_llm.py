@@ -0,0 +1,100 @@
+"""
+Load test for the LLM gateway against the offline simulator.
+
+Runs chat (OPEC), simulation and report calls through the real code paths
+with LLM_PROVIDER=simulator, then prints throughput, latency percentiles and
+the gateway metrics (key rotation, retries, hedges). No network or quota used.
+
+Usage:
+    python scripts/bench_llm.py --requests 200 --concurrency 16 --kind chat
+    LLM_SIM_429_RATE=0.05 LLM_SIM_LATENCY_MS=300 python scripts/bench_llm.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ["LLM_PROVIDER"] = "simulator"
+os.environ.setdefault("KEY_STATE_BACKEND", "memory")
+
+from core.metrics import get_metrics
+
+
+def _chat_call():
+    from core.ai.agents import get_orchestrator
+    response, _, _ = get_orchestrator(fast_mode=True).process_message(
+        "I'm torn between a masters and a job offer, my parents want the masters",
+        student_context={"name": "Asha", "education_level": "B.Tech"}
+    )
+    return response
+
+
+def _simulation_call():
+    from services.ai_engine import run_career_simulation
+    return run_career_simulation({"name": "Asha", "interests": "ML", "goals": "Data scientist"})
+
+
+def _report_call():
+    from core.ai.interview_report import generate_interview_report
+    return generate_interview_report("Acme", "Backend Engineer", 900)
+
+
+CALLS = {"chat": _chat_call, "simulation": _simulation_call, "report": _report_call}
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+def run_benchmark(kind: str, requests: int, concurrency: int) -> dict:
+    """Fire `requests` calls with `concurrency` threads and summarise the run"""
+    call = CALLS[kind]
+    latencies, errors = [], []
+
+    def one(_):
+        started = time.monotonic()
+        try:
+            call()
+            latencies.append((time.monotonic() - started) * 1000)
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.monotonic() - started
+
+    return {
+        "kind": kind,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "errors": {name: errors.count(name) for name in set(errors)},
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50), 1),
+            "p95": round(_percentile(latencies, 0.95), 1),
+            "p99": round(_percentile(latencies, 0.99), 1),
+        }
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the LLM gateway with the offline simulator")
+    parser.add_argument("--kind", choices=sorted(CALLS), default="chat")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--metrics", action="store_true", help="Also print the gateway metrics snapshot")
+    args = parser.parse_args()
+
+    summary = run_benchmark(args.kind, args.requests, args.concurrency)
+    print(json.dumps(summary, indent=2))
+    if args.metrics:
+        print(json.dumps(get_metrics().snapshot(), indent=2))
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for the MCP intent router.
+
+Routes messages of increasing length and prints the cost per call and per
+character, next to the keyword-loop parsing it replaced. The compiled router
+should cost about the same per character at every length. The loop version
+rescans the message for every keyword.
+
+Usage:
+    python scripts/bench_router.py
+    python scripts/bench_router.py --iterations 5000 --lengths 8 64 512
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from mcp.router import CITIES, COMPANIES, INTENT_PHRASES, IntentRouter
+
+SENTENCE = "what do data analysts earn in pune and are there jobs at flipkart or google for freshers"
+
+
+def _legacy_route(message: str) -> dict:
+    """The old approach: a substring scan per keyword, then str.replace per filler word"""
+    text = message.lower()
+    intents = [intent for intent, phrases in INTENT_PHRASES.items() if any(p in text for p in phrases)]
+    location = next((alias for aliases in CITIES.values() for alias in aliases if alias in text), None)
+    company = next((alias for aliases in COMPANIES.values() for alias in aliases if alias in text), None)
+    topic = text
+    for word in ['find', 'me', 'jobs', 'job', 'openings', 'for', 'in', 'with', 'lpa', 'salary', 'lakhs']:
+        topic = topic.replace(word, '')
+    return {"intents": intents, "location": location, "company": company, "topic": " ".join(topic.split())}
+
+
+def _time_per_call(fn, message: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(message)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_benchmark(lengths, iterations: int) -> dict:
+    build_started = time.perf_counter()
+    router = IntentRouter()
+    build_ms = (time.perf_counter() - build_started) * 1000
+    rows = []
+    for words in lengths:
+        repeats = max(1, words // len(SENTENCE.split()))
+        message = " ".join([SENTENCE] * repeats)
+        router_us = _time_per_call(router.route, message, iterations)
+        legacy_us = _time_per_call(_legacy_route, message, iterations)
+        rows.append({
+            "words": len(message.split()),
+            "chars": len(message),
+            "router_us": round(router_us, 2),
+            "router_ns_per_char": round(router_us * 1000 / len(message), 1),
+            "legacy_us": round(legacy_us, 2),
+        })
+    return {
+        "compile_ms": round(build_ms, 2),
+        "iterations": iterations,
+        "sample": router.route(SENTENCE).to_dict(),
+        "results": rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled MCP intent router")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[16, 64, 256, 1024],
+                        help="Approximate message lengths in words")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.lengths, args.iterations), indent=2))
@@ -52,83 +52,68 @@ The output MUST be a valid JSON object with the following structure:
     "salary_projection": "Expected salary progression range in INR (e.g., ₹6L - ₹18L)",
     "risk_assessment": "Risk level and potential pitfalls",
     "backup_paths": ["Backup Career 1", "Backup Career 2"]
-  },
-  "flowchart": "graph TD\\nA[Start: Current State]-->B[Year 1: Junior Role]\\nB-->C[Year 2: Mid Role]\\nC-->D[Year 3: Senior Role]\\nD-->E[Year 4: Lead Role]\\nE-->F[Year 5: Manager]\\nF-->G[Year 6: Director]"
+  }
 }
 
-CRITICAL FLOWCHART RULES:
-1. Use 'graph TD' for top-down flow
-2. Use --> for arrows with NO SPACES (A-->B not A --> B)
-3. Use \\n for line breaks (will be converted to actual newlines)
-4. Keep node labels SHORT (max 25 chars)
-5. Use brackets [] for rectangular nodes
-6. EXAMPLE: "graph TD\\nA[Start]-->B[Year1]\\nB-->C[Year2]"
-7. NO SPACES around arrows or Mermaid will fail!
-DO NOT include markdown formatting (like ```json or ```mermaid). Just return the raw JSON string.
+DO NOT include markdown formatting (like ```json). Just return the raw JSON string.
 """
 
 
 
-from google import genai
-from google.genai import types
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, RetryError
-
-# Helper function for retrying on errors (handle 429 broadly)
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=2, min=5, max=60),
-    reraise=True
-)
-def call_gemini_with_retry(client, model, prompt):
-    return client.models.generate_content(
-        model=model,
-        contents=prompt
-    )
+from core.ai.api_key_manager import get_key_manager, QuotaExhaustedError
+from core.ai.llm_gateway import get_gateway
+from core.ai.json_stream import IncrementalJSONParser
+from services.flowchart import attach_flowchart
 
 def run_career_simulation(user_profile):
-    api_key = os.environ.get('GEMINI_API_KEY')
-    if not api_key:
+    if not _has_api_keys():
         logger.warning("GEMINI_API_KEY not found. Using mock response.")
         return _get_mock_response()
 
     try:
-        client = genai.Client(api_key=api_key)
-        
-        # Hardcoded specific model for stability instead of dynamic listing which can be flaky
-        valid_model = 'gemini-3-flash-preview'
-            
-        logger.info(f"Using Gemini Model: {valid_model}")
-
-        # Enhanced Prompt with Student Personalization
-        student_name = user_profile.get('name', 'Student')
-        education_context = ""
-        if user_profile.get('education_level'):
-            education_context += f"\nEducation Level: {user_profile.get('education_level')}"
-        if user_profile.get('grade_or_year'):
-            education_context += f"\nCurrent Year/Grade: {user_profile.get('grade_or_year')}"
-        if user_profile.get('stream_or_branch'):
-            education_context += f"\nStream/Branch: {user_profile.get('stream_or_branch')}"
-        if user_profile.get('interests'):
-            education_context += f"\nInterests: {user_profile.get('interests')}"
-        if user_profile.get('goals'):
-            education_context += f"\nCareer Goals: {user_profile.get('goals')}"
+        return generate_career_simulation(user_profile)
+    except QuotaExhaustedError:
+        # No capacity before the deadline: the route answers 429 + Retry-After
+        raise
+    except Exception as e:
+        import sys
+        print(f"CRITICAL ERROR: Gemini SDK failed: {e}", file=sys.stderr)
+        logger.error(f"Error during AI simulation (SDK): {e}")
+        return _get_mock_response(str(e))
+
+
+def build_simulation_prompt(user_profile):
+    """Full simulation prompt for a user profile (optionally with chat_insights)"""
+    # Enhanced Prompt with Student Personalization
+    student_name = user_profile.get('name', 'Student')
+    education_context = ""
+    if user_profile.get('education_level'):
+        education_context += f"\nEducation Level: {user_profile.get('education_level')}"
+    if user_profile.get('grade_or_year'):
+        education_context += f"\nCurrent Year/Grade: {user_profile.get('grade_or_year')}"
+    if user_profile.get('stream_or_branch'):
+        education_context += f"\nStream/Branch: {user_profile.get('stream_or_branch')}"
+    if user_profile.get('interests'):
+        education_context += f"\nInterests: {user_profile.get('interests')}"
+    if user_profile.get('goals'):
+        education_context += f"\nCareer Goals: {user_profile.get('goals')}"
+    
+    # Add chat insights if available
+    chat_insights_text = ""
+    if user_profile.get('chat_insights'):
+        insights = user_profile['chat_insights']
+        chat_insights_text = f"\n\nCHAT CONVERSATION INSIGHTS (Use this to understand {student_name}'s actual concerns):"
+        chat_insights_text += f"\n- Total conversations: {insights.get('total_messages', 0)} messages"
+        chat_insights_text += f"\n- Engagement level: {insights.get('engagement_level', 'unknown')}"
         
-        # Add chat insights if available
-        chat_insights_text = ""
-        if user_profile.get('chat_insights'):
-            insights = user_profile['chat_insights']
-            chat_insights_text = f"\n\nCHAT CONVERSATION INSIGHTS (Use this to understand {student_name}'s actual concerns):"
-            chat_insights_text += f"\n- Total conversations: {insights.get('total_messages', 0)} messages"
-            chat_insights_text += f"\n- Engagement level: {insights.get('engagement_level', 'unknown')}"
-            
-            if insights.get('recent_questions'):
-                chat_insights_text += f"\n- Recent questions they asked: {', '.join(insights['recent_questions'][:3])}"
-            if insights.get('recent_concerns'):
-                chat_insights_text += f"\n- Recent topics discussed: {', '.join(insights['recent_concerns'][:3])}"
-            
-            chat_insights_text += "\n\nIMPORTANT: Use these chat insights to address their ACTUAL concerns in the roadmap, not generic advice."
+        if insights.get('recent_questions'):
+            chat_insights_text += f"\n- Recent questions they asked: {', '.join(insights['recent_questions'][:3])}"
+        if insights.get('recent_concerns'):
+            chat_insights_text += f"\n- Recent topics discussed: {', '.join(insights['recent_concerns'][:3])}"
         
-        detailed_prompt = f"""
+        chat_insights_text += "\n\nIMPORTANT: Use these chat insights to address their ACTUAL concerns in the roadmap, not generic advice."
+    
+    return f"""
         {SYSTEM_PROMPT}
 
         CRITICAL INSTRUCTION: This roadmap is for {student_name}. Provide extremely detailed, actionable advice.
@@ -144,27 +129,96 @@ def run_career_simulation(user_profile):
         {json.dumps(user_profile)}
         """
 
-        try:
-            response = call_gemini_with_retry(client, valid_model, detailed_prompt)
-        except Exception as e:
-            logger.error(f"Gemini call failed: {e}")
-            raise e
-        response_text = response.text
-        
-        # Clean up if markdown is present
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
-        
-        return json.loads(response_text)
-        
+
+def generate_career_simulation(user_profile, deadline_s=None):
+    """
+    Generate a simulation with Gemini. Unlike run_career_simulation this does
+    not fall back to the mock response, so callers can tell a real result
+    from a failure (and avoid storing the mock). deadline_s overrides the
+    "simulation" call profile's deadline.
+
+    Raises:
+        QuotaExhaustedError: no LLM capacity before the deadline
+        Exception: the call failed or the response was not valid JSON
+    """
+    try:
+        result = get_gateway().generate(
+            build_simulation_prompt(user_profile), profile="simulation", deadline_s=deadline_s
+        )
     except Exception as e:
-        import sys
-        print(f"CRITICAL ERROR: Gemini SDK failed: {e}", file=sys.stderr)
-        logger.error(f"Error during AI simulation (SDK): {e}")
-        return _get_mock_response(str(e))
+        logger.error(f"Gemini call failed: {e}")
+        raise e
+    logger.info(f"Simulation generated by {result.model} in {result.latency_ms:.0f}ms")
+    response_text = result.text
+    
+    # Clean up if markdown is present
+    response_text = response_text.replace("```json", "").replace("```", "").strip()
+    
+    # The flowchart is derived from the roadmap rather than written by the model
+    return attach_flowchart(json.loads(response_text))
+
+
+def stream_career_simulation(user_profile, deadline_s=None):
+    """
+    Generate a simulation with Gemini, yielding its parts as soon as the
+    streamed JSON completes them:
+        {"type": "roadmap_year", "index": i, "year": {...}}
+        {"type": "analysis", "section": "market_outlook", "value": ...}
+        {"type": "flowchart", "flowchart": "graph TD..."}  (built locally)
+    and finally {"type": "result", "result": {...}} with the whole simulation.
+    deadline_s overrides the "simulation" call profile's deadline.
+
+    Raises:
+        QuotaExhaustedError: no LLM capacity before the deadline
+        Exception: the call failed or the response was not a simulation
+    """
+    parser = IncrementalJSONParser(root="{")
+    chunks = get_gateway().stream(build_simulation_prompt(user_profile), profile="simulation", deadline_s=deadline_s)
+    for chunk in chunks:
+        for path, value in parser.feed(chunk):
+            event = simulation_event(path, value)
+            if event is not None:
+                yield event
+    result = parser.close()
+    if not isinstance(result, dict) or not isinstance(result.get("roadmap"), list):
+        raise ValueError("Simulation response has no roadmap")
+    if parser.repaired:
+        logger.warning("Simulation response was truncated; using the repaired JSON")
+    attach_flowchart(result)
+    yield {"type": "flowchart", "flowchart": result["flowchart"]}
+    yield {"type": "result", "result": result}
+
+
+def simulation_event(path, value):
+    """Client event for a completed value of the simulation JSON, or None"""
+    if len(path) == 2 and path[0] == "roadmap" and isinstance(value, dict):
+        return {"type": "roadmap_year", "index": path[1], "year": value}
+    if len(path) == 2 and path[0] == "analysis":
+        return {"type": "analysis", "section": path[1], "value": value}
+    return None
+
+
+def simulation_events(result):
+    """The events stream_career_simulation would yield for an existing result"""
+    for i, year in enumerate(result.get("roadmap") or []):
+        yield simulation_event(("roadmap", i), year)
+    for section, value in (result.get("analysis") or {}).items():
+        yield simulation_event(("analysis", section), value)
+    if "flowchart" in result:
+        yield {"type": "flowchart", "flowchart": result["flowchart"]}
+
+
+def _has_api_keys():
+    """True if at least one Gemini key is configured for the key manager"""
+    try:
+        get_key_manager()
+        return True
+    except ValueError:
+        return False
 
 
 def _get_mock_response(error_msg="API Check Failed"):
-    return {
+    return attach_flowchart({
         "roadmap": [
             {
                 "year": 1,
@@ -191,20 +245,14 @@ def _get_mock_response(error_msg="API Check Failed"):
             "risk_assessment": "Moderate risk due to rapid tech changes.",
             "backup_paths": ["Technical Product Manager", "DevOps Engineer"]
         },
-        "flowchart": "graph TD\nA[Current State]-->B[Year 1: Junior Dev]\nB-->C[Year 2: Mid-Level Dev]"
-    }
+    })
 
 def chat_with_coach(question, user_context=None):
     """AI Career Coach chat function"""
-    api_key = os.environ.get('GEMINI_API_KEY')
-    if not api_key:
+    if not _has_api_keys():
         return "I'm sorry, I cannot answer right now. (Missing API Key)"
 
     try:
-        client = genai.Client(api_key=api_key)
-        
-        valid_model = 'gemini-3-flash-preview'
-
         context_str = ""
         if user_context:
             context_str = f"\n\nUser's Career Roadmap Context:\n{json.dumps(user_context, indent=2)}"
@@ -228,79 +276,28 @@ If real-time market data is provided, cite it explicitly (e.g., "I see 12 active
 
 
         try:
-            response = call_gemini_with_retry(client, valid_model, prompt)
+            result = get_gateway().generate(prompt, profile="coach")
+        except QuotaExhaustedError:
+            raise
         except Exception as e:
             logger.error(f"Chat Gemini call failed: {e}")
             return "I'm having a bit of trouble connecting right now. Please try again!"
-        return response.text
+        return result.text
         
+    except QuotaExhaustedError:
+        raise
     except Exception as e:
         logger.error(f"Error during Chat: {e}")
         return "I'm having trouble connecting right now. Please try again!"
 
 def enhance_with_mcp_data(question):
     """
-    Check if question requires live data and fetch it using MCP tools
-    """
-    from mcp.tools import MCPJobTools
-    
-    question_lower = question.lower()
-    
-    # Check for job search intent
-    if any(k in question_lower for k in ['job', 'hiring', 'vacancy', 'opening', 'work']):
-        # Extract location
-        locations = ['bangalore', 'mumbai', 'delhi', 'hyderabad', 'chennai', 'pune', 'india']
-        loc = 'bangalore'
-        for l in locations:
-            if l in question_lower:
-                loc = l
-                break
-        
-        # Simple extraction
-        query = question_lower.replace('jobs', '').replace('hiring', '').replace('in', '').replace(loc, '').strip()
-        if not query: 
-            query = "software engineer"
-            
-        result = MCPJobTools.search_live_jobs(query, loc)
-        if result.get('status') == 'success':
-            return result.get('data')
-            
-    # Check for salary intent
-    elif 'salary' in question_lower or 'earn' in question_lower or 'pay' in question_lower:
-        query = question_lower.replace('salary', '').replace('much', '').replace('does', '').strip()
-        result = MCPJobTools.get_salary_data(query)
-        if result.get('status') == 'success':
-            return result.get('data')
-
-    # Check for News/Trends intent
-    elif any(k in question_lower for k in ['news', 'trend', 'latest', 'happening', 'update']):
-        query = question_lower.replace('news', '').replace('latest', '').replace('trends', '').strip()
-        result = MCPJobTools.get_industry_news(query)
-        if result.get('status') == 'success':
-            return result.get('data')
-
-    # Check for Learning/Video intent
-    elif any(k in question_lower for k in ['learn', 'how to', 'tutorial', 'video', 'course', 'guide']):
-        query = question_lower.replace('learn', '').replace('tutorial', '').replace('video', '').strip()
-        result = MCPJobTools.find_learning_videos(query)
-        if result.get('status') == 'success':
-            return result.get('data')
-            
-    # Check for Company Research intent
-    elif any(k in question_lower for k in ['research', 'culture', 'interview process', 'values', 'analyze company', 'tell me about']):
-        ignored_words = ['research', 'analyze', 'culture', 'company', 'interview', 'process', 'values', 'of', 'at', 'the', 'for', 'about', 'tell', 'me']
-        
-        # Clean query to get company name
-        query = question_lower
-        for k in ['research', 'analyze', 'culture', 'interview process', 'values', 'tell me about']:
-            query = query.replace(k, '')
-        
-        company_name = query.strip()
-        
-        if company_name and len(company_name) > 2:
-            result = MCPJobTools.autonomous_company_research(company_name)
-            if result.get('status') == 'success':
-                return result.get('data')
-
-    return None
+    Check if question requires live data and fetch it using MCP tools.
+    Every intent in the question (jobs, salary, news, videos, company research)
+    is looked up concurrently under one deadline; see mcp/enrichment.py.
 
+    Returns:
+        {intent: data} for the lookups that succeeded in time, or None
+    """
+    from mcp.enrichment import enrich
+    return enrich(question)
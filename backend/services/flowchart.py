@@ -0,0 +1,82 @@
+"""
+Mermaid flowcharts for career simulations.
+
+The chart used to be written by the LLM as part of the simulation JSON, which
+cost output tokens and broke whenever the model put spaces around arrows or
+brackets in a label. It is fully determined by the roadmap and the backup
+paths, so it is built here instead:
+
+    graph TD
+    S["Start: Current State"]-->Y1["Year 1: Data Analyst Intern"]
+    Y1-->Y2["Year 2: Data Analyst"]
+    ...
+    Y3-.->B1["Backup: Product Analyst"]
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+# Longer labels make Mermaid boxes unreadably wide on mobile
+MAX_LABEL_CHARS = 25
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Characters that end a quoted Mermaid label or are read as markup inside it
+_LABEL_ESCAPES = {
+    '"': "#quot;",
+    "<": "#lt;",
+    ">": "#gt;",
+    "#": "#35;",
+}
+
+
+def escape_label(text: Any, max_chars: int = MAX_LABEL_CHARS) -> str:
+    """Single-line, length-limited text that is safe inside a quoted Mermaid label"""
+    label = _WHITESPACE_RE.sub(" ", str(text)).strip()
+    if len(label) > max_chars:
+        label = label[:max_chars - 1].rstrip() + "…"
+    # Escape after truncating so an entity is never cut in half
+    return "".join(_LABEL_ESCAPES.get(ch, ch) for ch in label)
+
+
+def _year_label(index: int, entry: Dict[str, Any]) -> str:
+    year = entry.get("year") or index + 1
+    role = entry.get("role") or entry.get("focus")
+    if role:
+        return f"Year {year}: {role}"
+    title = entry.get("title")
+    return str(title) if title else f"Year {year}"
+
+
+def build_flowchart(roadmap: List[Dict[str, Any]], backup_paths: Optional[List[Any]] = None) -> str:
+    """
+    Mermaid 'graph TD' source for a roadmap.
+
+    Args:
+        roadmap: Year objects from the simulation ("year", "role", "title", ...)
+        backup_paths: Alternative careers, drawn as dotted branches from the
+            middle of the roadmap
+
+    Returns:
+        Flowchart source with real newlines, ready for mermaid.render()
+    """
+    lines = ["graph TD", 'S["Start: Current State"]']
+    previous = "S"
+    years = [entry for entry in roadmap or [] if isinstance(entry, dict)]
+    for i, entry in enumerate(years):
+        node = f"Y{i + 1}"
+        lines.append(f'{previous}-->{node}["{escape_label(_year_label(i, entry))}"]')
+        previous = node
+
+    branch_from = f"Y{(len(years) + 1) // 2}" if years else "S"
+    backups = [path for path in backup_paths or [] if isinstance(path, str) and path.strip()]
+    for i, path in enumerate(backups):
+        lines.append(f'{branch_from}-.->B{i + 1}["{escape_label("Backup: " + path)}"]')
+    return "\n".join(lines)
+
+
+def attach_flowchart(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Set result["flowchart"] from the result's roadmap and backup paths"""
+    analysis = result.get("analysis") if isinstance(result.get("analysis"), dict) else {}
+    result["flowchart"] = build_flowchart(result.get("roadmap") or [], analysis.get("backup_paths"))
+    return result
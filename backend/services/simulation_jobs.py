@@ -0,0 +1,273 @@
+"""
+Background jobs for career simulations.
+
+A simulation can take longer than gunicorn's --timeout when Gemini is slow or
+keys are cooling down, and a sync worker held for that long cannot serve
+anything else. POST /api/simulate with "async": true enqueues a job instead
+and answers 202 with its id. The simulation runs on a small bounded executor
+in the worker that accepted it.
+
+Job state and progress events go into a WAL-mode SQLite file shared by all
+workers, so GET /api/simulate/jobs/<id> and the SSE stream
+/api/simulate/jobs/<id>/events work whichever worker the poll lands on.
+Polling is the primary mode. An SSE connection holds a request thread, so it
+is closed after SIMULATION_JOB_STREAM_SECONDS; EventSource then reconnects
+with Last-Event-ID and resumes after the last event it saw.
+
+Settings:
+    SIMULATION_JOB_THREADS          concurrent simulations per worker (default 2)
+    SIMULATION_JOB_MAX_QUEUE        jobs waiting per worker before 429 (default 16)
+    SIMULATION_JOBS_PATH            job store file (default: system temp dir)
+    SIMULATION_JOB_STREAM_SECONDS   lifetime of one SSE connection (default 45)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from core.ai.api_key_manager import QuotaExhaustedError
+from core.metrics import get_metrics
+from core.sqlite_util import SQLiteFile, pid_alive
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+# An unfinished job untouched for this long is reported as failed even if its worker lives
+STALE_JOB_SECONDS = 900
+# Finished jobs are kept this long for polling
+JOB_RETENTION_SECONDS = 24 * 3600
+# One SSE connection ends after this long; the client reconnects with Last-Event-ID
+STREAM_SECONDS = float(os.environ.get("SIMULATION_JOB_STREAM_SECONDS", "45"))
+
+
+class JobQueueFullError(Exception):
+    """The worker's simulation queue is full"""
+    def __init__(self, retry_after: float):
+        super().__init__("Too many simulations queued")
+        self.retry_after = retry_after
+
+
+class JobStore:
+    """Simulation jobs and their progress events in a shared SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = SQLiteFile(path)
+        with self._db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS simulation_jobs ("
+                "id TEXT PRIMARY KEY, clerk_id TEXT, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, pid INTEGER, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS simulation_job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, seq))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_simulation_jobs_updated ON simulation_jobs (updated_at)")
+
+    def create(self, clerk_id: Optional[str]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO simulation_jobs (id, clerk_id, status, pid, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, clerk_id, QUEUED, os.getpid(), now, now)
+            )
+            # Housekeeping: drop old jobs while we hold the write lock anyway
+            cutoff = now - JOB_RETENTION_SECONDS
+            conn.execute(
+                "DELETE FROM simulation_job_events WHERE job_id IN "
+                "(SELECT id FROM simulation_jobs WHERE updated_at < ?)", (cutoff,)
+            )
+            conn.execute("DELETE FROM simulation_jobs WHERE updated_at < ?", (cutoff,))
+        return job_id
+
+    def update(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "UPDATE simulation_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def add_event(self, job_id: str, event: Dict[str, Any]) -> int:
+        with self._db.transaction() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM simulation_job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO simulation_job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                (job_id, seq, json.dumps(event))
+            )
+            conn.execute("UPDATE simulation_jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+        return seq
+
+    def events_since(self, job_id: str, after_seq: int) -> List[tuple]:
+        rows = self._db.conn().execute(
+            "SELECT seq, event FROM simulation_job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after_seq)
+        ).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.conn().execute(
+            "SELECT id, clerk_id, status, result, error, pid, created_at, updated_at FROM simulation_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, clerk_id, status, result, error, pid, created_at, updated_at = row
+        if status not in TERMINAL and (not pid_alive(pid) or time.time() - updated_at > STALE_JOB_SECONDS):
+            # The worker running it died (restart, OOM, deploy)
+            status, error = FAILED, "Simulation was interrupted. Please try again."
+        return {
+            "job_id": job_id,
+            "clerk_id": clerk_id,
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+
+class SimulationJobRunner:
+    """Runs simulation jobs on a bounded executor and records their progress"""
+
+    def __init__(self, store: JobStore, max_workers: int = 2, max_queue: int = 16):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.metrics = get_metrics()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="simulation-job")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, clerk_id: Optional[str], run: Callable[[Callable[[Dict[str, Any]], None]], Dict[str, Any]]) -> str:
+        """
+        Enqueue a simulation.
+
+        Args:
+            clerk_id: Student the job belongs to
+            run: Called on the executor with an emit(event) callback for progress
+                events; returns the final JSON-serialisable result
+
+        Raises:
+            JobQueueFullError: max_workers + max_queue jobs are already pending here
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.metrics.incr("simulation.jobs", outcome="rejected")
+                raise JobQueueFullError(retry_after=self._retry_after())
+            self._pending += 1
+        try:
+            job_id = self.store.create(clerk_id)
+            self.store.add_event(job_id, {"type": "status", "status": QUEUED})
+            self._executor.submit(self._run, job_id, run, time.monotonic())
+        except BaseException:
+            # The job never reached the executor, so _run will not release its slot
+            with self._lock:
+                self._pending -= 1
+            raise
+        self.metrics.incr("simulation.jobs", outcome="queued")
+        return job_id
+
+    def _retry_after(self) -> float:
+        p50 = self.metrics.percentile("simulation.job_ms", 0.5)
+        return max(5.0, (p50 or 30000) / 1000)
+
+    def _run(self, job_id: str, run, queued_at: float):
+        started = time.monotonic()
+        self.metrics.observe("simulation.job_wait_ms", (started - queued_at) * 1000)
+        try:
+            self.store.update(job_id, RUNNING)
+            self.store.add_event(job_id, {"type": "status", "status": RUNNING})
+            result = run(lambda event: self.store.add_event(job_id, event))
+            self.store.update(job_id, SUCCEEDED, result=result)
+            self.store.add_event(job_id, {"type": "status", "status": SUCCEEDED})
+            self.metrics.incr("simulation.jobs", outcome="succeeded")
+        except Exception as e:
+            if isinstance(e, QuotaExhaustedError):
+                message = "AI capacity is exhausted right now. Please try again shortly."
+            else:
+                logger.error(f"[SimulationJobs] Job {job_id} failed: {e}")
+                message = "Simulation failed. Please try again."
+            try:
+                self.store.update(job_id, FAILED, error=message)
+                self.store.add_event(job_id, {"type": "status", "status": FAILED, "error": message})
+            except sqlite3.Error as store_error:
+                logger.error(f"[SimulationJobs] Could not record failure of job {job_id}: {store_error}")
+            self.metrics.incr("simulation.jobs", outcome="failed")
+        finally:
+            self.metrics.observe("simulation.job_ms", (time.monotonic() - started) * 1000)
+            with self._lock:
+                self._pending -= 1
+
+    def stream_events(self, job_id: str, after_seq: int = 0, poll_interval: float = 0.5,
+                      max_seconds: Optional[float] = None) -> Iterator[tuple]:
+        """
+        (seq, event) pairs for a job from after_seq on, polling the shared store
+        until the job finishes or max_seconds (default STREAM_SECONDS) pass.
+        Works from any worker.
+        """
+        deadline = time.monotonic() + (max_seconds or STREAM_SECONDS)
+        while time.monotonic() < deadline:
+            for seq, event in self.store.events_since(job_id, after_seq):
+                after_seq = seq
+                yield seq, event
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            if job["status"] in TERMINAL:
+                # Events written between our read and the status change
+                for seq, event in self.store.events_since(job_id, after_seq):
+                    yield seq, event
+                if job["status"] == FAILED and job["error"] and not self._reported_failure(job_id):
+                    yield after_seq + 1, {"type": "status", "status": FAILED, "error": job["error"]}
+                return
+            time.sleep(poll_interval)
+
+    def _reported_failure(self, job_id: str) -> bool:
+        return any(event.get("status") == FAILED for _, event in self.store.events_since(job_id, 0))
+
+    def get_status(self) -> dict:
+        with self._lock:
+            pending = self._pending
+        return {"pending": pending, "max_workers": self.max_workers, "max_queue": self.max_queue}
+
+
+# Global singleton instance
+_runner: Optional[SimulationJobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> SimulationJobRunner:
+    """Get or create the global SimulationJobRunner singleton"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                store = JobStore(os.environ.get(
+                    "SIMULATION_JOBS_PATH",
+                    os.path.join(tempfile.gettempdir(), "opec_simulation_jobs.sqlite3")
+                ))
+                _runner = SimulationJobRunner(
+                    store,
+                    max_workers=int(os.environ.get("SIMULATION_JOB_THREADS", "2")),
+                    max_queue=int(os.environ.get("SIMULATION_JOB_MAX_QUEUE", "16"))
+                )
+    return _runner
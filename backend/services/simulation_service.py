@@ -0,0 +1,426 @@
+"""
+Memoized career simulations.
+
+A simulation is a long, expensive Gemini generation, but its inputs - the
+student's profile and the gist of their chats - rarely change between
+dashboard visits. Results are stored per student with a fingerprint of
+those inputs:
+- same fingerprint      -> the stored roadmap is returned immediately
+- refresh=true          -> the stored roadmap is returned and a new one is
+                           generated in the background
+- profile changed       -> a new one is generated (joining a background
+                           refresh already running for the student)
+- POST /api/opec/profile -> regenerates in the background, so the next
+                           dashboard visit is instant
+
+stream_simulation() yields the same result year by year while the model is
+still writing it (POST /api/simulate/stream and async jobs).
+
+Storage: the career_simulations table in Supabase
+(database/migrations/add_career_simulations.sql), fronted by the shared
+response cache so most reads never leave the host. Each worker keeps a record
+in memory for at most SIMULATION_MEMORY_TTL_SECONDS before reading the shared
+tier again, so a roadmap regenerated by another worker is picked up.
+
+A request spends at most SIMULATION_REQUEST_DEADLINE_SECONDS in total on a
+simulation, including time spent waiting for a regeneration already in flight.
+
+Settings:
+    SIMULATION_MEMORY_TTL_SECONDS        per-worker memory lifetime of a record (default 30)
+    SIMULATION_REQUEST_DEADLINE_SECONDS  time budget of one request (default 100)
+    SIMULATION_REFRESH_THREADS           background regeneration threads (default 2)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from core.ai.api_key_manager import QuotaExhaustedError
+from core.cache.memory import MB, get_cache
+from core.metrics import get_metrics
+from core.supabase_client import get_supabase_client
+from services.ai_engine import (
+    _get_mock_response, _has_api_keys, generate_career_simulation, run_career_simulation,
+    simulation_events, stream_career_simulation
+)
+
+logger = logging.getLogger(__name__)
+
+# Profile fields that reach the simulation prompt
+PROFILE_FIELDS = ("name", "education_level", "grade_or_year", "stream_or_branch", "interests", "goals", "location")
+
+# Bump when SYSTEM_PROMPT or the output format changes so stored results are regenerated
+SIMULATION_VERSION = 2
+
+# Time budget of one request, waiting for a regeneration in flight included
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("SIMULATION_REQUEST_DEADLINE_SECONDS", "100"))
+
+# Retry-After when a regeneration for the same inputs is still running at the deadline
+JOIN_RETRY_AFTER_SECONDS = 10
+
+_simulation_cache = get_cache(
+    "career_simulations", max_entries=512, max_bytes=16 * MB, ttl_seconds=None, persistent=True,
+    memory_ttl_seconds=float(os.environ.get("SIMULATION_MEMORY_TTL_SECONDS", "30"))
+)
+
+
+def _canonical(value: Any) -> Any:
+    """Normalise whitespace and case so cosmetic edits do not change the fingerprint"""
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    return value
+
+
+def profile_fingerprint(user_profile: Dict[str, Any]) -> str:
+    """
+    Fingerprint of everything the simulation depends on: the profile fields
+    and a digest of the chat insights (the questions and concerns, not the
+    message count, which changes with every chat).
+    """
+    insights = user_profile.get("chat_insights") or {}
+    insights_digest = hashlib.sha256(json.dumps(
+        _canonical([insights.get("recent_questions", []), insights.get("recent_concerns", [])]),
+        sort_keys=True
+    ).encode()).hexdigest()
+    extra = {k: v for k, v in user_profile.items() if k not in PROFILE_FIELDS and k != "chat_insights"}
+    canonical = {
+        "version": SIMULATION_VERSION,
+        "profile": {field: _canonical(user_profile.get(field)) for field in PROFILE_FIELDS},
+        "extra": _canonical(extra),
+        "insights": insights_digest if insights else None,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_simulation_profile(clerk_id: str, base_profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the simulation input for a student: their stored profile (which takes
+    precedence over base_profile) plus insights from their active conversation.
+    """
+    user_profile = dict(base_profile or {})
+    supabase = get_supabase_client()
+    if not supabase or not clerk_id:
+        return user_profile
+    try:
+        student_res = supabase.table('students').select('*').eq('clerk_user_id', clerk_id).limit(1).execute()
+        if not student_res.data:
+            return user_profile
+        student_data = student_res.data[0]
+        user_profile.update({field: student_data.get(field) for field in PROFILE_FIELDS})
+
+        # Fetch chat history to enhance simulation with conversation insights
+        student_id = student_data.get('id')
+        if student_id:
+            conv_res = supabase.table('conversations').select('id').eq('student_id', student_id).eq('is_active', True).execute()
+            if conv_res.data:
+                conversation_id = conv_res.data[0]['id']
+                # Get recent messages (last 20 for context)
+                messages_res = supabase.table('messages').select('role,content').eq('conversation_id', conversation_id).order('created_at', desc=False).limit(20).execute()
+                if messages_res.data:
+                    user_questions, user_concerns = [], []
+                    for msg in messages_res.data:
+                        if msg.get('role') == 'user':
+                            content = msg.get('content', '')
+                            (user_questions if '?' in content else user_concerns).append(content)
+                    user_profile['chat_insights'] = {
+                        "total_messages": len(messages_res.data),
+                        "recent_questions": user_questions[-5:],  # Last 5 questions
+                        "recent_concerns": user_concerns[-5:],    # Last 5 statements
+                        "engagement_level": "high" if len(messages_res.data) > 10 else "moderate"
+                    }
+                    print(f"[SIMULATION] Enhanced with chat context: {len(messages_res.data)} messages")
+    except Exception as e:
+        print(f"Error fetching student profile/chat: {e}")
+    return user_profile
+
+
+class SimulationStore:
+    """Stored simulations: shared cache in front of the career_simulations table"""
+
+    TABLE = "career_simulations"
+
+    def load(self, clerk_id: str) -> Optional[Dict[str, Any]]:
+        record = _simulation_cache.get(clerk_id)
+        if record is not None:
+            return record
+        supabase = get_supabase_client()
+        if not supabase:
+            return None
+        try:
+            res = supabase.table(self.TABLE).select('fingerprint,result,generated_at') \
+                .eq('clerk_id', clerk_id).limit(1).execute()
+        except Exception as e:
+            logger.warning(f"[Simulations] Could not read stored simulation: {e}")
+            return None
+        if not res.data:
+            return None
+        record = res.data[0]
+        _simulation_cache.set(clerk_id, record)
+        return record
+
+    def save(self, clerk_id: str, fingerprint: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc).isoformat()
+        record = {"fingerprint": fingerprint, "result": result, "generated_at": now}
+        _simulation_cache.set(clerk_id, record)
+        supabase = get_supabase_client()
+        if supabase:
+            try:
+                supabase.table(self.TABLE).upsert(
+                    {"clerk_id": clerk_id, **record, "updated_at": now}, on_conflict="clerk_id"
+                ).execute()
+            except Exception as e:
+                logger.warning(f"[Simulations] Could not persist simulation: {e}")
+        return record
+
+
+class SimulationService:
+    """Returns stored simulations when still valid and regenerates them otherwise"""
+
+    def __init__(self, store: Optional[SimulationStore] = None):
+        self.store = store or SimulationStore()
+        self.metrics = get_metrics()
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("SIMULATION_REFRESH_THREADS", "2")),
+            thread_name_prefix="simulation-refresh"
+        )
+        self._lock = threading.Lock()
+        # clerk_id -> (future, fingerprint being generated, or None until the profile is loaded)
+        self._inflight: Dict[str, Tuple[Future, Optional[str]]] = {}
+
+    def get_simulation(self, clerk_id: Optional[str], user_profile: Dict[str, Any],
+                       refresh: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Simulation for a student.
+
+        Args:
+            clerk_id: Student id; without one nothing is stored
+            user_profile: Simulation input (see load_simulation_profile)
+            refresh: Regenerate in the background even if the fingerprint matches
+
+        Returns:
+            (result, meta) where meta says whether the result came from the store
+            and whether a regeneration is running
+
+        Raises:
+            QuotaExhaustedError: a new simulation was needed and there was no capacity
+        """
+        if not clerk_id:
+            return run_career_simulation(user_profile), {"cached": False}
+
+        deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+        fingerprint = profile_fingerprint(user_profile)
+        record = self.store.load(clerk_id)
+        if self._is_current(record, fingerprint):
+            refreshing = bool(refresh) and self.refresh_in_background(clerk_id, user_profile, force=True)
+            self.metrics.incr("simulation.store", outcome="refresh" if refresh else "hit")
+            return record["result"], {
+                "cached": True,
+                "generated_at": record.get("generated_at"),
+                "refreshing": refreshing,
+            }
+
+        # No stored result, or the inputs changed: the old roadmap no longer fits
+        self.metrics.incr("simulation.store", outcome="stale" if record is not None else "miss")
+        joined = self._join_inflight(clerk_id, fingerprint, deadline)
+        if joined is not None:
+            return joined["result"], {"cached": False, "generated_at": joined.get("generated_at")}
+
+        result, stored = self._generate_and_store(clerk_id, user_profile, fingerprint, deadline)
+        return result, {"cached": False, "stored": stored}
+
+    def stream_simulation(self, clerk_id: Optional[str], user_profile: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Simulation as a sequence of events (see stream_career_simulation): each
+        roadmap year as soon as the model has written it, then the analysis
+        sections, then {"type": "result", "result": ..., "simulation_meta": ...}.
+        A stored simulation is replayed through the same events.
+
+        Raises:
+            QuotaExhaustedError: a new simulation was needed and there was no capacity
+        """
+        deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+        found = self.lookup(clerk_id, user_profile)
+        if found is None and clerk_id:
+            fingerprint = profile_fingerprint(user_profile)
+            self.metrics.incr("simulation.store", outcome="miss")
+            joined = self._join_inflight(clerk_id, fingerprint, deadline)
+            if joined is not None:
+                found = joined["result"], {"cached": False, "generated_at": joined.get("generated_at")}
+        if found is None and not _has_api_keys():
+            logger.warning("GEMINI_API_KEY not found. Using mock response.")
+            found = _get_mock_response(), {"cached": False, "stored": False}
+        if found is not None:
+            result, meta = found
+            yield from simulation_events(result)
+            yield {"type": "result", "result": result, "simulation_meta": meta}
+            return
+
+        started = time.monotonic()
+        first_content = True
+        try:
+            for event in stream_career_simulation(user_profile, deadline_s=self._remaining(deadline)):
+                if event["type"] == "result":
+                    result = event["result"]
+                    break
+                if first_content:
+                    first_content = False
+                    self.metrics.observe("simulation.first_content_ms", (time.monotonic() - started) * 1000)
+                yield event
+        except QuotaExhaustedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during streamed AI simulation: {e}")
+            if not first_content:
+                raise  # the client already has part of a real roadmap; do not mix in the mock
+            result = _get_mock_response(str(e))
+            yield from simulation_events(result)
+            yield {"type": "result", "result": result, "simulation_meta": {"cached": False, "stored": False}}
+            return
+        self.metrics.observe("simulation.stream_ms", (time.monotonic() - started) * 1000)
+        stored = bool(clerk_id)
+        if stored:
+            self.store.save(clerk_id, profile_fingerprint(user_profile), result)
+        yield {"type": "result", "result": result, "simulation_meta": {"cached": False, "stored": stored}}
+
+    def _join_inflight(self, clerk_id: str, fingerprint: str, deadline: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait (until the request deadline) for a background regeneration of the
+        same inputs instead of starting another.
+
+        Raises:
+            QuotaExhaustedError: the regeneration is still running at the deadline;
+                generating inline as well would only overrun it
+        """
+        future, inflight_fingerprint = self._inflight.get(clerk_id, (None, None))
+        if future is None or inflight_fingerprint not in (None, fingerprint):
+            return None
+        try:
+            joined = future.result(timeout=self._remaining(deadline))
+        except FutureTimeoutError:
+            self.metrics.incr("simulation.join", outcome="timeout")
+            raise QuotaExhaustedError(
+                "Your simulation is still being generated. Please retry shortly.",
+                retry_after=JOIN_RETRY_AFTER_SECONDS
+            )
+        except QuotaExhaustedError:
+            raise
+        except Exception:
+            return None
+        if joined is not None and joined.get("fingerprint") == fingerprint:
+            return joined
+        return None
+
+    def lookup(self, clerk_id: Optional[str], user_profile: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(result, meta) if a stored simulation still matches the profile, else None. Never generates."""
+        if not clerk_id:
+            return None
+        record = self.store.load(clerk_id)
+        if not self._is_current(record, profile_fingerprint(user_profile)):
+            return None
+        self.metrics.incr("simulation.store", outcome="hit")
+        return record["result"], {"cached": True, "generated_at": record.get("generated_at"), "refreshing": False}
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        # Never 0: the gateway reads deadline_s=0 as "use the profile default"
+        return max(0.001, deadline - time.monotonic())
+
+    @staticmethod
+    def _is_current(record: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+        return record is not None and record.get("fingerprint") == fingerprint
+
+    def refresh_in_background(self, clerk_id: str, user_profile: Optional[Dict[str, Any]] = None,
+                              force: bool = False) -> bool:
+        """
+        Regenerate a student's simulation off the request thread. With no
+        user_profile it is loaded from the database first. Returns False if a
+        regeneration for the student is already running.
+        """
+        if not clerk_id or not _has_api_keys():
+            return False
+        with self._lock:
+            if clerk_id in self._inflight:
+                return False
+            future = self._executor.submit(self._background_refresh, clerk_id, user_profile, force)
+            self._inflight[clerk_id] = (future, profile_fingerprint(user_profile) if user_profile else None)
+        future.add_done_callback(lambda _: self._forget(clerk_id, future))
+        return True
+
+    def invalidate(self, clerk_id: str):
+        """Profile changed: regenerate in the background so the next visit is fast"""
+        self.metrics.incr("simulation.invalidations")
+        self.refresh_in_background(clerk_id)
+
+    def _forget(self, clerk_id: str, future: Future):
+        with self._lock:
+            if self._inflight.get(clerk_id, (None,))[0] is future:
+                del self._inflight[clerk_id]
+
+    def _background_refresh(self, clerk_id: str, user_profile: Optional[Dict[str, Any]], force: bool) -> Optional[dict]:
+        started = time.monotonic()
+        if user_profile is None:
+            user_profile = load_simulation_profile(clerk_id)
+            if not user_profile:
+                return None
+        fingerprint = profile_fingerprint(user_profile)
+        if not force:
+            record = self.store.load(clerk_id)
+            if record is not None and record.get("fingerprint") == fingerprint:
+                return record
+        started_at = datetime.now(timezone.utc).isoformat()
+        try:
+            result = generate_career_simulation(user_profile)
+        except Exception as e:
+            logger.warning(f"[Simulations] Background refresh for a student failed: {e}")
+            self.metrics.incr("simulation.refresh", outcome="error")
+            return None
+        latest = self.store.load(clerk_id)
+        if latest is not None and latest.get("fingerprint") != fingerprint and latest.get("generated_at", "") > started_at:
+            # A request generated a simulation for a newer profile meanwhile; keep that one
+            self.metrics.incr("simulation.refresh", outcome="superseded")
+            return None
+        record = self.store.save(clerk_id, fingerprint, result)
+        self.metrics.incr("simulation.refresh", outcome="ok")
+        self.metrics.observe("simulation.refresh_ms", (time.monotonic() - started) * 1000)
+        return record
+
+    def _generate_and_store(self, clerk_id: str, user_profile: Dict[str, Any], fingerprint: str,
+                            deadline: float) -> Tuple[Dict[str, Any], bool]:
+        if not _has_api_keys():
+            logger.warning("GEMINI_API_KEY not found. Using mock response.")
+            return _get_mock_response(), False
+        try:
+            result = generate_career_simulation(user_profile, deadline_s=self._remaining(deadline))
+        except QuotaExhaustedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during AI simulation: {e}")
+            # The mock response is never stored, so the next visit retries
+            return _get_mock_response(str(e)), False
+        self.store.save(clerk_id, fingerprint, result)
+        return result, True
+
+
+# Global singleton instance
+_service: Optional[SimulationService] = None
+_service_lock = threading.Lock()
+
+
+def get_simulation_service() -> SimulationService:
+    """Get or create the global SimulationService singleton"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SimulationService()
+    return _service
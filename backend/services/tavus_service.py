@@ -3,9 +3,10 @@ Tavus 3D Avatar Service
 Handles Tavus API interactions for 3D avatar-based interviews
 """
 import os
-import requests
 from typing import Optional, Dict, Any
 
+from core.http_client import get_http_client
+
 
 class TavusService:
     """Service for interacting with Tavus 3D Avatar API"""
@@ -72,7 +73,7 @@ class TavusService:
         if conversational_context:
             payload["conversational_context"] = conversational_context
         
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = get_http_client().post("tavus", url, json=payload, headers=self.headers)
         response.raise_for_status()
         
         return response.json()
@@ -89,7 +90,7 @@ class TavusService:
         """
         url = f"{self.BASE_URL}/conversations/{conversation_id}/end"
         
-        response = requests.post(url, headers=self.headers)
+        response = get_http_client().post("tavus", url, headers=self.headers)
         response.raise_for_status()
         
         return response.json()
@@ -106,7 +107,7 @@ class TavusService:
         """
         url = f"{self.BASE_URL}/conversations/{conversation_id}"
         
-        response = requests.get(url, headers=self.headers)
+        response = get_http_client().get("tavus", url, headers=self.headers)
         response.raise_for_status()
         
         return response.json()
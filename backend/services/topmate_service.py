@@ -2,18 +2,22 @@
 Topmate Mentor Matching Service
 Fetches real mentors from Topmate.io based on career field
 """
-import requests
+import json
 import logging
 from typing import List, Dict, Any, Optional
 from bs4 import BeautifulSoup
 from functools import lru_cache
-from datetime import datetime, timedelta
+
+from core.cache.memory import MB, get_cache
+from core.cassette import through_cassette
+from core.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
-# Cache for mentor data
-_mentor_cache: Dict[str, tuple] = {}
+# Cache for mentor data (bounded LRU with TTL, shared by workers on disk)
 CACHE_TTL_SECONDS = 3600  # 1 hour
+_mentor_cache = get_cache("topmate_mentors", max_entries=256, max_bytes=4 * MB, ttl_seconds=CACHE_TTL_SECONDS,
+                          persistent=True)
 
 
 class TopmateService:
@@ -39,26 +43,28 @@ class TopmateService:
         'cybersecurity': 'cybersecurity'
     }
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    
+    def _fetch(self, service: str, url: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """GET a Topmate URL as {status_code, text} (recorded/replayed when cassettes are on)"""
+        def fetch():
+            response = get_http_client().get("topmate", url, params=params, headers=self.HEADERS, timeout=10)
+            return {"status_code": response.status_code, "text": response.text}
+        
+        return through_cassette(service, {"url": url, "params": params}, fetch)
     
     def _get_cached(self, cache_key: str) -> Optional[List[Dict]]:
         """Get cached mentor data if still valid"""
-        if cache_key in _mentor_cache:
-            data, timestamp = _mentor_cache[cache_key]
-            if datetime.now() - timestamp < timedelta(seconds=CACHE_TTL_SECONDS):
-                logger.info(f"Cache hit for mentors: {cache_key}")
-                return data
-            else:
-                del _mentor_cache[cache_key]
-        return None
+        data = _mentor_cache.get(cache_key)
+        if data is not None:
+            logger.info(f"Cache hit for mentors: {cache_key}")
+        return data
     
     def _set_cache(self, cache_key: str, data: List[Dict]):
-        """Cache mentor data with timestamp"""
-        _mentor_cache[cache_key] = (data, datetime.now())
+        """Cache mentor data (expires after CACHE_TTL_SECONDS)"""
+        _mentor_cache.set(cache_key, data)
     
     def get_category(self, field: str) -> str:
         """Map career field to Topmate category"""
@@ -112,14 +118,14 @@ class TopmateService:
                 'location': location
             }
             
-            response = self.session.get(api_url, params=params, timeout=10)
+            response = self._fetch("topmate.search", api_url, params)
             
-            if response.status_code == 200:
-                data = response.json()
+            if response["status_code"] == 200:
+                data = json.loads(response["text"])
                 mentors = self._parse_api_response(data, field)
             else:
                 # Fallback to web scraping if API fails
-                logger.warning(f"Topmate API returned {response.status_code}, falling back to scraping")
+                logger.warning(f"Topmate API returned {response['status_code']}, falling back to scraping")
                 mentors = self._scrape_mentors(field, limit)
             
             # Cache the results
@@ -164,8 +170,8 @@ class TopmateService:
             category = self.get_category(field)
             url = f"{self.BASE_URL}/browse/{category}"
             
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            response = self._fetch("topmate.browse", url)
+            soup = BeautifulSoup(response["text"], 'html.parser')
             
             mentors = []
             mentor_cards = soup.find_all('div', class_='mentor-card')[:limit]
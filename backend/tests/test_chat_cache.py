@@ -0,0 +1,26 @@
+import pytest
+
+from core.ai.chat_cache import is_generic_question
+
+
+@pytest.mark.parametrize("message", [
+    "which skills do I need as a mechanical graduate",
+    "how can i become a data analyst",
+    "what skills should i learn for data science",
+    "I'm a fresher, what is the salary of a data analyst",
+    "what would the salary be if I'd done an MBA",
+    "which companies are hiring, I'll relocate anywhere",
+    "what is the scope of it",
+])
+def test_first_person_and_follow_up_questions_are_not_generic(message):
+    assert not is_generic_question(message)
+
+
+@pytest.mark.parametrize("message", [
+    "data analyst salary in bangalore",
+    "what skills does a data scientist need",
+    "difference between data analyst and data scientist",
+    "top companies hiring python developers",
+])
+def test_self_contained_factual_questions_are_generic(message):
+    assert is_generic_question(message)
@@ -0,0 +1,15 @@
+-- ============================================
+-- CAREER SIMULATIONS TABLE
+-- Latest /api/simulate result per student, keyed on a fingerprint of the
+-- profile fields and chat insights it was generated from
+-- ============================================
+CREATE TABLE IF NOT EXISTS career_simulations (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  clerk_id TEXT NOT NULL UNIQUE,
+  fingerprint TEXT NOT NULL,
+  result JSONB NOT NULL, -- roadmap, analysis, flowchart
+  generated_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_career_simulations_clerk ON career_simulations(clerk_id);